@@ -1,13 +1,11 @@
 '''Run time for evaluating python codes in template'''
 
 
-import numpy as np
-
-
 class Api(object):
 
   def __init__(self):
     self._definitions = {}
+    self._constraints = []
 
   def addDefinitions(self, name_value_dict):
     """
@@ -34,3 +32,26 @@ class Api(object):
     :return list:
     """
     return self._definitions
+
+  def addConstraints(self, constraints):
+    """
+    Adds constraints on the values of template variables. An
+    assignment of values is only expanded if every constraint
+    whose template variables are all used in the line is true.
+    :param list constraints: each constraint is either a python
+        expression (str) or a function whose parameters are
+        template variables
+    """
+    self._constraints.extend(constraints)
+
+  def clearConstraints(self):
+    """
+    Removes all constraints
+    """
+    self._constraints = []
+
+  def getConstraints(self):
+    """
+    :return list:
+    """
+    return self._constraints
@@ -0,0 +1,111 @@
+'''Lazy space of assignments of values to template variables.'''
+
+
+class AssignmentSpace(object):
+  """
+  The combinations of assignments of values to template variables.
+  Only the values of each variable are stored; an assignment is
+  decoded from its index using mixed-radix arithmetic in which the
+  first variable varies fastest. Suppose that the definitions are
+  {'a': ['a1', 'a2'], 'b': ['b1', 'b2', 'b3']}. The assignments are:
+    {'a': 'a1', 'b': 'b1'}, {'a': 'a2', 'b': 'b1'},
+    {'a': 'a1', 'b': 'b2'}, {'a': 'a2', 'b': 'b2'},
+    {'a': 'a1', 'b': 'b3'}, {'a': 'a2', 'b': 'b3'}
+  Supports len(), iteration, indexing and slicing.
+  """
+
+  def __init__(self, definitions):
+    """
+    :param dict definitions: key is variable name, value is list of values
+    """
+    self._names = list(definitions.keys())
+    self._values = [tuple(definitions[n]) for n in self._names]
+    self._length = 0
+    if len(self._names) > 0:
+      self._length = 1
+      for values in self._values:
+        self._length *= len(values)
+
+  def __len__(self):
+    return self._length
+
+  def getNames(self):
+    """
+    :return list-of-str: variable names in the order they vary
+    """
+    return list(self._names)
+
+  def getValues(self):
+    """
+    :return list-of-tuple: values of each variable in the order they vary
+    """
+    return list(self._values)
+
+  def getAssignment(self, index):
+    """
+    Decodes the assignment at the index.
+    :param int index: non-negative index less than the length
+    :return dict: key is variable name, value is its assigned value
+    """
+    assignment = {}
+    for name, values in zip(self._names, self._values):
+      index, position = divmod(index, len(values))
+      assignment[name] = values[position]
+    return assignment
+
+  def __getitem__(self, key):
+    """
+    :param int/slice key:
+    :return dict/list-of-dict: a list of assignments for a slice
+    :raises IndexError: if an index is out of range
+    """
+    if isinstance(key, slice):
+      return [self.getAssignment(i)
+              for i in range(*key.indices(self._length))]
+    if key < 0:
+      key += self._length
+    if key < 0 or key >= self._length:
+      raise IndexError("Assignment index out of range")
+    return self.getAssignment(key)
+
+  def makeAssignment(self, positions):
+    """
+    :param tuple-of-int positions: position of the value of each variable
+    :return dict: key is variable name, value is its assigned value
+    """
+    return dict([(n, v[p]) for n, v, p
+                 in zip(self._names, self._values, positions)])
+
+  def updateAssignment(self, assignment, positions):
+    """
+    Sets the values of the variables in an existing assignment,
+    so that one dictionary can be reused for many assignments.
+    :param dict assignment: updated in place
+    :param tuple-of-int positions: position of the value of each variable
+    """
+    for name, values, position in zip(self._names, self._values,
+        positions):
+      assignment[name] = values[position]
+
+  def iterPositions(self):
+    """
+    Enumerates the positions of the values of the variables for each
+    assignment by incrementing them like an odometer.
+    :return generator-of-tuple:
+    """
+    if self._length == 0:
+      return
+    positions = [0]*len(self._names)
+    while True:
+      yield tuple(positions)
+      for idx, values in enumerate(self._values):
+        positions[idx] += 1
+        if positions[idx] < len(values):
+          break
+        positions[idx] = 0
+      else:
+        return
+
+  def __iter__(self):
+    for positions in self.iterPositions():
+      yield self.makeAssignment(positions)
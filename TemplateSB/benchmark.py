@@ -0,0 +1,300 @@
+'''Benchmarks for the expansion of templates.'''
+
+"""
+Measures throughput (output lines per second), the time spent in
+each phase of processing and peak memory for synthetic templates
+and the templates in the Example directory, and the start-up time
+of a new process. Results are written as
+JSON and can be compared against a stored baseline.
+
+Usage:
+  python benchmark.py [--output results.json] [--baseline baseline.json]
+      [--threshold 0.2] [--repeat 3] [--quick]
+"""
+
+from constants import PARENT_DIR, VERSION, COMMAND_START, COMMAND_END
+from instrumentation import PHASE_EXTRACT, PHASE_DEFINE, PHASE_EXPAND
+from template_processor import TemplateProcessor
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+EXAMPLE_DIR = os.path.join(PARENT_DIR, "Example")
+EXAMPLE_PATHS = [
+    os.path.join(EXAMPLE_DIR, "Demo", "sample.tmpl"),
+    os.path.join(EXAMPLE_DIR, "Bray", "bray_model.tmpl"),
+    os.path.join(EXAMPLE_DIR, "Benson", "benson.inst"),
+    ]
+# num_variables, domain_size, expressions_per_line, num_lines
+SYNTHETIC_CASES = [
+    (2, 5, 2, 100),
+    (4, 5, 4, 100),
+    (6, 5, 6, 100),
+    (10, 5, 4, 100),
+    (4, 10, 4, 100),
+    (4, 5, 12, 100),
+    (4, 5, 4, 1000),
+    ]
+QUICK_CASES = SYNTHETIC_CASES[:2]
+# Number of variables referenced in a synthetic template line
+VARIABLES_PER_LINE = 3
+TEMPLATESB_DIR = os.path.dirname(os.path.abspath(__file__))
+RUN_PATH = os.path.join(PARENT_DIR, "run.py")
+STARTUP_TEMPLATE = '\n'.join([
+    "%s DefineVariables Begin %s" % (COMMAND_START, COMMAND_END),
+    "api.addDefinitions({'a': ['x', 'y']})",
+    "%s DefineVariables End %s" % (COMMAND_START, COMMAND_END),
+    "J{a}: S{a} -> P; k*S{a}"])
+# Reports the seconds to import the template processor
+IMPORT_SCRIPT = """
+import sys, time
+sys.path.insert(0, %r)
+start = time.perf_counter()
+import template_processor
+print(time.perf_counter() - start)
+""" % TEMPLATESB_DIR
+PHASE_OTHER = "other"
+DEFAULT_THRESHOLD = 0.2
+
+
+def makeSyntheticTemplate(num_variables, domain_size,
+    expressions_per_line, num_lines):
+  """
+  Creates a template with numeric and string template variables.
+  :param int num_variables:
+  :param int domain_size: number of values of each variable
+  :param int expressions_per_line:
+  :param int num_lines:
+  :return str:
+  """
+  definitions = {}
+  names = []
+  for idx in range(num_variables):
+    if idx % 2 == 0:
+      name = "n%d" % idx
+      definitions[name] = list(range(domain_size))
+    else:
+      name = "s%d" % idx
+      definitions[name] = ["v%d" % v for v in range(domain_size)]
+    names.append(name)
+  lines = ["%s DefineVariables Begin %s" % (COMMAND_START, COMMAND_END),
+           "api.addDefinitions(%s)" % str(definitions),
+           "%s DefineVariables End %s" % (COMMAND_START, COMMAND_END)]
+  num_referenced = min(VARIABLES_PER_LINE, num_variables)
+  for line_idx in range(num_lines):
+    referenced = [names[(line_idx + i) % num_variables]
+                  for i in range(num_referenced)]
+    expressions = []
+    for idx in range(expressions_per_line):
+      name = referenced[idx % num_referenced]
+      form = idx // num_referenced
+      if form == 0:
+        expressions.append("{%s}" % name)
+      elif name.startswith("n"):
+        expressions.append("{%s+%d}" % (name, form))
+      else:
+        expressions.append("{%s.upper()*%d}" % (name, form))
+    lines.append("J%d_%s: S%s -> P; k*S%s" % (line_idx,
+        ''.join(expressions[:num_referenced]),
+        ''.join(expressions), ''.join(expressions[:num_referenced])))
+  return '\n'.join(lines)
+
+def runOnce(template):
+  """
+  Processes a template, timing its phases.
+  :param str template:
+  :return int, float, dict: output lines, seconds, seconds by phase
+  """
+  processor = TemplateProcessor(template, stats=True)
+  start = time.perf_counter()
+  num_lines = 0
+  for _ in processor.generateLines():
+    num_lines += 1
+  seconds = time.perf_counter() - start
+  phases = processor.getStats()['phases']
+  timings = dict([(p, phases[p])
+                  for p in [PHASE_EXTRACT, PHASE_DEFINE, PHASE_EXPAND]])
+  timings[PHASE_OTHER] = max(0.0, seconds - sum(timings.values()))
+  return num_lines, seconds, timings
+
+def measurePeakMemory(template):
+  """
+  :param str template:
+  :return int: peak bytes allocated while processing the template
+  """
+  tracemalloc.start()
+  try:
+    for _ in TemplateProcessor(template).generateLines():
+      pass
+    return tracemalloc.get_traced_memory()[1]
+  finally:
+    tracemalloc.stop()
+
+def benchmark(name, template, repeat):
+  """
+  Benchmarks a template, keeping the fastest of the repetitions.
+  :param str name:
+  :param str template:
+  :param int repeat: number of timed runs
+  :return dict: results
+  """
+  best = None
+  for _ in range(repeat):
+    run = runOnce(template)
+    if best is None or run[1] < best[1]:
+      best = run
+  num_lines, seconds, timings = best
+  return {"name": name,
+          "input_bytes": len(template),
+          "output_lines": num_lines,
+          "seconds": seconds,
+          "lines_per_second": num_lines/seconds if seconds > 0 else 0.0,
+          "phases": timings,
+          "peak_bytes": measurePeakMemory(template),
+         }
+
+def measureStartup(repeat):
+  """
+  Measures the start-up time of new processes, keeping the fastest
+  of the repetitions.
+  :param int repeat: number of processes started
+  :return float, float: seconds to import the template processor,
+      seconds for run.py to expand a tiny template
+  """
+  import_seconds = []
+  run_seconds = []
+  handle, path = tempfile.mkstemp(suffix=".tmpl")
+  try:
+    with os.fdopen(handle, 'w') as outfile:
+      outfile.write(STARTUP_TEMPLATE)
+    for _ in range(repeat):
+      output = subprocess.check_output([sys.executable, "-c",
+          IMPORT_SCRIPT])
+      import_seconds.append(float(output))
+      start = time.perf_counter()
+      subprocess.check_call([sys.executable, RUN_PATH, path],
+          stdout=subprocess.DEVNULL)
+      run_seconds.append(time.perf_counter() - start)
+  finally:
+    os.remove(path)
+  return min(import_seconds), min(run_seconds)
+
+def getCases(quick=False):
+  """
+  :param bool quick: use a small set of cases
+  :return list-of-(str, str): name and template of each case
+  """
+  cases = []
+  synthetic_cases = QUICK_CASES if quick else SYNTHETIC_CASES
+  for parameters in synthetic_cases:
+    name = "synthetic-v%d-d%d-e%d-l%d" % parameters
+    cases.append((name, makeSyntheticTemplate(*parameters)))
+  for path in EXAMPLE_PATHS:
+    with open(path, 'r') as infile:
+      cases.append((os.path.basename(path), infile.read()))
+  return cases
+
+def runBenchmarks(repeat=3, quick=False):
+  """
+  :param int repeat: number of timed runs of each case
+  :param bool quick: use a small set of cases
+  :return dict: results of all cases
+  """
+  results = {"version": VERSION,
+             "python": platform.python_version(),
+             "platform": platform.platform(),
+             "cases": {},
+            }
+  for name, template in getCases(quick=quick):
+    results["cases"][name] = benchmark(name, template, repeat)
+  import_seconds, run_seconds = measureStartup(repeat)
+  results["import_seconds"] = import_seconds
+  results["startup_seconds"] = run_seconds
+  return results
+
+def compareResults(results, baseline, threshold=DEFAULT_THRESHOLD):
+  """
+  Finds the cases whose throughput is worse than the baseline by
+  more than the threshold.
+  :param dict results:
+  :param dict baseline: results of an earlier run
+  :param float threshold: fractional decrease in throughput allowed
+  :return list-of-(str, float): case name and ratio to the baseline
+  """
+  regressions = []
+  for name, case in results["cases"].items():
+    if not name in baseline["cases"]:
+      continue
+    base_rate = baseline["cases"][name]["lines_per_second"]
+    if base_rate <= 0:
+      continue
+    ratio = case["lines_per_second"]/base_rate
+    if ratio < 1 - threshold:
+      regressions.append((name, ratio))
+  return regressions
+
+def formatResults(results, baseline=None):
+  """
+  :param dict results:
+  :param dict baseline:
+  :return str: table of results
+  """
+  lines = ["%-28s %10s %12s %9s %9s %9s %10s %7s" % ("case", "lines",
+      "lines/s", PHASE_EXTRACT, PHASE_DEFINE, PHASE_EXPAND, "peak KB",
+      "ratio")]
+  for name, case in results["cases"].items():
+    ratio = ""
+    if baseline is not None and name in baseline["cases"]:
+      base_rate = baseline["cases"][name]["lines_per_second"]
+      if base_rate > 0:
+        ratio = "%.2f" % (case["lines_per_second"]/base_rate)
+    phases = case["phases"]
+    lines.append("%-28s %10d %12.0f %9.4f %9.4f %9.4f %10.0f %7s" % (name,
+        case["output_lines"], case["lines_per_second"],
+        phases[PHASE_EXTRACT], phases[PHASE_DEFINE], phases[PHASE_EXPAND],
+        case["peak_bytes"]/1024.0, ratio))
+  if "startup_seconds" in results:
+    lines.append("import %.4fs, start-up of run.py %.4fs"
+        % (results["import_seconds"], results["startup_seconds"]))
+  return '\n'.join(lines)
+
+def main(arguments=None):
+  parser = argparse.ArgumentParser(description="Benchmarks TemplateSB.")
+  parser.add_argument("--output", help="Path of the JSON results")
+  parser.add_argument("--baseline", help="Path of JSON baseline results")
+  parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+      help="Fractional decrease in throughput reported as a regression")
+  parser.add_argument("--repeat", type=int, default=3,
+      help="Number of timed runs of each case")
+  parser.add_argument("--quick", action="store_true",
+      help="Run a small set of cases")
+  args = parser.parse_args(arguments)
+  results = runBenchmarks(repeat=args.repeat, quick=args.quick)
+  baseline = None
+  if args.baseline is not None and os.path.isfile(args.baseline):
+    with open(args.baseline, 'r') as infile:
+      baseline = json.load(infile)
+  sys.stdout.write(formatResults(results, baseline) + "\n")
+  if args.output is not None:
+    with open(args.output, 'w') as outfile:
+      json.dump(results, outfile, indent=2, sort_keys=True)
+  if baseline is not None:
+    regressions = compareResults(results, baseline,
+        threshold=args.threshold)
+    for name, ratio in regressions:
+      sys.stdout.write("REGRESSION %s: %.2f of baseline throughput\n"
+          % (name, ratio))
+    if len(regressions) > 0:
+      return 1
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,157 @@
+'''Thin client of the expansion server and the protocol it uses.'''
+
+"""
+A client connects to the Unix domain socket of an ExpansionServer
+(see server.py) and exchanges frames. A frame is a one byte kind,
+the length of the payload as a four byte unsigned integer in network
+order, and the payload. A request is a FRAME_HEADER with JSON options,
+FRAME_INPUT frames with the UTF-8 template, and a FRAME_END. The
+response is FRAME_OUTPUT frames with the expanded template as it is
+produced, FRAME_ERROR frames with messages for standard error and a
+FRAME_STATUS with the exit status as a decimal string.
+
+This module only uses the standard library so that the client
+starts quickly.
+"""
+
+import argparse
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+
+
+FRAME_HEADER = b"H"
+FRAME_INPUT = b"I"
+FRAME_END = b"D"
+FRAME_OUTPUT = b"O"
+FRAME_ERROR = b"E"
+FRAME_STATUS = b"S"
+FRAME_PREFIX = struct.Struct("!cI")
+INPUT_CHUNK_BYTES = 2**16
+# Commands in the header of a request
+COMMAND_EXPAND = "expand"
+COMMAND_STATS = "stats"
+
+
+def writeFrame(outfile, kind, payload):
+  """
+  :param file outfile: opened for writing bytes
+  :param bytes kind: one of the FRAME_ constants
+  :param bytes payload:
+  """
+  outfile.write(FRAME_PREFIX.pack(kind, len(payload)))
+  outfile.write(payload)
+
+def readFrame(infile):
+  """
+  :param file infile: opened for reading bytes
+  :return bytes, bytes: kind and payload; None, None at the end
+  :raises IOError: if the frame is truncated
+  """
+  prefix = infile.read(FRAME_PREFIX.size)
+  if len(prefix) == 0:
+    return None, None
+  if len(prefix) < FRAME_PREFIX.size:
+    raise IOError("Truncated frame")
+  kind, length = FRAME_PREFIX.unpack(prefix)
+  payload = infile.read(length)
+  if len(payload) < length:
+    raise IOError("Truncated frame")
+  return kind, payload
+
+def _sendInput(connection, header, infile):
+  """
+  Sends the header and the template of a request.
+  :param socket connection:
+  :param dict header:
+  :param file infile: template as bytes; None for no input
+  """
+  try:
+    with connection.makefile('wb') as writer:
+      writeFrame(writer, FRAME_HEADER, json.dumps(header).encode('utf-8'))
+      if infile is not None:
+        while True:
+          data = infile.read(INPUT_CHUNK_BYTES)
+          if len(data) == 0:
+            break
+          writeFrame(writer, FRAME_INPUT, data)
+      writeFrame(writer, FRAME_END, b"")
+    connection.shutdown(socket.SHUT_WR)
+  except OSError:
+    # The server closed the connection; its response says why
+    pass
+
+def request(socket_path, header, infile, outfile, errfile):
+  """
+  Sends a request to the server, writing the response as it arrives.
+  The template is sent in another thread since the server sends
+  output before it has read all of the template.
+  :param str socket_path: path of the server's socket
+  :param dict header: options of the request
+  :param file infile: template as bytes; None for no input
+  :param file outfile: receives the output as bytes
+  :param file errfile: receives error messages as bytes
+  :return int: exit status
+  """
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+    connection.connect(socket_path)
+    sender = threading.Thread(target=_sendInput,
+        args=(connection, header, infile))
+    sender.daemon = True
+    sender.start()
+    status = 1
+    with connection.makefile('rb') as reader:
+      while True:
+        kind, payload = readFrame(reader)
+        if kind is None:
+          errfile.write(b"Connection closed by the server\n")
+          break
+        if kind == FRAME_OUTPUT:
+          outfile.write(payload)
+        elif kind == FRAME_ERROR:
+          errfile.write(payload)
+        elif kind == FRAME_STATUS:
+          status = int(payload.decode('ascii'))
+          break
+    outfile.flush()
+    sender.join()
+    return status
+
+def expand(socket_path, infile, outfile, errfile, config_path=None):
+  """
+  Expands a template with the server.
+  :param str socket_path:
+  :param file infile: template as bytes
+  :param file outfile: receives the expansion as bytes
+  :param file errfile: receives error messages as bytes
+  :param str config_path: configuration of the template syntax;
+      the server's configuration if None
+  :return int: exit status
+  """
+  header = {'command': COMMAND_EXPAND}
+  if config_path is not None:
+    header['config'] = os.path.abspath(config_path)
+  return request(socket_path, header, infile, outfile, errfile)
+
+def main(arguments=None):
+  parser = argparse.ArgumentParser(
+      description="Expands a templated model from standard input to "
+      + "standard output using a running server.")
+  parser.add_argument("socket", help="Path of the server's socket")
+  parser.add_argument("--config", metavar="FILE",
+      help="Configuration of the template syntax")
+  parser.add_argument("--server-stats", action="store_true",
+      help="Report the request latencies of the server")
+  args = parser.parse_args(arguments)
+  if args.server_stats:
+    return request(args.socket, {'command': COMMAND_STATS}, None,
+        sys.stdout.buffer, sys.stderr.buffer)
+  return expand(args.socket, sys.stdin.buffer, sys.stdout.buffer,
+      sys.stderr.buffer, config_path=args.config)
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -11,7 +11,7 @@ Supported commands are:
   {{ SetVersion <version #> }} - Specifies the version number
 """
 
-from constants import COMMAND_START, COMMAND_END
+from config import Config
 
 class Command(object):
   """
@@ -22,18 +22,22 @@ class Command(object):
   DEFINE_CONSTRAINTS = "DefineConstraints"
   SET_VERSION = "SetVersion"
   
-  def __init__(self, command_line):
+  def __init__(self, command_line, config=None):
     """
     :param str command_line: line with the command
+    :param Config config: syntax of the template; default if None
     """
+    if config is None:
+      config = Config.getDefault()
     self._command_line = command_line
     self._begin = False
     self._end = False
     self._arguments = []  # List of arguments following the command
     self._tokens = []
     parsed_line = command_line.split()
-    if (parsed_line[0] == COMMAND_START)  \
-        and (parsed_line[-1] == COMMAND_END):
+    if len(parsed_line) > 0  \
+        and (parsed_line[0] == config.command_start)  \
+        and (parsed_line[-1] == config.command_end):
       self._tokens = parsed_line[1:-1]
       self._parseCommand()
     else:
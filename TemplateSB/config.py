@@ -0,0 +1,158 @@
+'''Syntax of a template as an immutable configuration.'''
+
+"""
+A Config holds the strings that delimit commands, comments,
+continuations and template expressions. Objects that process a
+template take a Config so that templates with different syntaxes
+can be processed in the same process. A Scanner holds the compiled
+patterns for a Config and is created once for each Config.
+"""
+
+from render_plan import RenderPlan
+import collections
+import constants
+import threading
+
+
+CONFIG_FIELDS = ['command_start', 'command_end', 'comment_stg',
+    'continued_stg', 'expression_start', 'expression_end',
+    'warning_assignments']
+# Scanners by Config
+_scanners = {}
+_scanners_lock = threading.Lock()
+
+
+class Config(collections.namedtuple('Config', CONFIG_FIELDS)):
+  """
+  Immutable settings for the syntax of templates. Configs are
+  hashable and can be pickled.
+  """
+  __slots__ = ()
+
+  @classmethod
+  def fromDict(cls, config_dict, default=None):
+    """
+    :param dict config_dict: key is a keyword of the config file
+    :param Config default: values of keywords not in config_dict;
+        the default configuration if None
+    :return Config:
+    :raises ValueError: if a keyword is invalid
+    """
+    if default is None:
+      default = cls.getDefault()
+    changes = {}
+    for key, value in config_dict.items():
+      if not key in constants.PAIRS:
+        raise ValueError("Invalid configuration parameter: %s" % key)
+      changes[constants.PAIRS[key].lower()] = value
+    return default._replace(**changes)
+
+  @classmethod
+  def fromFile(cls, path, cache_path=constants.CONFIG_CACHE_PATH):
+    """
+    :param str path: config file in the format of config.yaml
+    :param str cache_path: file of cached values; None for no cache
+    :return Config:
+    """
+    return cls.fromDict(constants.readConfig(path, cache_path))
+
+  @classmethod
+  def getDefault(cls):
+    """
+    :return Config: configuration set by constants.setConstantsFromConfig
+    """
+    return cls(*[getattr(constants, n.upper()) for n in CONFIG_FIELDS])
+
+  def replace(self, **changes):
+    """
+    :param dict changes: key is a field of Config
+    :return Config: copy with the changed values
+    """
+    return self._replace(**changes)
+
+  def getScanner(self):
+    """
+    :return Scanner: shared by all equal configs
+    """
+    scanner = _scanners.get(self)
+    if scanner is None:
+      with _scanners_lock:
+        scanner = _scanners.get(self)
+        if scanner is None:
+          scanner = Scanner(self)
+          _scanners[self] = scanner
+    return scanner
+
+
+class Scanner(object):
+  """
+  Recognizes the syntax elements of template lines for a Config.
+  """
+
+  def __init__(self, config):
+    """
+    :param Config config:
+    """
+    self._config = config
+    self._expression_pattern = RenderPlan.makePattern(
+        config.expression_start, config.expression_end)
+
+  def getConfig(self):
+    return self._config
+
+  def getExpressionPattern(self):
+    """
+    :return re.Pattern: matches a template expression with group 1
+        being the expression without delimiters
+    """
+    return self._expression_pattern
+
+  def classifyLine(self, line):
+    """
+    Classifies a line as:
+      LINE_NONE: Empty line or no line
+      LINE_TRAN: Transparent - nothing to process (comment line, no template variable)
+      LINE_SUBS: Substitution line
+      LINE_COMMAND: Template processor command
+    :param str line:
+    :return int:
+    """
+    if line is None:
+      return constants.LINE_NONE
+    config = self._config
+    text = line.strip()
+    if len(text) == 0:
+      result = constants.LINE_NONE
+    elif text.startswith(config.comment_stg):
+      result = constants.LINE_TRAN
+    elif len(text) < 2:
+      result = constants.LINE_TRAN
+    elif text.startswith(config.command_start):
+      result = constants.LINE_COMMAND
+    elif not config.expression_start in text  \
+        and not config.expression_end in text:
+      result = constants.LINE_TRAN
+    else:
+      result = constants.LINE_SUBS
+    return result
+
+  def isContinued(self, text):
+    """
+    :param str text: source line without its line separator
+    :return bool: True if the line continues on the next line
+    """
+    return text.endswith(self._config.continued_stg)
+
+  def isComment(self, text):
+    """
+    :param str text:
+    :return bool:
+    """
+    return text.strip().startswith(self._config.comment_stg)
+
+  def makeComment(self, line):
+    """
+    :param str line:
+    :return str: line made into a comment
+    """
+    return "%s%s" % (self._config.comment_stg, line)
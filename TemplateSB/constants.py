@@ -1,7 +1,7 @@
 '''Constants used in TemplateSB.'''
 
+import marshal
 import os
-import yaml
 
 
 # The following constants are specified in the config file
@@ -17,11 +17,28 @@ WARNING_ASSIGNMENTS = 10000
 # The following constants are internal
 PARENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CONFIG_FILE_PATH = os.path.join(PARENT_DIR, "config.yaml")
+# Parsed configuration, valid while the config file is unchanged
+CONFIG_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    "__pycache__", "config.marshal")
 LINE_COMMAND = 2  # Command line
 LINE_NONE = -1  # Command line
 LINE_SUBS = 3  # Line to be processed for substitutions
 LINE_TRAN = 1  # Transparent - nothing to process (comment line, no template variable)
 LINE_NONE = -1 # No more lines
+# Maximum number of compiled expressions kept by an Executor
+EXPRESSION_CACHE_SIZE = 1000
+# Number of assignments below which expressions are not vectorized
+VECTORIZE_MIN_ASSIGNMENTS = 64
+# Number of template lines expanded in a task of a worker process
+PARALLEL_BATCH_SIZE = 8
+# Number of characters of output lines written in one call
+OUTPUT_CHUNK_BYTES = 2**18
+# Maximum size in bytes of the cache of expanded template lines
+LINE_CACHE_BYTES = 100*2**20
+# Maximum size in bytes of the cache of results of DefineVariables blocks
+DEFINITION_CACHE_BYTES = 100*2**20
+# Maximum size in bytes of the cache of expanded template files
+OUTPUT_CACHE_BYTES = 2**30
 # Version of code
 VERSION = "1.2"
 # YAML keywords and their internal counterparts
@@ -36,12 +53,47 @@ PAIRS = {"command_start": "COMMAND_START",
 SPLIT_STG = '\n'
 
 
-def setConstantsFromConfig(path=CONFIG_FILE_PATH):
-  fd = open(path, "r")
-  lines = ''.join(fd.readlines())
-  fd.close()
+def readConfig(path, cache_path):
+  """
+  Parses the config file, using the cached values if the file
+  has not changed since they were cached.
+  :param str path: config file
+  :param str cache_path: file of cached values; None for no cache
+  :return dict: key is YAML keyword
+  """
+  stat = os.stat(path)
+  signature = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+  if cache_path is not None:
+    try:
+      with open(cache_path, "rb") as fd:
+        cached_signature, config_dict = marshal.load(fd)
+      if cached_signature == signature:
+        return config_dict
+    except (OSError, EOFError, ValueError, TypeError):
+      pass
+  import yaml
+  with open(path, "r") as fd:
+    config_dict = yaml.safe_load(fd.read())
+  if cache_path is not None:
+    try:
+      os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+      temp_path = "%s.%d" % (cache_path, os.getpid())
+      with open(temp_path, "wb") as fd:
+        marshal.dump((signature, config_dict), fd)
+      os.replace(temp_path, cache_path)
+    except (OSError, ValueError):
+      # The cache is an optimization
+      pass
+  return config_dict
+
+def setConstantsFromConfig(path=CONFIG_FILE_PATH,
+    cache_path=CONFIG_CACHE_PATH):
+  """
+  :param str path: config file
+  :param str cache_path: file of cached values; None for no cache
+  """
   namespace = globals()
-  config_dict = yaml.load(lines)
+  config_dict = readConfig(path, cache_path)
   for key, value in config_dict.items():
     if key in PAIRS.keys():
       namespace[PAIRS[key]] = value
@@ -0,0 +1,150 @@
+'''Assignments of values to template variables that satisfy constraints.'''
+
+from assignment_space import AssignmentSpace
+import ast
+
+
+class Constraint(object):
+  """
+  A predicate on the values of template variables.
+  """
+
+  def __init__(self, predicate):
+    """
+    :param str/function predicate: python expression or a function
+        whose parameters are template variables
+    :raises ValueError: if the names used cannot be determined
+    """
+    self._predicate = predicate
+    if callable(predicate):
+      import inspect
+      self._names = set(inspect.signature(predicate).parameters.keys())
+    else:
+      try:
+        tree = ast.parse(predicate.strip(), mode='eval')
+      except SyntaxError as err:
+        raise ValueError("Invalid constraint %s: %s" % (predicate, err))
+      self._names = set([n.id for n in ast.walk(tree)
+                         if isinstance(n, ast.Name)])
+
+  def getPredicate(self):
+    return self._predicate
+
+  def getNames(self):
+    """
+    :return set-of-str: names used by the predicate
+    """
+    return set(self._names)
+
+  def getVariables(self, definitions):
+    """
+    :param dict definitions: template variable definitions
+    :return set-of-str: template variables used by the predicate
+    """
+    return set([n for n in self._names if n in definitions])
+
+  def isSatisfied(self, executor, assignment):
+    """
+    :param Executor executor: evaluates expressions
+    :param dict assignment: values of the template variables
+    :return bool:
+    """
+    if callable(self._predicate):
+      arguments = dict([(n, assignment[n]) for n in self._names])
+      return bool(self._predicate(**arguments))
+    return bool(executor.doExpression(self._predicate, names=assignment))
+
+
+class ConstrainedAssignmentSpace(AssignmentSpace):
+  """
+  The assignments of an AssignmentSpace that satisfy constraints.
+  Assignments are found by a backtracking search that checks each
+  constraint as soon as all of its variables are bound. Variables
+  are bound in an order that checks constraints early, so the time
+  taken is proportional to the number of valid assignments rather
+  than the full product. Assignments are kept in the same order as
+  in the AssignmentSpace.
+  """
+
+  def __init__(self, definitions, constraints, executor):
+    """
+    :param dict definitions: key is variable name, value is list of values
+    :param list-of-Constraint constraints: constraints whose variables
+        are all in the definitions
+    :param Executor executor: evaluates constraints
+    """
+    super(ConstrainedAssignmentSpace, self).__init__(definitions)
+    self._constraints = constraints
+    self._executor = executor
+    self._positions = None
+    self._search()
+
+  def _orderVariables(self):
+    """
+    Orders variable indices so that constraints are fully bound as
+    early as possible, preferring variables with fewer values.
+    :return list-of-int, list-of-list-of-Constraint: order of the
+        variables and the constraints checked when each is bound
+    """
+    variables = [c.getVariables(self._names) for c in self._constraints]
+    order = []
+    checks = []
+    bound = set()
+    remaining = list(range(len(self._names)))
+    while len(remaining) > 0:
+      def score(idx):
+        name = self._names[idx]
+        num_completed = len([v for v in variables
+            if name in v and v.issubset(bound.union([name]))])
+        return (num_completed, -len(self._values[idx]), -idx)
+      idx = max(remaining, key=score)
+      remaining.remove(idx)
+      name = self._names[idx]
+      bound.add(name)
+      checks.append([c for c, v in zip(self._constraints, variables)
+                     if name in v and v.issubset(bound)])
+      order.append(idx)
+    return order, checks
+
+  def _search(self):
+    """
+    Finds the positions of the values of the valid assignments.
+    """
+    self._positions = []
+    if self._length == 0:
+      return
+    order, checks = self._orderVariables()
+    positions = [0]*len(self._names)
+    assignment = {}
+
+    def bind(depth):
+      if depth == len(order):
+        self._positions.append(tuple(positions))
+        return
+      idx = order[depth]
+      name = self._names[idx]
+      for position, value in enumerate(self._values[idx]):
+        positions[idx] = position
+        assignment[name] = value
+        if all(c.isSatisfied(self._executor, assignment)
+               for c in checks[depth]):
+          bind(depth + 1)
+      del assignment[name]
+
+    bind(0)
+    # Order as in the full product, where the first variable varies fastest
+    self._positions.sort(key=lambda p: p[::-1])
+    self._length = len(self._positions)
+
+  def getPositions(self):
+    """
+    :return list-of-tuple: positions of the values of valid assignments
+    """
+    return self._positions
+
+  def getAssignment(self, index):
+    return self.makeAssignment(self._positions[index])
+
+  def iterPositions(self):
+    for positions in self._positions:
+      yield positions
@@ -0,0 +1,136 @@
+'''Persistent cache of the results of DefineVariables blocks.'''
+
+"""
+A DefinitionCache replaces executing a DefineVariables block with
+loading the names, definitions and constraints that result from it.
+The complete results are stored rather than the names the block
+assigned, since a block can change values in place. The key of a
+block is computed from the source of the block, the key of the
+preceding block of the template, VERSION and the current directory,
+extended with the contents of the files that the block read (see
+output_cache). So a block is only reused if the blocks before it
+were reused or had the same results.
+
+Results are pickled. Modules are pickled by name and namedtuple
+classes created by a block are pickled by their fields. If the
+results of a block cannot be pickled (e.g., the block defines a
+function), the block is executed on every run, as are the blocks
+that follow it. Since results are unpickled, the cache directory
+must only be writable by trusted users.
+"""
+
+from disk_cache import DiskCache, ValuePickler, getModuleFiles,  \
+    makeManifest, readManifest, writeManifest, makeContentKey, makeDigest
+from output_cache import recordOpenedFiles
+import constants
+import io
+import os
+import pickle
+
+
+# Names of the namespace that are not results of blocks
+EXCLUDED_NAMES = ['__builtins__', 'api']
+
+
+class DefinitionCache(object):
+  """
+  Caches the results of the DefineVariables blocks of a template
+  on disk. A DefinitionCache is used for one run of a template
+  since the key of a block depends on the blocks before it.
+  """
+
+  def __init__(self, directory, max_bytes=constants.DEFINITION_CACHE_BYTES):
+    """
+    :param str directory: directory holding the cache
+    :param int max_bytes: limit on the size of the cache
+    """
+    self._cache = DiskCache(directory, max_bytes)
+    self._directory = directory
+    # Key of the results of the preceding block; None if the results
+    # of a preceding block could not be cached
+    # Relative paths opened by blocks depend on the current directory
+    self._key = makeDigest([constants.VERSION, os.getcwd()])
+    self.hits = 0
+    self.misses = 0
+
+  def doScript(self, executor, program):
+    """
+    Executes a DefineVariables block or loads its results.
+    :param Executor executor:
+    :param str program: source of the block
+    :return bool: True if the results were loaded from the cache
+    """
+    if self._key is None:
+      executor.doScript(program)
+      return False
+    block_key = makeDigest([self._key, program])
+    if self._load(executor, block_key):
+      return True
+    self.misses += 1
+    self._key = None
+    with recordOpenedFiles() as paths:
+      executor.doScript(program)
+    names = dict([(k, v) for k, v in executor.getNamespace().items()
+                  if not k in EXCLUDED_NAMES])
+    stream = io.BytesIO()
+    try:
+      ValuePickler(stream, pickle.HIGHEST_PROTOCOL).dump((names,
+          executor.getDefinitions(), executor.getConstraints()))
+    except Exception:
+      # Later blocks may depend on the results of this block
+      return False
+    paths.update(getModuleFiles(names))
+    manifest = makeManifest(paths,
+        excluded_directories=[self._directory])
+    content_key = makeContentKey(block_key, manifest)
+    if content_key is None:
+      return False
+    writeManifest(self._cache, block_key, manifest)
+    self._cache.put(content_key, stream.getvalue())
+    self._key = content_key
+    return False
+
+  def _load(self, executor, block_key):
+    """
+    Replaces the names, definitions and constraints of the executor
+    with the cached results of a block.
+    :param Executor executor:
+    :param str block_key:
+    :return bool: True if the results were found
+    """
+    manifest = readManifest(self._cache, block_key)
+    if manifest is None:
+      return False
+    content_key = makeContentKey(block_key, manifest)
+    if content_key is None:
+      return False
+    data = self._cache.get(content_key)
+    if data is None:
+      return False
+    try:
+      names, definitions, constraints = pickle.loads(data)
+    except Exception:
+      return False
+    executor.deleteNames([n for n in executor.getNamespace().keys()
+                          if not n in EXCLUDED_NAMES and not n in names])
+    executor.addNamespace(names)
+    api_object = executor.getNamespace()['api']
+    api_object.clearDefinitions()
+    api_object.addDefinitions(definitions)
+    api_object.clearConstraints()
+    api_object.addConstraints(constraints)
+    self.hits += 1
+    self._key = content_key
+    return True
+
+  def close(self):
+    """
+    Evicts entries if the cache is too large.
+    """
+    self._cache.evict()
+
+  def getStatistics(self):
+    """
+    :return dict: hits and misses
+    """
+    return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,361 @@
+'''Size-bounded cache of files in a directory.'''
+
+"""
+Besides DiskCache, this module has the helpers shared by the caches
+built on it: digests of strings and files, manifests of the files
+that a result depends on, and a pickler for values defined by
+templates.
+"""
+
+import collections
+import hashlib
+import importlib
+import json
+import os
+import pickle
+import shutil
+import site
+import sys
+import tempfile
+import types
+
+
+HASH_BLOCK_BYTES = 2**20
+# Directories whose files are not dependencies
+LIBRARY_DIRECTORIES = sorted(set([os.path.abspath(p) for p in
+    [sys.prefix, sys.base_prefix, sys.exec_prefix, site.USER_SITE or "",
+    os.path.dirname(os.path.abspath(__file__)), "/dev", "/proc", "/sys"]
+    if len(p) > 0]))
+
+
+def getModuleFiles(namespace):
+  """
+  Finds the files of the modules whose objects are in the namespace.
+  :param dict namespace:
+  :return set-of-str:
+  """
+  paths = set()
+  for name, value in namespace.items():
+    if name == '__builtins__':
+      continue
+    if isinstance(value, types.ModuleType):
+      module = value
+    else:
+      module = sys.modules.get(getattr(value, '__module__', None) or "")
+    path = getattr(module, '__file__', None)
+    if isinstance(path, str):
+      paths.add(path)
+  return paths
+
+def hashFile(path):
+  """
+  :param str path:
+  :return str: hex digest; None if the file cannot be read
+  """
+  digest = hashlib.sha256()
+  try:
+    with open(path, 'rb') as infile:
+      for block in iter(lambda: infile.read(HASH_BLOCK_BYTES), b""):
+        digest.update(block)
+  except (IOError, OSError):
+    return None
+  return digest.hexdigest()
+
+def makeDigest(parts):
+  """
+  :param list-of-str parts:
+  :return str: hex digest that distinguishes the sequence of parts
+  """
+  digest = hashlib.sha256()
+  for part in parts:
+    encoded = part.encode('utf-8')
+    digest.update(str(len(encoded)).encode('ascii'))
+    digest.update(b":")
+    digest.update(encoded)
+  return digest.hexdigest()
+
+def _isDependency(path, excluded_paths, excluded_directories):
+  """
+  :param str path: absolute path of a file read
+  :param list-of-str excluded_paths: absolute paths
+  :param list-of-str excluded_directories: absolute paths
+  :return bool:
+  """
+  if path in excluded_paths:
+    return False
+  for directory in excluded_directories + LIBRARY_DIRECTORIES:
+    if path.startswith(directory + os.sep):
+      return False
+  return os.path.isfile(path)
+
+def makeManifest(paths, excluded_paths=None, excluded_directories=None):
+  """
+  Describes the files that are dependencies, omitting files that
+  are not expected to change.
+  :param iterable-of-str paths: files read
+  :param list-of-str excluded_paths: files that are not dependencies
+  :param list-of-str excluded_directories: directories whose files
+      are not dependencies
+  :return list-of-(str, int, int, str): path, size, modification
+      time and hex digest of each dependency
+  """
+  excluded_paths = [os.path.abspath(p) for p in excluded_paths or []]
+  excluded_directories = [os.path.abspath(d)
+      for d in excluded_directories or []]
+  manifest = set()
+  for path in set([os.path.abspath(p) for p in paths]):
+    if path.endswith(".pyc"):
+      # A module that is imported is read from its cached bytecode
+      import importlib.util
+      try:
+        path = importlib.util.source_from_cache(path)
+      except ValueError:
+        pass
+    if not _isDependency(path, excluded_paths, excluded_directories):
+      continue
+    try:
+      stat = os.stat(path)
+    except OSError:
+      continue
+    digest = hashFile(path)
+    if digest is not None:
+      manifest.add((path, stat.st_size, stat.st_mtime_ns, digest))
+  return sorted(manifest)
+
+def readManifest(cache, key):
+  """
+  :param DiskCache cache:
+  :param str key:
+  :return list: see makeManifest; None if not found
+  """
+  data = cache.get(key)
+  if data is None:
+    return None
+  return [tuple(d) for d in json.loads(data.decode('utf-8'))]
+
+def writeManifest(cache, key, manifest):
+  """
+  :param DiskCache cache:
+  :param str key:
+  :param list manifest: see makeManifest
+  """
+  cache.put(key, json.dumps(manifest).encode('utf-8'))
+
+def makeContentKey(key, manifest):
+  """
+  Extends a key with the current contents of the dependencies in a
+  manifest. A file that has the size and modification time recorded
+  in the manifest is assumed not to have changed.
+  :param str key:
+  :param list manifest: see makeManifest
+  :return str: None if a dependency cannot be read
+  """
+  parts = [key]
+  for path, size, mtime_ns, digest in manifest:
+    try:
+      stat = os.stat(path)
+    except OSError:
+      return None
+    if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+      digest = hashFile(path)
+      if digest is None:
+        return None
+    parts.extend([path, digest])
+  return makeDigest(parts)
+
+
+def _makeNamedTuple(name, fields, defaults, module):
+  return collections.namedtuple(name, fields, defaults=defaults,
+      module=module)
+
+def _isImportable(cls):
+  """
+  :param type cls:
+  :return bool: True if pickle can find the class by its name
+  """
+  module = sys.modules.get(cls.__module__)
+  value = module
+  for name in cls.__qualname__.split('.'):
+    value = getattr(value, name, None)
+  return value is cls
+
+
+class ValuePickler(pickle.Pickler):
+  """
+  Pickles modules by name and namedtuple classes that cannot be
+  found by name by their fields.
+  """
+
+  def reducer_override(self, obj):
+    if isinstance(obj, types.ModuleType):
+      return importlib.import_module, (obj.__name__,)
+    if isinstance(obj, type) and obj.__bases__ == (tuple,)  \
+        and hasattr(obj, '_fields') and not _isImportable(obj):
+      defaults = tuple(obj._field_defaults.values()) or None
+      return _makeNamedTuple, (obj.__name__, obj._fields, defaults,
+          obj.__module__)
+    return NotImplemented
+
+
+class DiskCache(object):
+  """
+  Stores entries as files in a directory, one file per key.
+  Using an entry updates its modification time, and eviction
+  removes the least recently used entries until the total size
+  of the entries is within the limit. Keys must be usable as
+  file names (e.g., hex digests).
+  """
+
+  def __init__(self, directory, max_bytes):
+    """
+    :param str directory: directory holding the entries; created if needed
+    :param int max_bytes: limit on the total size of the entries
+    """
+    self._directory = directory
+    self._max_bytes = max_bytes
+    self.hits = 0
+    self.misses = 0
+    if not os.path.isdir(directory):
+      os.makedirs(directory)
+
+  def getPath(self, key):
+    """
+    :param str key:
+    :return str: path of the file for the entry
+    """
+    return os.path.join(self._directory, key[:2], key)
+
+  def _makeTemporary(self, path):
+    """
+    Creates a temporary file next to the path so that the entry
+    is added with an atomic rename.
+    :param str path: path of the entry
+    :return int, str: file descriptor and path of the temporary file
+    """
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+      os.makedirs(directory, exist_ok=True)
+    return tempfile.mkstemp(dir=directory, prefix=".tmp")
+
+  def get(self, key):
+    """
+    :param str key:
+    :return bytes: None if there is no entry
+    """
+    path = self.getPath(key)
+    try:
+      with open(path, 'rb') as infile:
+        data = infile.read()
+    except (IOError, OSError):
+      self.misses += 1
+      return None
+    self.touch(key)
+    self.hits += 1
+    return data
+
+  def contains(self, key):
+    """
+    :param str key:
+    :return bool:
+    """
+    return os.path.isfile(self.getPath(key))
+
+  def touch(self, key):
+    """
+    Marks the entry as most recently used.
+    :param str key:
+    """
+    try:
+      os.utime(self.getPath(key), None)
+    except OSError:
+      pass
+
+  def put(self, key, data):
+    """
+    :param str key:
+    :param bytes data:
+    """
+    path = self.getPath(key)
+    fd, temporary_path = self._makeTemporary(path)
+    with os.fdopen(fd, 'wb') as outfile:
+      outfile.write(data)
+    os.replace(temporary_path, path)
+
+  def putFile(self, key, source_path):
+    """
+    Adds a copy of a file as the entry.
+    :param str key:
+    :param str source_path:
+    """
+    path = self.getPath(key)
+    fd, temporary_path = self._makeTemporary(path)
+    os.close(fd)
+    shutil.copyfile(source_path, temporary_path)
+    os.replace(temporary_path, path)
+
+  def moveFile(self, key, source_path):
+    """
+    Makes a file the entry, removing the file. The file should be
+    on the same file system as the cache (e.g., from makeTemporary).
+    :param str key:
+    :param str source_path:
+    """
+    path = self.getPath(key)
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+      os.makedirs(directory, exist_ok=True)
+    os.replace(source_path, path)
+
+  def makeTemporary(self, suffix=""):
+    """
+    Creates a file in the cache directory that is not an entry.
+    :param str suffix: suffix of the file name
+    :return str: path of the file
+    """
+    fd, path = tempfile.mkstemp(dir=self._directory, prefix=".tmp",
+        suffix=suffix)
+    os.close(fd)
+    return path
+
+  def getSize(self):
+    """
+    :return int: total size in bytes of the entries
+    """
+    return sum([s for _, s, _ in self._getEntries()])
+
+  def _getEntries(self):
+    """
+    :return list-of-(str, int, float): path, size and modification time
+    """
+    entries = []
+    for directory, _, names in os.walk(self._directory):
+      for name in names:
+        if name.startswith(".tmp"):
+          continue
+        path = os.path.join(directory, name)
+        try:
+          stat = os.stat(path)
+        except OSError:
+          continue
+        entries.append((path, stat.st_size, stat.st_mtime))
+    return entries
+
+  def evict(self):
+    """
+    Removes the least recently used entries until the total size
+    is no larger than the limit.
+    :return int: number of entries removed
+    """
+    entries = self._getEntries()
+    size = sum([e[1] for e in entries])
+    num_removed = 0
+    for path, entry_size, _ in sorted(entries, key=lambda e: e[2]):
+      if size <= self._max_bytes:
+        break
+      try:
+        os.remove(path)
+      except OSError:
+        continue
+      size -= entry_size
+      num_removed += 1
+    return num_removed
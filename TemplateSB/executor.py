@@ -1,16 +1,75 @@
 '''Evaluates expressions in a namespace.'''
 
 from api import Api
+from constants import EXPRESSION_CACHE_SIZE
+from fast_evaluator import makeEvaluator
+from lru_cache import LRUCache
+import ast
+import builtins
+import threading
+import types
+
+
+class Namespace(dict):
+  """
+  Names of an Executor. While an expression is evaluated, the values
+  of template variables given to the current thread are found before
+  the names of the namespace. So functions and methods defined in the
+  namespace, whose globals are the namespace, see them as globals
+  without the namespace being changed.
+  """
+
+  def __init__(self, *args, **kwargs):
+    super(Namespace, self).__init__(*args, **kwargs)
+    self._local = threading.local()
+
+  def __getitem__(self, name):
+    names = getattr(self._local, 'names', None)
+    if names is not None and name in names:
+      return names[name]
+    return dict.__getitem__(self, name)
+
+  def evaluate(self, code, names):
+    """
+    Evaluates code with the names seen as globals by the current thread.
+    :param code code:
+    :param dict names:
+    """
+    previous = getattr(self._local, 'names', None)
+    self._local.names = names
+    try:
+      return eval(code, self)
+    finally:
+      self._local.names = previous
+
 
 class Executor(object):
   """
   Executes statements and expressions.
   Manages the name space and access to definitions.
+  Simple expressions are evaluated by closures made by makeEvaluator
+  rather than by eval. Expressions do not change the namespace, so
+  values of template variables are passed to doExpression as names
+  rather than added to the namespace. An expression with nested
+  scopes or a call to a function other than a builtin sees them as
+  globals of the Namespace for the current thread.
   """
 
-  def __init__(self):
+  def __init__(self, cache_size=EXPRESSION_CACHE_SIZE,
+      expression_cache=None):
+    """
+    :param int cache_size: maximum number of compiled expressions kept
+    :param LRUCache expression_cache: compiled expressions shared with
+        other Executors; one of cache_size entries is created if None
+    """
     self._api = Api()
-    self._namespace = {'api': self._api}
+    self._namespace = Namespace({'api': self._api})
+    # Values are (code, evaluator, has_scopes, names, has_calls);
+    # evaluator is None if eval is used. They do not depend on the
+    # namespace.
+    if expression_cache is None:
+      expression_cache = LRUCache(cache_size)
+    self._expression_cache = expression_cache
 
   def addNamespace(self, namespace):
     """
@@ -28,14 +87,64 @@ class Executor(object):
     for name in names:
       del self._namespace[name]
 
-  def doExpression(self, expression):
+  def doExpression(self, expression, names=None):
     """
     Evaluates the expression in the namespace, returning
     the result.
     :param str expression: python expression
+    :param dict names: names used in preference to the namespace
+    """
+    code, evaluator, has_scopes, expression_names, has_calls =  \
+        self._getCompiled(expression)
+    if evaluator is not None:
+      return evaluator(self._namespace, names)
+    if names and (has_scopes or has_calls
+        or any([isinstance(self._namespace.get(n), types.FunctionType)
+                for n in expression_names])):
+      # Lambdas, comprehensions and functions only see globals
+      return self._namespace.evaluate(code, names)
+    return eval(code, self._namespace, names)
+
+  def _getCompiled(self, expression):
+    """
+    Compiles the expression, reusing the result for an expression
+    that has already been compiled.
+    :param str expression: python expression
+    :return code, function, bool, frozenset-of-str, bool: evaluator is
+        None if not supported; has_scopes is True if the expression has
+        nested scopes; names are those referenced by the expression;
+        has_calls is True if it calls a function other than a builtin
     """
-    result = eval(expression, self._namespace)
-    return result
+    compiled = self._expression_cache.get(expression)
+    if compiled is None:
+      code = compile(expression, '<expression>', 'eval')
+      has_scopes = any([isinstance(c, type(code)) for c in code.co_consts])
+      tree = ast.parse(expression, mode='eval')
+      expression_names = frozenset([n.id for n in ast.walk(tree)
+                                    if isinstance(n, ast.Name)])
+      has_calls = any([isinstance(n, ast.Call)
+          and not (isinstance(n.func, ast.Name)
+                   and hasattr(builtins, n.func.id))
+          for n in ast.walk(tree)])
+      compiled = (code, makeEvaluator(expression), has_scopes,
+          expression_names, has_calls)
+      self._expression_cache.put(expression, compiled)
+    return compiled
+
+  def compileExpression(self, expression):
+    """
+    Compiles the expression, reusing the code object of an
+    expression that has already been compiled.
+    :param str expression: python expression
+    :return code:
+    """
+    return self._getCompiled(expression)[0]
+
+  def getCacheStatistics(self):
+    """
+    :return dict: hits, misses and size of the compiled expression cache
+    """
+    return self._expression_cache.getStatistics()
 
   def doScript(self, program):
     """
@@ -44,6 +153,12 @@ class Executor(object):
     """
     exec(program, self._namespace)
 
+  def getNamespace(self):
+    """
+    :return dict: names available to expressions and statements
+    """
+    return self._namespace
+
   def getDefinitions(self):
     """
     :return dict: Variable definitions
@@ -57,3 +172,14 @@ class Executor(object):
     api_object = self._namespace['api']
     api_object.addDefinitions(definitions)
 
+  def getConstraints(self):
+    """
+    :return list: constraints on the values of template variables
+    """
+    return self._namespace['api'].getConstraints()
+
+  def setConstraints(self, constraints):
+    """
+    :param list constraints: python expressions or functions
+    """
+    self._namespace['api'].addConstraints(constraints)
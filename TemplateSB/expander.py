@@ -1,8 +1,24 @@
 '''Class that does string expansion using template expressions.'''
 
-from constants import EXPRESSION_START, EXPRESSION_END,  \
-    WARNING_ASSIGNMENTS
-import re
+from assignment_space import AssignmentSpace
+from constrained_space import Constraint, ConstrainedAssignmentSpace
+from config import Config
+from constants import VECTORIZE_MIN_ASSIGNMENTS
+from expansion_plan import LineEstimate
+from instrumentation import PHASE_ENUMERATE, PHASE_VECTORIZE,  \
+    PHASE_EVALUATE, PHASE_RENDER, COUNT_ASSIGNMENTS, COUNT_EVALUATIONS,  \
+    COUNT_VECTORIZED, COUNT_DUPLICATES
+from render_plan import RenderPlan
+from vectorizer import Vectorizer
+import ast
+import builtins
+import time
+import types
+
+
+# Names whose use in an expression can access template variables
+# without naming them explicitly
+DYNAMIC_NAMES = ['eval', 'exec', 'globals', 'locals', 'vars']
 
 
 class Expander(object):
@@ -14,47 +30,162 @@ class Expander(object):
   the values of the template variables.
   """
 
-  def __init__(self, executor, message,
-       left_delim=EXPRESSION_START, right_delim=EXPRESSION_END):
+  def __init__(self, executor, message, config=None,
+       instrumentation=None):
     """
     :param Executor executor:
     :param StatusMessage message:
-    :param char left_delim: left delimiter for a template expression
-    :param char right_delim: right delim for a template expression
+    :param Config config: syntax of the template; default if None
+    :param Instrumentation instrumentation: None if not instrumented
     """
+    if config is None:
+      config = Config.getDefault()
+    self._instrumentation = instrumentation
     self._executor = executor
     self._message = message
-    self._left_delim = left_delim
-    self._right_delim = right_delim
+    self._config = config
+    self._pattern = config.getScanner().getExpressionPattern()
 
   @classmethod
   def makeSubstitutionList(cls, definitions):
     """
-    Creates a list of dictionaries that constitute the combinations
-    of assignment of values to the template variables.
+    Creates the combinations of assignment of values to the
+    template variables.
     Suppose that the defintions are the dictionary
     {'a': ['a1', 'a2'], 'b': ['b1', 'b2', 'b3']}.
-    Then a substituion list will be a list of dictionaries, each of which
+    Then the substitutions are dictionaries, each of which
     has a key for the two targets ('a' and 'b') and every combination of
     value for the keys. Assume the default left and right delimiters. In this case:
       [ {'a': 'a1', 'b': 'b1'}, ['a': 'a2', 'b': 'b1'},
         {'a': 'a1', 'b': 'b2'}, ['a': 'a2', 'b': 'b2'},
         {'a': 'a1', 'b': 'b3'}, ['a': 'a2', 'b': 'b3'}
       ]
+    The assignments are decoded on demand rather than stored.
     :param dict definitions: key is target name, value is list of replacements
-    :return list-of-dict:
-    """
-    substitutions = [{}]
-    for key in definitions.keys():
-      accum_list = []
-      for val in definitions[key]:
-        # Create a substituion for this key and value
-        new_list = [dict(d) for d in substitutions]
-        tgt = key
-        _ = [d.update({tgt: val}) for d in new_list]
-        accum_list.extend(new_list)
-      substitutions = list(accum_list)
-    return [d for d in substitutions if len(d.keys()) > 0]
+    :return AssignmentSpace:
+    """
+    return AssignmentSpace(definitions)
+
+  @classmethod
+  def getExpressionNames(cls, expression, namespace=None):
+    """
+    Finds the names referenced in a python expression. A function or
+    method defined in the namespace can read template variables as
+    globals, so the names of an expression that uses a function
+    defined in the namespace or calls a function other than a builtin
+    cannot be determined.
+    :param str expression: python expression
+    :param dict namespace: names defined by DefineVariables blocks
+    :return set-of-str: names referenced; None if they cannot be determined
+    """
+    try:
+      tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError:
+      return None
+    names = set([n.id for n in ast.walk(tree) if isinstance(n, ast.Name)])
+    if len(names.intersection(DYNAMIC_NAMES)) > 0:
+      return None
+    if namespace is not None:
+      if any([isinstance(namespace.get(n), types.FunctionType)
+              for n in names])  \
+          or not cls.callsOnlyBuiltins(expression, namespace):
+        return None
+    return names
+
+  @classmethod
+  def callsOnlyBuiltins(cls, expression, namespace):
+    """
+    Determines if the only functions called by an expression are
+    builtins, whose results depend only on their arguments.
+    :param str expression: python expression
+    :param dict namespace: names that can hide builtins
+    :return bool:
+    """
+    try:
+      tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError:
+      return False
+    for node in ast.walk(tree):
+      if isinstance(node, ast.Call):
+        function = node.func
+        if not isinstance(function, ast.Name) or function.id in namespace  \
+            or not hasattr(builtins, function.id):
+          return False
+    return True
+
+  @classmethod
+  def getReferencedDefinitions(cls, expressions, definitions,
+      namespace=None):
+    """
+    Finds the definitions of the template variables used in the
+    expressions. Variables are kept in the order of the definitions
+    so that expansions are produced in the same order as for all
+    of the definitions.
+    :param list-of-str expressions: template expressions
+    :param dict definitions: key is target name, value is list of replacements
+    :param dict namespace: names defined by DefineVariables blocks
+    :return dict: definitions for the variables referenced
+    """
+    names = set()
+    for expression in expressions:
+      expression_names = cls.getExpressionNames(expression,
+          namespace=namespace)
+      if expression_names is None:
+        return dict(definitions)
+      names.update(expression_names)
+    return dict([(k, v) for k, v in definitions.items() if k in names])
+
+  def getConstraints(self, definitions):
+    """
+    Finds the constraints that apply to an expansion over the
+    definitions, those whose template variables are all defined.
+    :param dict definitions: definitions of the variables in the expansion
+    :return list-of-Constraint:
+    """
+    all_definitions = self._executor.getDefinitions()
+    constraints = []
+    for predicate in self._executor.getConstraints():
+      constraint = Constraint(predicate)
+      variables = constraint.getVariables(all_definitions)
+      if len(variables) > 0 and variables.issubset(definitions.keys()):
+        constraints.append(constraint)
+    return constraints
+
+  def getDependencies(self, segment):
+    """
+    Finds the values of the names referenced by the template
+    expressions in the segment. Names that are neither template
+    variables nor defined in the namespace (e.g., builtins) are omitted.
+    :param str segment:
+    :return dict: key is name, value is ('variable', list of values) for
+        a template variable and ('name', value) for another name;
+        variables are in the order of the definitions; None if the
+        names cannot be determined
+    """
+    names = set()
+    for expression in self.getTemplateExpressions(segment):
+      expression_names = Expander.getExpressionNames(expression,
+          namespace=self._executor.getNamespace())
+      if expression_names is None:
+        return None
+      names.update(expression_names)
+    definitions = self._executor.getDefinitions()
+    namespace = self._executor.getNamespace()
+    dependencies = {}
+    referenced_definitions = dict([(k, v)
+        for k, v in definitions.items() if k in names])
+    for idx, constraint in enumerate(
+        self.getConstraints(referenced_definitions)):
+      dependencies["constraint %d" % idx] = ('constraint',
+          constraint.getPredicate())
+      names.update(constraint.getNames())
+    for name, values in definitions.items():
+      if name in names:
+        dependencies[name] = ('variable', values)
+    for name in names:
+      if not name in definitions and name in namespace:
+        dependencies[name] = ('name', namespace[name])
+    return dependencies
 
   def getTemplateExpressions(self, stg):
     """
@@ -63,14 +194,58 @@ class Expander(object):
     :param str stg: string to process
     :return list-of-str: Unique template expressions without delimiters
     """
-    # Single template variable
-    pattern_str = "\%s[^%s]+\%s"  \
-       % (self._left_delim, self._left_delim, self._right_delim)
-    pat = re.compile(pattern_str)  # Single template variable
-    raw_expressions = set(pat.findall(stg))
-    expressions = [e[1:-1].strip() for e in raw_expressions]
-    return expressions
+    return RenderPlan(stg, self._pattern).getExpressions()
       
+  def _estimateLength(self, expression, definitions, assignment):
+    """
+    Estimates the UTF-8 length of the value of an expression.
+    :param str expression:
+    :param dict definitions: definitions of the referenced variables
+    :param dict assignment: values used to evaluate the expression
+    :return float:
+    """
+    if expression in definitions:
+      values = definitions[expression]
+      return sum([len(str(v).encode('utf-8')) for v in values])  \
+          / float(len(values))
+    try:
+      value = self._executor.doExpression(expression, names=assignment)
+      return len(str(value).encode('utf-8'))
+    except Exception:
+      return len(expression.encode('utf-8'))
+
+  def estimate(self, segment, line_number=0):
+    """
+    Estimates the size of the expansion of a segment without
+    expanding it. Assignments excluded by constraints are counted,
+    so the estimate is an upper bound on the number of lines.
+    :param str segment: segment of the template
+    :param int line_number: source line number of the segment
+    :return LineEstimate:
+    """
+    cls = Expander
+    plan = RenderPlan(segment, self._pattern)
+    definitions = cls.getReferencedDefinitions(plan.getExpressions(),
+        self._executor.getDefinitions(),
+        namespace=self._executor.getNamespace())
+    space = cls.makeSubstitutionList(definitions)
+    num_assignments = len(space) if len(definitions) > 0 else 1
+    assignment = {}
+    if len(space) > 0:
+      assignment = space.getAssignment(0)
+    line_bytes = plan.getLiteralBytes()
+    line_bytes += sum([self._estimateLength(e, definitions, assignment)
+                       for e in plan.getSlotExpressions()])
+    lines = num_assignments
+    num_bytes = num_assignments*(line_bytes + 1)
+    if num_assignments > 1:
+      # The template line is output as a comment
+      lines += 1
+      num_bytes += len(self._config.comment_stg)  \
+          + len(segment.encode('utf-8')) + 1
+    return LineEstimate(line_number, segment, list(definitions.keys()),
+        num_assignments, lines, int(round(num_bytes)))
+
   def do(self, segment):
     """
     Creates a set of substitutions of template expressions using the
@@ -81,33 +256,114 @@ class Expander(object):
     :raises ValueError: if not all template expressions are eliminated
     """
     substitutions = []
+    # Set of the substitutions for constant time duplicate checks;
+    # the list keeps the order in which they are first seen
+    found_substitutions = set()
     cls = Expander
-    # Create the combinations of assignments of values to variables
-    definitions = self._executor.getDefinitions()
-    assignments = cls.makeSubstitutionList(definitions)
-    if len(assignments) > WARNING_ASSIGNMENTS:
-      msg = "Very large number of assignments: %d!" % len(assignments)
+    plan = RenderPlan(segment, self._pattern)
+    expressions = plan.getExpressions()
+    # Create the combinations of assignments of values to the
+    # variables referenced in the segment
+    definitions = cls.getReferencedDefinitions(expressions,
+        self._executor.getDefinitions(),
+        namespace=self._executor.getNamespace())
+    stats = self._instrumentation
+    if stats is not None:
+      start = time.perf_counter()
+    constraints = self.getConstraints(definitions)
+    if len(constraints) > 0:
+      assignments = ConstrainedAssignmentSpace(definitions, constraints,
+          self._executor)
+    else:
+      assignments = cls.makeSubstitutionList(definitions)
+    if len(definitions) == 0 and len(expressions) > 0:
+      # Expressions that use no template variable are evaluated once
+      all_positions = [()]
+      num_assignments = 1
+    else:
+      all_positions = assignments.iterPositions()
+      num_assignments = len(assignments)
+    if num_assignments > self._config.warning_assignments:
+      msg = "Very large number of assignments: %d!" % num_assignments
       self._message.warning(msg)
-    expressions = self.getTemplateExpressions(segment)
-    for assignment in assignments:
-      self._executor.addNamespace(assignment)
-      substitution = segment
-      for expression in expressions:
-        target = "%s%s%s" % (self._left_delim,
-            expression, self._right_delim)
-        replacement = self._executor.doExpression(expression)
-        new_string = substitution.replace(target, str(replacement))
-        substitution = new_string
-      if substitution not in substitutions:
+    if stats is not None:
+      stats.addTime(PHASE_ENUMERATE, time.perf_counter() - start)
+      start = time.perf_counter()
+    # Evaluate arithmetic expressions over all assignments at once.
+    # Small spaces are faster to evaluate one assignment at a time.
+    vectorized = {}
+    if num_assignments >= VECTORIZE_MIN_ASSIGNMENTS:
+      vectorized = Vectorizer.evaluate(expressions, assignments)
+    if stats is not None:
+      stats.addTime(PHASE_VECTORIZE, time.perf_counter() - start)
+      start = time.perf_counter()
+    # Results of the other expressions are memoized on the positions
+    # of the values of the variables that the expression references,
+    # or on all of them if these cannot be determined (e.g., for an
+    # expression that calls a function other than a builtin).
+    memos = {}
+    names = assignments.getNames()
+    namespace = self._executor.getNamespace()
+    for expression in expressions:
+      if expression in vectorized:
+        continue
+      expression_names = cls.getExpressionNames(expression,
+          namespace=namespace)
+      if expression_names is None:
+        indices = list(range(len(names)))
+      else:
+        indices = [i for i, n in enumerate(names) if n in expression_names]
+      memos[expression] = ({}, indices)
+    # One dictionary holds the values of the variables for the
+    # current assignment; the namespace of the executor is unchanged
+    assignment = dict.fromkeys(names)
+    num_positions = 0
+    num_evaluations = 0
+    evaluation_time = 0.0
+    for index, positions in enumerate(all_positions):
+      num_positions += 1
+      replacements = {}
+      for expression, values in vectorized.items():
+        replacements[expression] = values[index]
+      is_assigned = False
+      for expression, (memo, indices) in memos.items():
+        key = tuple([positions[i] for i in indices])
+        replacement = memo.get(key)
+        if replacement is None:
+          if not is_assigned:
+            assignments.updateAssignment(assignment, positions)
+            is_assigned = True
+          num_evaluations += 1
+          if stats is None:
+            replacement = str(self._executor.doExpression(expression,
+                names=assignment))
+          else:
+            evaluation_start = time.perf_counter()
+            replacement = str(self._executor.doExpression(expression,
+                names=assignment))
+            evaluation_time += time.perf_counter() - evaluation_start
+          memo[key] = replacement
+        replacements[expression] = replacement
+      substitution = plan.render(replacements)
+      if substitution not in found_substitutions:
+        found_substitutions.add(substitution)
         substitutions.append(substitution)
-    # Remove the added names
-    self._executor.deleteNames(definitions.keys())
+    if stats is not None:
+      stats.addTime(PHASE_EVALUATE, evaluation_time)
+      stats.addTime(PHASE_RENDER,
+          time.perf_counter() - start - evaluation_time)
+      stats.count(COUNT_ASSIGNMENTS, num_positions)
+      stats.count(COUNT_EVALUATIONS, num_evaluations)
+      stats.count(COUNT_VECTORIZED, len(vectorized))
+      stats.count(COUNT_DUPLICATES, num_positions - len(substitutions))
     # Handle case of no template variable in segment
     if len(substitutions) == 0:
-      substitutions = [segment]
-    # Verify there are no remaining template variables
-    for substitution in substitutions:
-      if len(self.getTemplateExpressions(substitution)) > 0:
+      # Constraints can exclude all assignments
+      if len(constraints) > 0:
+        return substitutions
+      # Template expressions remain if there are no assignments
+      if len(expressions) > 0:
         raise ValueError("Unresolved template expressions in %s"
             % segment)
+      substitutions = [segment]
     return substitutions
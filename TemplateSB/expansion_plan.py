@@ -0,0 +1,95 @@
+'''Estimates of the size of an expansion and limits on it.'''
+
+import collections
+
+
+# Estimate for a template line. variables is a list of the template
+# variables referenced, assignments the number of assignments of
+# values to them, lines and num_bytes the size of the output.
+LineEstimate = collections.namedtuple('LineEstimate',
+    'line_number line variables assignments lines num_bytes')
+
+
+class ExpansionPlan(object):
+  """
+  Estimated output of a template, produced without expanding it.
+  Estimates are upper bounds in that duplicate lines and
+  assignments excluded by constraints are counted.
+  """
+
+  def __init__(self):
+    self._estimates = []  # LineEstimate of each substitution line
+    self._total_lines = 0
+    self._total_bytes = 0
+
+  def addEstimate(self, estimate):
+    """
+    :param LineEstimate estimate: for a line with template expressions
+    """
+    self._estimates.append(estimate)
+    self.addOutput(estimate.lines, estimate.num_bytes)
+
+  def addOutput(self, lines, num_bytes):
+    """
+    :param int lines: number of lines output
+    :param int num_bytes: size of the lines output
+    """
+    self._total_lines += lines
+    self._total_bytes += num_bytes
+
+  def getEstimates(self):
+    """
+    :return list-of-LineEstimate:
+    """
+    return list(self._estimates)
+
+  def getTotalLines(self):
+    return self._total_lines
+
+  def getTotalBytes(self):
+    return self._total_bytes
+
+  def format(self):
+    """
+    :return str: report of the plan
+    """
+    lines = ["%6s %12s %12s %14s  %s" % ("line", "assignments", "lines",
+        "bytes", "variables")]
+    for estimate in self._estimates:
+      lines.append("%6d %12d %12d %14d  %s" % (estimate.line_number,
+          estimate.assignments, estimate.lines, estimate.num_bytes,
+          ", ".join(estimate.variables)))
+    lines.append("Total: %d lines, %d bytes"
+        % (self._total_lines, self._total_bytes))
+    return '\n'.join(lines)
+
+
+class Budget(object):
+  """
+  Limits on the size of an expansion. A limit of None is not checked.
+  """
+
+  def __init__(self, max_lines_per_line=None, max_total_bytes=None):
+    """
+    :param int max_lines_per_line: maximum number of lines output
+        for a template line
+    :param int max_total_bytes: maximum size of the output
+    """
+    self._max_lines_per_line = max_lines_per_line
+    self._max_total_bytes = max_total_bytes
+
+  def check(self, estimate, total_bytes):
+    """
+    :param LineEstimate estimate: estimate for the next template line
+    :param int total_bytes: size of the output including the line
+    :return str: description of the limit exceeded; None if none is
+    """
+    if self._max_lines_per_line is not None  \
+        and estimate.lines > self._max_lines_per_line:
+      return "Expansion of %d lines exceeds the limit of %d lines"  \
+          % (estimate.lines, self._max_lines_per_line)
+    if self._max_total_bytes is not None  \
+        and total_bytes > self._max_total_bytes:
+      return "Output of %d bytes exceeds the limit of %d bytes"  \
+          % (total_bytes, self._max_total_bytes)
+    return None
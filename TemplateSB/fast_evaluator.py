@@ -0,0 +1,121 @@
+'''Evaluates common forms of template expressions without eval.'''
+
+"""
+Most template expressions are a variable, possibly followed by
+attribute accesses and indexing, as in {a}, {CT.name} or {v[0]}.
+Such an expression is translated into nested closures that are called
+with the namespace of the Executor, which is faster than eval. For
+expressions with operators or calls eval is as fast or faster, so
+they are not translated.
+"""
+
+import ast
+import builtins
+
+
+class UnsupportedExpression(Exception):
+  pass
+
+
+def _lookupBuiltin(namespace, name):
+  """
+  Finds a name in the builtins used by eval for the namespace.
+  :param dict namespace:
+  :param str name:
+  :return object:
+  :raises NameError: if the name is not defined
+  """
+  names = namespace.get('__builtins__', builtins)
+  if not isinstance(names, dict):
+    names = names.__dict__
+  try:
+    return names[name]
+  except KeyError:
+    raise NameError("name '%s' is not defined" % name)
+
+def _makeName(node):
+  name = node.id
+
+  def evaluate(namespace, names):
+    if names is not None and name in names:
+      return names[name]
+    if name in namespace:
+      return namespace[name]
+    return _lookupBuiltin(namespace, name)
+
+  return evaluate
+
+def _makeConstant(node):
+  value = node.value
+  return lambda namespace, names: value
+
+def _makeAttribute(node):
+  if node.attr.startswith('_'):
+    raise UnsupportedExpression("private attribute")
+  value = _makeNode(node.value)
+  attribute = node.attr
+  return lambda namespace, names: getattr(value(namespace, names), attribute)
+
+def _makeSubscript(node):
+  value = _makeNode(node.value)
+  index = node.slice
+  if isinstance(index, getattr(ast, 'Index', ())):
+    index = index.value  # Python before 3.9
+  # Constant indices, as in v[0] or d['k'], are not called
+  if isinstance(index, ast.Constant):
+    key_value = index.value
+    return lambda namespace, names: value(namespace, names)[key_value]
+  key = _makeNode(index)
+  return lambda namespace, names: value(namespace, names)[
+      key(namespace, names)]
+
+def _makeSlice(node):
+  parts = [None if p is None else _makeNode(p)
+           for p in [node.lower, node.upper, node.step]]
+
+  def evaluate(namespace, names):
+    return slice(*[None if p is None else p(namespace, names)
+                   for p in parts])
+
+  return evaluate
+
+def _makeTuple(node):
+  elements = [_makeNode(e) for e in node.elts]
+  return lambda namespace, names: tuple([e(namespace, names)
+                                         for e in elements])
+
+MAKERS = {
+    ast.Name: _makeName,
+    ast.Constant: _makeConstant,
+    ast.Attribute: _makeAttribute,
+    ast.Subscript: _makeSubscript,
+    ast.Slice: _makeSlice,
+    ast.Tuple: _makeTuple,
+    }
+
+def _makeNode(node):
+  """
+  :param ast.AST node:
+  :return function: evaluates the node given the namespace and names
+  :raises UnsupportedExpression:
+  """
+  maker = MAKERS.get(type(node))
+  if maker is None:
+    raise UnsupportedExpression(type(node).__name__)
+  if isinstance(node, (ast.Name, ast.Attribute, ast.Subscript, ast.Tuple))  \
+      and not isinstance(node.ctx, ast.Load):
+    raise UnsupportedExpression("assignment")
+  return maker(node)
+
+def makeEvaluator(expression):
+  """
+  Translates an expression into a function evaluate(namespace, names)
+  that gives the same result as eval(expression, namespace, names).
+  :param str expression: python expression
+  :return function: None if the expression is not supported
+  """
+  try:
+    tree = ast.parse(expression.strip(), mode='eval')
+    return _makeNode(tree.body)
+  except (SyntaxError, UnsupportedExpression):
+    return None
@@ -0,0 +1,103 @@
+'''Timers and counters for the phases of template processing.'''
+
+import heapq
+import threading
+
+
+NUM_SLOWEST_LINES = 10
+# Phases of processing
+PHASE_EXTRACT = "extract"  # Reading and classifying lines
+PHASE_DEFINE = "define"  # Executing DefineVariables blocks
+PHASE_EXPAND = "expand"  # Expanding lines; includes the phases below
+PHASE_ENUMERATE = "enumerate"  # Creating the assignments of values
+PHASE_VECTORIZE = "vectorize"  # Evaluating expressions with NumPy
+PHASE_EVALUATE = "evaluate"  # Evaluating expressions one at a time
+PHASE_RENDER = "render"  # Creating and de-duplicating expanded lines
+PHASES = [PHASE_EXTRACT, PHASE_DEFINE, PHASE_EXPAND, PHASE_ENUMERATE,
+    PHASE_VECTORIZE, PHASE_EVALUATE, PHASE_RENDER]
+# Counters
+COUNT_ASSIGNMENTS = "assignments"  # Assignments enumerated
+COUNT_EVALUATIONS = "evaluations"  # Expressions evaluated one at a time
+COUNT_VECTORIZED = "vectorized"  # Expressions evaluated with NumPy
+COUNT_DUPLICATES = "duplicates"  # Duplicate expanded lines dropped
+COUNT_OUTPUT_LINES = "output_lines"
+COUNT_BYTES = "bytes"  # Bytes emitted, including line separators
+LINE_COUNT_PREFIX = "lines_"  # Prefix for counts of lines by type
+
+
+class Instrumentation(object):
+  """
+  Accumulates the time spent in phases of processing, counts of
+  events, and the template lines that take longest to expand.
+  Objects that are instrumented hold None when instrumentation is
+  disabled so that it costs almost nothing. Statistics can be
+  recorded by several threads.
+  """
+
+  def __init__(self, num_slowest=NUM_SLOWEST_LINES):
+    """
+    :param int num_slowest: number of slowest lines kept
+    """
+    self._num_slowest = num_slowest
+    self._phases = dict([(p, 0.0) for p in PHASES])
+    self._counters = {}
+    self._slowest = []  # Heap of (seconds, line number, line)
+    self._lock = threading.Lock()
+
+  def addTime(self, phase, seconds):
+    """
+    :param str phase:
+    :param float seconds:
+    """
+    with self._lock:
+      self._phases[phase] = self._phases.get(phase, 0.0) + seconds
+
+  def count(self, name, increment=1):
+    """
+    :param str name:
+    :param int increment:
+    """
+    with self._lock:
+      self._counters[name] = self._counters.get(name, 0) + increment
+
+  def addLine(self, seconds, line_number, line):
+    """
+    Records the time to expand a template line, keeping the slowest.
+    :param float seconds:
+    :param int line_number: source line number
+    :param str line:
+    """
+    entry = (seconds, line_number, line)
+    with self._lock:
+      if len(self._slowest) < self._num_slowest:
+        heapq.heappush(self._slowest, entry)
+      elif entry > self._slowest[0]:
+        heapq.heapreplace(self._slowest, entry)
+
+  def getStats(self):
+    """
+    :return dict: 'phases' has seconds by phase, 'counters' has counts,
+        'slowest_lines' is a list of (seconds, line number, line)
+        with the slowest first
+    """
+    with self._lock:
+      return {'phases': dict(self._phases),
+              'counters': dict(self._counters),
+              'slowest_lines': sorted(self._slowest, reverse=True),
+             }
+
+  def format(self):
+    """
+    :return str: report of the statistics
+    """
+    stats = self.getStats()
+    lines = ["Phase times (seconds):"]
+    for phase in PHASES:
+      lines.append("  %-20s %10.4f" % (phase, stats['phases'][phase]))
+    lines.append("Counters:")
+    for name in sorted(stats['counters'].keys()):
+      lines.append("  %-20s %10d" % (name, stats['counters'][name]))
+    lines.append("Slowest template lines:")
+    for seconds, line_number, line in stats['slowest_lines']:
+      lines.append("  %10.4f  line %d: %s" % (seconds, line_number, line))
+    return '\n'.join(lines)
@@ -0,0 +1,147 @@
+'''Persistent cache of the expansions of template lines.'''
+
+from config import Config
+from disk_cache import DiskCache, ValuePickler, getModuleFiles,  \
+    makeManifest, makeDigest
+import constants
+import hashlib
+import io
+import json
+import pickle
+import sys
+import types
+
+
+# Fields of the Config that affect the expansion of a line
+CONFIG_NAMES = ['comment_stg', 'continued_stg', 'expression_start',
+    'expression_end']
+
+
+class FingerprintPickler(ValuePickler):
+  """
+  Pickles a value, recording the modules of the classes and
+  functions that are pickled by name.
+  """
+
+  def __init__(self, stream):
+    super(FingerprintPickler, self).__init__(stream,
+        pickle.HIGHEST_PROTOCOL)
+    self.module_names = set()
+
+  def reducer_override(self, obj):
+    if isinstance(obj, types.ModuleType):
+      self.module_names.add(obj.__name__)
+    elif isinstance(obj, (type, types.FunctionType,
+        types.BuiltinFunctionType)):
+      self.module_names.add(getattr(obj, '__module__', None) or "")
+    return super(FingerprintPickler, self).reducer_override(obj)
+
+
+class LineCache(object):
+  """
+  Caches the expansion of template lines on disk so that a template
+  that is re-run only re-expands the lines whose keys changed.
+  The key of a line is its text, the values of the names that
+  its template expressions reference, the configuration and
+  the version. So, changing a definition only invalidates the lines
+  that reference it. Values are compared by their pickled bytes and
+  the source files of the modules they use; a line that references
+  a value that cannot be pickled is not cached.
+  """
+
+  def __init__(self, directory, max_bytes=constants.LINE_CACHE_BYTES,
+      config=None):
+    """
+    :param str directory: directory holding the cache
+    :param int max_bytes: limit on the size of the cache
+    :param Config config: syntax of the template; default if None
+    """
+    if config is None:
+      config = Config.getDefault()
+    self._cache = DiskCache(directory, max_bytes)
+    self._config_parts = [str(getattr(config, n)) for n in CONFIG_NAMES]
+    # Digests of the source files of modules by module name. The
+    # files are assumed not to change while a template is processed.
+    self._module_digests = {}
+
+  def _getModuleDigest(self, name):
+    """
+    :param str name: name of a module
+    :return str: digest of the source files of the module, omitting
+        those of the Python installation (see disk_cache)
+    """
+    if not name in self._module_digests:
+      module = sys.modules.get(name)
+      paths = set()
+      if module is not None:
+        paths = getModuleFiles({name: module})
+      manifest = makeManifest(paths)
+      self._module_digests[name] = makeDigest([d for _, _, _, d in manifest])
+    return self._module_digests[name]
+
+  def _fingerprint(self, value):
+    """
+    Creates a string that determines the value.
+    :param object value:
+    :return str: None if the value cannot be fingerprinted
+    """
+    stream = io.BytesIO()
+    pickler = FingerprintPickler(stream)
+    try:
+      pickler.dump(value)
+    except Exception:
+      return None
+    parts = [hashlib.sha256(stream.getvalue()).hexdigest()]
+    for name in sorted(pickler.module_names):
+      parts.append(self._getModuleDigest(name))
+    return " ".join(parts)
+
+  def makeKey(self, line, dependencies):
+    """
+    :param str line: template line
+    :param dict dependencies: values of the names referenced by the line,
+        with the variables in the order of the definitions, which is
+        the order of the expansion; None if they cannot be determined
+    :return str: None if the line cannot be cached
+    """
+    if dependencies is None:
+      return None
+    parts = [constants.VERSION, line]
+    parts.extend(self._config_parts)
+    for name in sorted(dependencies.keys()):
+      fingerprint = self._fingerprint(dependencies[name])
+      if fingerprint is None:
+        return None
+      parts.extend([name, fingerprint])
+    parts.append(" ".join([n for n, (kind, _) in dependencies.items()
+                           if kind == 'variable']))
+    return makeDigest(parts)
+
+  def get(self, key):
+    """
+    :param str key:
+    :return list-of-str: None if the line is not in the cache
+    """
+    data = self._cache.get(key)
+    if data is None:
+      return None
+    return json.loads(data.decode('utf-8'))
+
+  def put(self, key, substitutions):
+    """
+    :param str key:
+    :param list-of-str substitutions: expansion of the line
+    """
+    self._cache.put(key, json.dumps(substitutions).encode('utf-8'))
+
+  def close(self):
+    """
+    Evicts entries if the cache is too large.
+    """
+    self._cache.evict()
+
+  def getStatistics(self):
+    """
+    :return dict: hits and misses
+    """
+    return {'hits': self._cache.hits, 'misses': self._cache.misses}
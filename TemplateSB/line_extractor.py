@@ -1,9 +1,76 @@
 '''Class for extracting a line from a template.'''
 
-from command import COMMAND_START, COMMAND_END
-from constants import SPLIT_STG, COMMENT_STG, CONTINUED_STG,  \
-    LINE_TRAN, LINE_COMMAND, LINE_SUBS, LINE_NONE,  \
-    EXPRESSION_START, EXPRESSION_END
+from config import Config
+from constants import SPLIT_STG, LINE_NONE
+import io
+import mmap
+import os
+import stat
+
+
+ENCODING = 'utf-8'
+GZIP_MAGIC = b"\x1f\x8b"
+XZ_MAGIC = b"\xfd7zXZ\x00"
+
+
+def iterString(text, separator=SPLIT_STG):
+  """
+  Iterates over the lines of a string without splitting it.
+  :param str text:
+  :param str separator:
+  :return generator-of-str: lines without the separator
+  """
+  start = 0
+  while True:
+    end = text.find(separator, start)
+    if end < 0:
+      yield text[start:]
+      return
+    yield text[start:end]
+    start = end + len(separator)
+
+def _iterMappedLines(infile):
+  """
+  Iterates over the lines of a regular file by memory mapping it,
+  so that the file is paged in as it is read.
+  :param file infile: opened in binary mode
+  :return generator-of-str: lines ending in a newline, except the last
+  """
+  if os.fstat(infile.fileno()).st_size == 0:
+    return
+  with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+    readline = mapped.readline
+    line = readline()
+    while len(line) > 0:
+      if line.endswith(b"\r\n"):
+        line = line[:-2] + b"\n"
+      yield line.decode(ENCODING)
+      line = readline()
+
+def iterFileLines(path):
+  """
+  Iterates over the lines of a file without reading it into memory.
+  Files compressed with gzip or xz are decompressed as they are read.
+  :param str path:
+  :return generator-of-str: lines ending in a newline, except the last
+  """
+  with open(path, 'rb') as infile:
+    magic = infile.read(len(XZ_MAGIC))
+    infile.seek(0)
+    if magic.startswith(GZIP_MAGIC):
+      import gzip
+      lines = io.TextIOWrapper(gzip.GzipFile(fileobj=infile),
+          encoding=ENCODING)
+    elif magic == XZ_MAGIC:
+      import lzma
+      lines = io.TextIOWrapper(lzma.LZMAFile(infile), encoding=ENCODING)
+    elif stat.S_ISREG(os.fstat(infile.fileno()).st_mode):
+      lines = _iterMappedLines(infile)
+    else:
+      # Pipes and devices cannot be mapped
+      lines = io.TextIOWrapper(infile, encoding=ENCODING)
+    for line in lines:
+      yield line
 
 
 class LineExtractor(object):
@@ -13,12 +80,28 @@ class LineExtractor(object):
     -Classifies the line obtained.
   """
 
-  def __init__(self, input_lines):
+  def __init__(self, input_lines, config=None):
     """
-    :param str template_string: string containing template variables
-        and template escape statements to execute
+    :param str/os.PathLike/iterable-of-str input_lines: string
+        containing template variables and template escape statements
+        to execute; the path of a template file, which may be
+        compressed with gzip or xz; or an iterable of lines
+        (e.g., a file object). Lines are read lazily.
+    :param Config config: syntax of the template; default if None
     """
-    self._lines = input_lines.split(SPLIT_STG)
+    if config is None:
+      config = Config.getDefault()
+    self._scanner = config.getScanner()
+    self._continued_length = len(config.continued_stg)
+    if isinstance(input_lines, str):
+      self._lines = iterString(input_lines)
+    elif isinstance(input_lines, os.PathLike):
+      self._lines = iterFileLines(input_lines)
+    elif isinstance(input_lines, (io.RawIOBase, io.BufferedIOBase)):
+      self._lines = io.TextIOWrapper(input_lines, encoding=ENCODING)
+    else:
+      self._lines = input_lines
+    self._line_iterator = iter(self._lines)
     self._source_line_number = 0
     self._current_line = None  # Complete line extracted from input
     self._current_line_type = None
@@ -32,50 +115,38 @@ class LineExtractor(object):
     State used:
       reads: _current_line
     """
-    if self._current_line is None:
-      result = LINE_NONE
-    else:
-      text = self._current_line.strip()
-      if len(text) == 0:
-        result = LINE_NONE
-      elif text[0] == COMMENT_STG or len(text) == 0:
-        result = LINE_TRAN
-      elif len(text) < 2:
-        result = LINE_TRAN
-      elif text[0:2] == COMMAND_START:
-        result = LINE_COMMAND
-      elif text.count(EXPRESSION_START) == 0 and  \
-          text.count(EXPRESSION_END) == 0:
-        result = LINE_TRAN
-      else:
-        result = LINE_SUBS
-    self._current_line_type = result
+    self._current_line_type = self._scanner.classifyLine(self._current_line)
 
   def _getNextLine(self, strip=True):
     """
     Gets the next line, handling continued lines.
     State used:
-      references: _source_line_number, _lines
+      references: _source_line_number, _line_iterator
       updates: _current_line, _source_line_number
     :parm bool strip: flag to indicate if white space should be stripped
     """
-    self._current_line = None
-    while self._source_line_number < len(self._lines):
-      if self._current_line is None:
-        self._current_line = ''
+    parts = None  # Source lines of a continued line
+    for text in self._line_iterator:
+      if parts is None:
+        parts = []
       if strip:
-        text = self._lines[self._source_line_number].strip()
-      else:
-        text = self._lines[self._source_line_number]
+        text = text.strip()
+      elif text.endswith(SPLIT_STG):
+        text = text[:-len(SPLIT_STG)]
       self._source_line_number += 1
       if len(text) == 0:
         continue
-      if text[-len(CONTINUED_STG)] == CONTINUED_STG:
-        self._current_line = self._current_line  \
-            + text[0:-len(CONTINUED_STG)]
+      if self._scanner.isContinued(text):
+        parts.append(text[0:-self._continued_length])
       else:
-        self._current_line = self._current_line + text
+        parts.append(text)
         break
+    if parts is None:
+      self._current_line = None
+    elif len(parts) == 1:
+      self._current_line = parts[0]
+    else:
+      self._current_line = ''.join(parts)
 
   def do(self, strip=True):
     """
@@ -0,0 +1,81 @@
+'''Size-bounded cache with least recently used eviction.'''
+
+import collections
+import threading
+
+
+class LRUCache(object):
+  """
+  Dictionary-like cache that holds at most a fixed number of entries.
+  When the cache is full, the least recently used entry is evicted.
+  Keeps counts of hits and misses so that the cache can be sized.
+  The cache can be shared by threads.
+  """
+
+  def __init__(self, max_size):
+    """
+    :param int max_size: maximum number of entries held
+    """
+    if max_size < 1:
+      raise ValueError("Cache size must be positive")
+    self._max_size = max_size
+    self._entries = collections.OrderedDict()
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+
+  def __len__(self):
+    return len(self._entries)
+
+  def __contains__(self, key):
+    return key in self._entries
+
+  def get(self, key, default=None):
+    """
+    Retrieves an entry, marking it as most recently used.
+    :param object key: hashable key
+    :param object default: value returned if the key is absent
+    :return object:
+    """
+    with self._lock:
+      try:
+        value = self._entries.pop(key)
+      except KeyError:
+        self.misses += 1
+        return default
+      self._entries[key] = value
+      self.hits += 1
+    return value
+
+  def put(self, key, value):
+    """
+    Adds an entry, evicting the least recently used entry if needed.
+    :param object key: hashable key
+    :param object value:
+    """
+    with self._lock:
+      if key in self._entries:
+        del self._entries[key]
+      elif len(self._entries) >= self._max_size:
+        self._entries.popitem(last=False)
+      self._entries[key] = value
+
+  def clear(self):
+    """
+    Removes all entries and resets the statistics.
+    """
+    with self._lock:
+      self._entries.clear()
+      self.hits = 0
+      self.misses = 0
+
+  def getStatistics(self):
+    """
+    :return dict: keys are 'hits', 'misses', 'size', 'max_size'
+    """
+    with self._lock:
+      return {'hits': self.hits,
+              'misses': self.misses,
+              'size': len(self._entries),
+              'max_size': self._max_size,
+             }
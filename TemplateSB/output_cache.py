@@ -0,0 +1,216 @@
+'''Persistent cache of the outputs of template files.'''
+
+"""
+The output of a template file is cached under a key computed from
+the bytes of the template, the Config, VERSION, the kind of output
+(plain, gzip or xz), the current directory (against which relative
+paths are opened) and the contents of the files that processing
+read. Those files are not known until the template is processed,
+so a manifest of them is kept under a key computed from everything
+else. A lookup reads the manifest, hashes the files it lists and
+finds the output for their current contents.
+
+Files are recorded with an audit hook on file opens while a
+template is processed, together with the source files of the
+modules bound by DefineVariables blocks. Files of the Python
+installation and of TemplateSB are not recorded, since changes to
+them are not expected between builds. Only files read in the
+processing process are recorded; files read by expressions expanded
+in worker processes are not.
+"""
+
+from config import CONFIG_FIELDS
+from disk_cache import DiskCache, hashFile, makeManifest, readManifest,  \
+    writeManifest, makeContentKey, makeDigest
+from output_sink import GZIP_SUFFIX, XZ_SUFFIX, STDOUT_PATH
+import constants
+import contextlib
+import os
+import shutil
+import sys
+import threading
+
+
+# Kinds of output whose bytes differ for the same lines
+OUTPUT_SUFFIXES = [GZIP_SUFFIX, XZ_SUFFIX]
+# Paths recorded by the audit hook for the current thread
+_recording = threading.local()
+_hook_lock = threading.Lock()
+_is_hook_installed = False
+
+
+def _auditOpen(event, args):
+  """
+  Audit hook that records the paths of files opened for reading.
+  """
+  if event != 'open':
+    return
+  paths = getattr(_recording, 'paths', None)
+  if paths is None:
+    return
+  path, mode, flags = args
+  if isinstance(mode, str):
+    if any([c in mode for c in "wax+"]):
+      return
+  elif flags is not None and flags & (os.O_WRONLY | os.O_RDWR):
+    return
+  if isinstance(path, (str, bytes)):
+    paths.add(os.fsdecode(path))
+
+@contextlib.contextmanager
+def recordOpenedFiles():
+  """
+  Records the files opened for reading by the current thread.
+  :return set-of-str: paths recorded until the context exits
+  """
+  global _is_hook_installed
+  with _hook_lock:
+    if not _is_hook_installed:
+      # Audit hooks cannot be removed, so one is installed per process
+      sys.addaudithook(_auditOpen)
+      _is_hook_installed = True
+  previous = getattr(_recording, 'paths', None)
+  paths = set()
+  _recording.paths = paths
+  try:
+    yield paths
+  finally:
+    _recording.paths = previous
+    if previous is not None:
+      previous.update(paths)
+
+
+class OutputCache(object):
+  """
+  Caches the output of template files on disk so that a template
+  whose inputs have not changed is not processed again. Outputs
+  are copied into place rather than linked, since an output file
+  may later be overwritten in place (e.g., by a shell redirection).
+  """
+
+  def __init__(self, directory, max_bytes=constants.OUTPUT_CACHE_BYTES,
+      config=None):
+    """
+    :param str directory: directory holding the cache
+    :param int max_bytes: limit on the size of the cache
+    :param Config config: syntax of the templates; default if None
+    """
+    if config is None:
+      from config import Config
+      config = Config.getDefault()
+    self._directory = os.path.abspath(directory)
+    self._cache = DiskCache(self._directory, max_bytes)
+    self._config_parts = [str(getattr(config, n)) for n in CONFIG_FIELDS]
+    self.hits = 0
+    self.misses = 0
+
+  @staticmethod
+  def _getOutputSuffix(outpath):
+    """
+    :param str outpath:
+    :return str: suffix that selects the compression of the output
+    """
+    if outpath is None:
+      return ""
+    for suffix in OUTPUT_SUFFIXES:
+      if str(outpath).endswith(suffix):
+        return suffix
+    return ""
+
+  def makeTemplateKey(self, inpath, outpath):
+    """
+    :param str inpath: template file
+    :param str outpath: output file; "-" or None for standard output
+    :return str: key of the manifest of the template
+    """
+    parts = [constants.VERSION, OutputCache._getOutputSuffix(outpath),
+        hashFile(inpath) or "", os.getcwd()]
+    parts.extend(self._config_parts)
+    return makeDigest(parts)
+
+  def fetch(self, inpath, outpath):
+    """
+    Puts the cached output of a template in place.
+    :param str inpath: template file
+    :param str outpath: output file; "-" or None for standard output
+    :return bool: True if the output was found
+    """
+    template_key = self.makeTemplateKey(inpath, outpath)
+    manifest = readManifest(self._cache, template_key)
+    output_key = None
+    if manifest is not None:
+      output_key = makeContentKey(template_key, manifest)
+    if output_key is None or not self._isIntact(output_key):
+      self.misses += 1
+      return False
+    self.hits += 1
+    self._cache.touch(output_key)
+    self._placeOutput(self._cache.getPath(output_key), outpath)
+    return True
+
+  def _isIntact(self, output_key):
+    """
+    :param str output_key:
+    :return bool: True if the output is in the cache and no other
+        path links to it, through which it could have been changed
+    """
+    if not self._cache.contains(output_key):
+      return False
+    try:
+      return os.stat(self._cache.getPath(output_key)).st_nlink == 1
+    except OSError:
+      return False
+
+  def _placeOutput(self, path, outpath):
+    """
+    Puts a copy of a cached output in place.
+    :param str path: file in the cache
+    :param str outpath: output file; "-" or None for standard output
+    """
+    if outpath is None or outpath == STDOUT_PATH:
+      sys.stdout.flush()
+      with open(path, 'rb') as infile:
+        shutil.copyfileobj(infile, sys.stdout.buffer)
+      sys.stdout.buffer.flush()
+      return
+    outpath = str(outpath)
+    temporary_path = "%s.tmp%d" % (outpath, os.getpid())
+    shutil.copyfile(path, temporary_path)
+    os.replace(temporary_path, outpath)
+
+  def makeTemporary(self, outpath):
+    """
+    :param str outpath: output file; "-" or None for standard output
+    :return str: file in the cache directory to which the output of
+        a template is written before it is stored
+    """
+    return self._cache.makeTemporary(
+        suffix=OutputCache._getOutputSuffix(outpath))
+
+  def store(self, inpath, outpath, output_path, paths,
+      excluded_directories=None):
+    """
+    Stores the output of a template and puts it in place.
+    :param str inpath: template file
+    :param str outpath: output file; "-" or None for standard output
+    :param str output_path: file created by makeTemporary with the
+        output; it is moved into the cache
+    :param iterable-of-str paths: files read in processing the template
+    :param list-of-str excluded_directories: directories whose files
+        are not dependencies (e.g., a line cache)
+    """
+    template_key = self.makeTemplateKey(inpath, outpath)
+    manifest = makeManifest(paths, excluded_paths=[str(inpath)],
+        excluded_directories=[self._directory]
+        + list(excluded_directories or []))
+    output_key = makeContentKey(template_key, manifest)
+    self._cache.moveFile(output_key, output_path)
+    writeManifest(self._cache, template_key, manifest)
+    self._placeOutput(self._cache.getPath(output_key), outpath)
+    self._cache.evict()
+
+  def getStatistics(self):
+    """
+    :return dict: hits and misses
+    """
+    return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,226 @@
+'''Destinations for the lines produced by expanding a template.'''
+
+"""
+Lines are collected into chunks of about OUTPUT_CHUNK_BYTES
+characters that are written with a single call, so output is
+written as it is produced without a call per line and without
+holding the whole expansion in memory.
+"""
+
+from constants import SPLIT_STG, OUTPUT_CHUNK_BYTES
+import abc
+import sys
+
+
+ENCODING = 'utf-8'
+GZIP_LEVEL = 6
+XZ_PRESET = 6
+GZIP_SUFFIX = ".gz"
+XZ_SUFFIX = ".xz"
+STDOUT_PATH = "-"
+
+
+class OutputSink(abc.ABC):
+  """
+  Writes lines separated by SPLIT_STG, with no separator after
+  the last line. Subclasses implement _writeChunk and may
+  implement _close.
+  """
+
+  def __init__(self, chunk_size=OUTPUT_CHUNK_BYTES):
+    """
+    :param int chunk_size: number of characters buffered before writing
+    """
+    self._chunk_size = chunk_size
+    self._chunk = []
+    self._chunk_length = 0
+    self._separator = ''
+    self._is_closed = False
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+  def write(self, line):
+    """
+    :param str line: line without a separator
+    """
+    self._chunk.append(self._separator)
+    self._chunk.append(line)
+    self._separator = SPLIT_STG
+    self._chunk_length += len(line) + 1
+    if self._chunk_length >= self._chunk_size:
+      self.flush()
+
+  def writeLines(self, lines):
+    """
+    Writes lines as they are produced.
+    :param iterable-of-str lines:
+    """
+    chunk = self._chunk
+    chunk_size = self._chunk_size
+    length = self._chunk_length
+    separator = self._separator
+    for line in lines:
+      chunk.append(separator)
+      chunk.append(line)
+      separator = SPLIT_STG
+      length += len(line) + 1
+      if length >= chunk_size:
+        self._separator = separator
+        self.flush()
+        chunk = self._chunk
+        length = 0
+    self._separator = separator
+    self._chunk_length = length
+
+  def flush(self):
+    """
+    Writes the buffered lines.
+    """
+    if len(self._chunk) > 0:
+      self._writeChunk(''.join(self._chunk))
+      self._chunk = []
+      self._chunk_length = 0
+
+  def close(self):
+    """
+    Writes the buffered lines and releases the destination.
+    """
+    if self._is_closed:
+      return
+    self.flush()
+    self._is_closed = True
+    self._close()
+
+  @abc.abstractmethod
+  def _writeChunk(self, text):
+    """
+    Writes buffered lines to the destination.
+    :param str text:
+    """
+
+  def _close(self):
+    """
+    Releases the destination.
+    """
+
+
+class StreamSink(OutputSink):
+  """
+  Writes to an open text stream, which is flushed but not closed.
+  """
+
+  def __init__(self, stream, chunk_size=OUTPUT_CHUNK_BYTES):
+    """
+    :param file stream: opened for writing text
+    :param int chunk_size:
+    """
+    super(StreamSink, self).__init__(chunk_size=chunk_size)
+    self._stream = stream
+
+  def _writeChunk(self, text):
+    self._stream.write(text)
+
+  def _close(self):
+    self._stream.flush()
+
+
+class StdoutSink(StreamSink):
+  """
+  Writes to standard output.
+  """
+
+  def __init__(self, chunk_size=OUTPUT_CHUNK_BYTES):
+    super(StdoutSink, self).__init__(sys.stdout, chunk_size=chunk_size)
+
+
+class MemorySink(OutputSink):
+  """
+  Keeps the output in memory.
+  """
+
+  def __init__(self, chunk_size=OUTPUT_CHUNK_BYTES):
+    super(MemorySink, self).__init__(chunk_size=chunk_size)
+    self._chunks = []
+
+  def _writeChunk(self, text):
+    self._chunks.append(text)
+
+  def getValue(self):
+    """
+    :return str: the lines written
+    """
+    self.flush()
+    return ''.join(self._chunks)
+
+
+class FileSink(OutputSink):
+  """
+  Writes a UTF-8 encoded file.
+  """
+
+  def __init__(self, path, chunk_size=OUTPUT_CHUNK_BYTES):
+    """
+    :param str path:
+    :param int chunk_size:
+    """
+    super(FileSink, self).__init__(chunk_size=chunk_size)
+    self._path = path
+    self._file = self._open(path)
+
+  def _open(self, path):
+    """
+    :param str path:
+    :return file: opened for writing bytes
+    """
+    return open(path, 'wb')
+
+  def getPath(self):
+    return self._path
+
+  def _writeChunk(self, text):
+    self._file.write(text.encode(ENCODING))
+
+  def _close(self):
+    self._file.close()
+
+
+class GzipSink(FileSink):
+  """
+  Writes a file compressed with gzip.
+  """
+
+  def _open(self, path):
+    import gzip
+    return gzip.open(path, 'wb', compresslevel=GZIP_LEVEL)
+
+
+class XzSink(FileSink):
+  """
+  Writes a file compressed with xz.
+  """
+
+  def _open(self, path):
+    import lzma
+    return lzma.open(path, 'wb', preset=XZ_PRESET)
+
+
+def makeSink(path, chunk_size=OUTPUT_CHUNK_BYTES):
+  """
+  Creates the sink for a path, compressing the output if the path
+  ends in .gz or .xz.
+  :param str path: "-" or None for standard output
+  :param int chunk_size:
+  :return OutputSink:
+  """
+  if path is None or path == STDOUT_PATH:
+    return StdoutSink(chunk_size=chunk_size)
+  path = str(path)
+  if path.endswith(GZIP_SUFFIX):
+    return GzipSink(path, chunk_size=chunk_size)
+  if path.endswith(XZ_SUFFIX):
+    return XzSink(path, chunk_size=chunk_size)
+  return FileSink(path, chunk_size=chunk_size)
@@ -0,0 +1,218 @@
+'''Expands template lines in a pool of worker processes.'''
+
+from config import Config
+from constants import PARALLEL_BATCH_SIZE
+from executor import Executor
+from expander import Expander
+from lru_cache import LRUCache
+import concurrent.futures
+import hashlib
+import importlib
+import pickle
+import threading
+import types
+
+
+EXCLUDED_NAMES = ['__builtins__', 'api']
+# Number of snapshots whose Expanders are kept by a worker process
+WORKER_CACHE_SIZE = 8
+# Expanders of a worker by digest of the snapshot. Each thread has
+# its own cache since an Expander records the warnings of one line
+# at a time.
+_worker_state = threading.local()
+
+
+class ModuleReference(object):
+  """
+  Stands in for a module in a snapshot so that the module
+  is imported again in the worker process.
+  """
+
+  def __init__(self, name):
+    self.name = name
+
+
+class RecordedMessage(object):
+  """
+  Records warnings in a worker process so that they are
+  reported by the TemplateProcessor for the source line.
+  """
+
+  def __init__(self):
+    self.warnings = []
+
+  def error(self, msg):
+    raise ValueError(msg)
+
+  def warning(self, msg):
+    self.warnings.append(msg)
+
+
+def _getExpander(snapshot):
+  """
+  Creates an Expander for the definitions in the snapshot,
+  reusing the one for a recent snapshot if it is the same. Keeping
+  several lets a worker alternate between templates.
+  :param bytes snapshot:
+  :return Expander, RecordedMessage:
+  """
+  digest = hashlib.sha1(snapshot).hexdigest()
+  worker_expanders = getattr(_worker_state, 'expanders', None)
+  if worker_expanders is None:
+    worker_expanders = LRUCache(WORKER_CACHE_SIZE)
+    _worker_state.expanders = worker_expanders
+  result = worker_expanders.get(digest)
+  if result is None:
+    names, definitions, constraints, config = pickle.loads(snapshot)
+    for name, value in names.items():
+      if isinstance(value, ModuleReference):
+        names[name] = importlib.import_module(value.name)
+    executor = Executor()
+    executor.addNamespace(names)
+    executor.setDefinitions(definitions)
+    executor.setConstraints(constraints)
+    message = RecordedMessage()
+    result = (Expander(executor, message, config=config), message)
+    worker_expanders.put(digest, result)
+  return result
+
+def _expandLines(snapshot, lines):
+  """
+  Expands lines in a worker process.
+  :param bytes snapshot: pickled names, definitions, constraints
+      and config
+  :param list-of-str lines:
+  :return list-of-tuple: (substitutions, warnings, error) for each line;
+      error is None if the line was expanded
+  """
+  expander, message = _getExpander(snapshot)
+  results = []
+  for line in lines:
+    message.warnings = []
+    try:
+      results.append((expander.do(line), message.warnings, None))
+    except Exception as err:
+      results.append(([], message.warnings, str(err)))
+  return results
+
+
+class Batch(object):
+  """
+  Lines expanded in the same task using the same snapshot.
+  """
+
+  def __init__(self, snapshot):
+    self.snapshot = snapshot
+    self.lines = []
+    self.future = None
+
+
+class ParallelExpander(object):
+  """
+  Expands template lines in a ProcessPoolExecutor. Lines are sent
+  in batches along with a snapshot of the names and definitions
+  of the Executor and the Config. Expansion is unavailable if the
+  snapshot cannot be pickled. Since the Config is in the snapshot,
+  a pool can be shared by templates with different syntaxes.
+  """
+
+  def __init__(self, executor, jobs=None, pool=None,
+      batch_size=PARALLEL_BATCH_SIZE, config=None):
+    """
+    :param Executor executor: executor whose definitions are used
+    :param int jobs: number of worker processes
+    :param concurrent.futures.Executor pool: pool to use instead of
+        creating one
+    :param int batch_size: number of lines expanded in a task
+    :param Config config: syntax of the template; default if None
+    """
+    if config is None:
+      config = Config.getDefault()
+    self._executor = executor
+    self._config = config
+    self._jobs = jobs
+    self._pool = pool
+    self._is_owned_pool = pool is None
+    self._batch_size = batch_size
+    self._batch = None  # Batch being filled
+    self._snapshot = None
+    self._is_snapshot_valid = False
+
+  def _makeSnapshot(self):
+    """
+    Pickles the names, definitions and constraints of the executor
+    and the config.
+    :return bytes: None if they cannot be pickled
+    """
+    names = {}
+    for name, value in self._executor.getNamespace().items():
+      if name in EXCLUDED_NAMES:
+        continue
+      if isinstance(value, types.ModuleType):
+        value = ModuleReference(value.__name__)
+      names[name] = value
+    try:
+      return pickle.dumps((names, self._executor.getDefinitions(),
+          self._executor.getConstraints(), self._config))
+    except Exception:
+      return None
+
+  def invalidate(self):
+    """
+    Indicates that the names or definitions of the executor may
+    have changed.
+    """
+    self.flush()
+    self._is_snapshot_valid = False
+
+  def submit(self, line):
+    """
+    Adds a line to be expanded.
+    :param str line:
+    :return Batch, int: batch and position of the line in it;
+        None if the definitions cannot be sent to a worker
+    """
+    if not self._is_snapshot_valid:
+      self._snapshot = self._makeSnapshot()
+      self._is_snapshot_valid = True
+    if self._snapshot is None:
+      return None
+    if self._batch is None:
+      self._batch = Batch(self._snapshot)
+    batch = self._batch
+    batch.lines.append(line)
+    if len(batch.lines) >= self._batch_size:
+      self.flush()
+    return batch, len(batch.lines) - 1
+
+  def flush(self):
+    """
+    Sends the partially filled batch to the pool.
+    """
+    if self._batch is None:
+      return
+    if self._pool is None:
+      self._pool = concurrent.futures.ProcessPoolExecutor(
+          max_workers=self._jobs)
+    self._batch.future = self._pool.submit(_expandLines,
+        self._batch.snapshot, self._batch.lines)
+    self._batch = None
+
+  def getResult(self, handle):
+    """
+    Waits for the expansion of a line.
+    :param (Batch, int) handle: value returned by submit
+    :return list-of-str, list-of-str, str: substitutions, warnings, error
+    """
+    batch, position = handle
+    if batch.future is None:
+      self.flush()
+    return batch.future.result()[position]
+
+  def close(self):
+    """
+    Shuts down the pool if it was created by this object.
+    """
+    if self._is_owned_pool and self._pool is not None:
+      self._pool.shutdown()
+      self._pool = None
@@ -0,0 +1,75 @@
+'''Template line parsed into literal text and expression slots.'''
+
+import re
+
+
+class RenderPlan(object):
+  """
+  A template line parsed once into an alternating sequence of
+  literal fragments and template expression slots. An expansion
+  of the line is produced by filling the slots with the values
+  of their expressions and joining the result.
+  """
+
+  def __init__(self, segment, pattern):
+    """
+    :param str segment: template line
+    :param re.Pattern pattern: matches a template expression
+        with group 1 being the expression without delimiters
+    """
+    self._parts = []  # Literal fragments and placeholders for slots
+    self._slots = []  # (position in _parts, expression)
+    self._expressions = []  # Unique expressions in order of appearance
+    position = 0
+    for match in pattern.finditer(segment):
+      self._parts.append(segment[position:match.start()])
+      expression = match.group(1).strip()
+      self._slots.append((len(self._parts), expression))
+      self._parts.append(None)
+      if not expression in self._expressions:
+        self._expressions.append(expression)
+      position = match.end()
+    self._parts.append(segment[position:])
+
+  @staticmethod
+  def makePattern(left_delim, right_delim):
+    """
+    Creates the pattern for a template expression. The expression
+    cannot contain the left delimiter.
+    :param str left_delim: left delimiter for a template expression
+    :param str right_delim: right delimiter for a template expression
+    :return re.Pattern:
+    """
+    left = re.escape(left_delim)
+    right = re.escape(right_delim)
+    return re.compile("%s((?:(?!%s).)+)%s" % (left, left, right))
+
+  def getExpressions(self):
+    """
+    :return list-of-str: unique template expressions without delimiters
+    """
+    return list(self._expressions)
+
+  def getSlotExpressions(self):
+    """
+    :return list-of-str: expression of each slot, in order
+    """
+    return [e for _, e in self._slots]
+
+  def getLiteralBytes(self):
+    """
+    :return int: UTF-8 length of the text outside of the slots
+    """
+    return sum([len(p.encode('utf-8')) for p in self._parts
+                if p is not None])
+
+  def render(self, replacements):
+    """
+    Fills the expression slots.
+    :param dict replacements: key is expression, value is its string
+    :return str:
+    """
+    parts = list(self._parts)
+    for position, expression in self._slots:
+      parts[position] = replacements[expression]
+    return ''.join(parts)
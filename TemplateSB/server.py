@@ -0,0 +1,283 @@
+'''Long-running server that expands templates sent over a socket.'''
+
+"""
+An ExpansionServer listens on a Unix domain socket and expands each
+template sent by a client (see client.py) with its own
+TemplateProcessor in a separate thread. The server keeps the state
+that is costly to create for each run of run.py: modules are
+imported and the configuration is read once, compiled template
+expressions are shared by all requests, and a pool of worker
+processes is kept if lines are expanded in parallel. Output is sent
+as it is produced. The latencies of requests are recorded and
+reported with percentiles.
+"""
+
+from client import readFrame, writeFrame, FRAME_HEADER, FRAME_INPUT,  \
+    FRAME_OUTPUT, FRAME_ERROR, FRAME_STATUS, COMMAND_EXPAND,  \
+    COMMAND_STATS
+from config import Config
+from constants import EXPRESSION_CACHE_SIZE
+from lru_cache import LRUCache
+from output_sink import OutputSink, ENCODING
+from template_processor import TemplateProcessor
+import codecs
+import collections
+import json
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+
+
+# Number of characters sent in an output frame
+SERVER_CHUNK_BYTES = 2**16
+# Number of recent requests whose latencies are kept
+LATENCY_WINDOW = 10000
+PERCENTILES = [50, 90, 99]
+
+
+class LatencyRecorder(object):
+  """
+  Records the latencies of recent requests.
+  """
+
+  def __init__(self, window=LATENCY_WINDOW):
+    """
+    :param int window: number of recent latencies kept
+    """
+    self._latencies = collections.deque(maxlen=window)
+    self._count = 0
+    self._lock = threading.Lock()
+
+  def record(self, seconds):
+    """
+    :param float seconds:
+    """
+    with self._lock:
+      self._latencies.append(seconds)
+      self._count += 1
+
+  def getPercentiles(self):
+    """
+    Percentiles are computed by the nearest rank over the recent
+    latencies.
+    :return dict: 'count' is the number of requests; 'p50', 'p90',
+        'p99' and 'max' are seconds, None if there are no requests
+    """
+    with self._lock:
+      latencies = sorted(self._latencies)
+      result = {'count': self._count}
+    for percentile in PERCENTILES:
+      key = "p%d" % percentile
+      if len(latencies) == 0:
+        result[key] = None
+      else:
+        rank = max(0, (percentile*len(latencies) + 99)//100 - 1)
+        result[key] = latencies[rank]
+    result['max'] = latencies[-1] if len(latencies) > 0 else None
+    return result
+
+  def format(self):
+    """
+    :return str: report of the percentiles in milliseconds
+    """
+    percentiles = self.getPercentiles()
+    lines = ["Requests: %d" % percentiles['count']]
+    for key in ["p%d" % p for p in PERCENTILES] + ['max']:
+      if percentiles[key] is not None:
+        lines.append("  %-20s %10.2f ms" % (key, 1000*percentiles[key]))
+    return "\n".join(lines)
+
+
+class SocketSink(OutputSink):
+  """
+  Sends output to a client in FRAME_OUTPUT frames.
+  """
+
+  def __init__(self, writer, chunk_size=SERVER_CHUNK_BYTES):
+    """
+    :param file writer: connection opened for writing bytes
+    :param int chunk_size:
+    """
+    super(SocketSink, self).__init__(chunk_size=chunk_size)
+    self._writer = writer
+
+  def _writeChunk(self, text):
+    writeFrame(self._writer, FRAME_OUTPUT, text.encode(ENCODING))
+    self._writer.flush()
+
+
+class InputLines(object):
+  """
+  Lines of a template decoded from FRAME_INPUT frames as they arrive.
+  The input ends at the first frame of another kind.
+  """
+
+  def __init__(self, reader):
+    """
+    :param file reader: connection opened for reading bytes
+    """
+    self._reader = reader
+    self._is_ended = False
+
+  def _readPayload(self):
+    """
+    :return bytes: None at the end of the input
+    """
+    if self._is_ended:
+      return None
+    kind, payload = readFrame(self._reader)
+    if kind != FRAME_INPUT:
+      self._is_ended = True
+      return None
+    return payload
+
+  def __iter__(self):
+    """
+    :return generator-of-str: lines ending in a newline except
+        possibly the last
+    """
+    decoder = codecs.getincrementaldecoder(ENCODING)()
+    remainder = ""
+    payload = self._readPayload()
+    while payload is not None:
+      text = (remainder + decoder.decode(payload)).replace("\r\n", "\n")
+      lines = text.split("\n")
+      remainder = lines.pop()
+      for line in lines:
+        yield line + "\n"
+      payload = self._readPayload()
+    remainder += decoder.decode(b"", final=True)
+    if len(remainder) > 0:
+      yield remainder
+
+  def drain(self):
+    """
+    Reads the rest of the input, as when processing stops at an error.
+    """
+    while self._readPayload() is not None:
+      pass
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+  """
+  Handles a request from a client.
+  """
+
+  def handle(self):
+    start = time.perf_counter()
+    kind, payload = readFrame(self.rfile)
+    if kind != FRAME_HEADER:
+      return
+    header = json.loads(payload.decode('utf-8'))
+    command = header.get('command', COMMAND_EXPAND)
+    lines = InputLines(self.rfile)
+    status = 0
+    try:
+      if command == COMMAND_STATS:
+        text = self.server.latencies.format() + "\n"
+        writeFrame(self.wfile, FRAME_OUTPUT, text.encode(ENCODING))
+      elif command == COMMAND_EXPAND:
+        self._expand(header, lines)
+      else:
+        raise ValueError("Unknown command %s" % command)
+    except Exception as err:
+      status = 1
+      msg = "%s: %s\n" % (type(err).__name__, str(err))
+      writeFrame(self.wfile, FRAME_ERROR, msg.encode(ENCODING))
+    lines.drain()
+    if command == COMMAND_EXPAND:
+      self.server.latencies.record(time.perf_counter() - start)
+    writeFrame(self.wfile, FRAME_STATUS, str(status).encode('ascii'))
+    self.wfile.flush()
+
+  def _expand(self, header, lines):
+    """
+    Expands the template in the request, sending the output as it
+    is produced and warnings as error frames.
+    :param dict header: options of the request
+    :param InputLines lines: lines of the template
+    """
+    server = self.server
+    config = server.config
+    if header.get('config') is not None:
+      config = Config.fromFile(header['config'])
+
+    def warn(msg):
+      # Warnings go to the client's standard error, not the server's
+      text = "%s: %s\n" % (UserWarning.__name__, msg)
+      writeFrame(self.wfile, FRAME_ERROR, text.encode(ENCODING))
+
+    processor = TemplateProcessor(iter(lines),
+        jobs=server.jobs, config=config,
+        expression_cache=server.expression_cache, pool=server.pool,
+        warn=warn)
+    with SocketSink(self.wfile) as sink:
+      processor.writeOutput(sink)
+
+
+class ExpansionServer(socketserver.ThreadingUnixStreamServer):
+  """
+  Expands templates for clients connected to a Unix domain socket,
+  handling each request in its own thread.
+  """
+  daemon_threads = True
+
+  def __init__(self, socket_path, config=None, jobs=1,
+      cache_size=EXPRESSION_CACHE_SIZE):
+    """
+    :param str socket_path: path of the socket; an existing socket
+        file is replaced
+    :param Config config: syntax of templates whose request does
+        not give a configuration; default if None
+    :param int jobs: number of processes used to expand lines
+    :param int cache_size: number of compiled expressions shared
+        by requests
+    """
+    if config is None:
+      config = Config.getDefault()
+    self.config = config
+    self.jobs = jobs
+    self.pool = None
+    if jobs > 1:
+      import concurrent.futures
+      self.pool = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+    self.expression_cache = LRUCache(cache_size)
+    self.latencies = LatencyRecorder()
+    self.socket_path = socket_path
+    if os.path.exists(socket_path):
+      os.remove(socket_path)
+    super(ExpansionServer, self).__init__(socket_path, RequestHandler)
+
+  def server_close(self):
+    super(ExpansionServer, self).server_close()
+    if self.pool is not None:
+      self.pool.shutdown()
+      self.pool = None
+    if os.path.exists(self.socket_path):
+      os.remove(self.socket_path)
+
+
+def _interrupt(signal_number, frame):
+  raise KeyboardInterrupt()
+
+def serve(socket_path, config=None, jobs=1):
+  """
+  Runs a server until it is interrupted or terminated, then reports
+  the latencies of the requests on stderr.
+  :param str socket_path:
+  :param Config config: default syntax of templates
+  :param int jobs: number of processes used to expand lines
+  """
+  server = ExpansionServer(socket_path, config=config, jobs=jobs)
+  signal.signal(signal.SIGTERM, _interrupt)
+  sys.stderr.write("Serving on %s\n" % socket_path)
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+    sys.stderr.write(server.latencies.format() + "\n")
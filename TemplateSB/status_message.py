@@ -5,27 +5,70 @@ import warnings
 
 class StatusMessage(object):
 
-  def __init__(self, extractor):
+  def __init__(self, extractor, warn=None):
     """
     :param LineExtractor extractor:
+    :param function warn: called with the text of each warning;
+        warnings.warn if None
     """
     self._extractor = extractor
+    if warn is None:
+      warn = warnings.warn
+    self._warn = warn
 
-  def error(self, msg):
+  def _makeMessage(self, msg, line_number, line):
     """
     :param str msg:
+    :param int line_number: source line; default is the current line
+    :param str line: line text; default is the current line
+    :return str:
+    """
+    if line_number is None:
+      line_number = self._extractor.getCurrentSourceLineNumber()
+    if line is None:
+      line = self._extractor.getCurrentLine()
+    return "on line %d.\n'%s'\nError message: %s"  \
+        % (line_number, line, msg)
+
+  def error(self, msg, line_number=None, line=None):
+    """
+    :param str msg:
+    :param int line_number: source line; default is the current line
+    :param str line: line text; default is the current line
     :raises ValueError:
     """
-    error = "on line %d.\n'%s'\nError message: %s"  \
-        % (self._extractor.getCurrentSourceLineNumber(), 
-           self._extractor.getCurrentLine(), msg)
-    raise ValueError(error)
+    raise ValueError(self._makeMessage(msg, line_number, line))
   
-  def warning(self, msg):
+  def warning(self, msg, line_number=None, line=None):
     """
     :param str msg:
+    :param int line_number: source line; default is the current line
+    :param str line: line text; default is the current line
+    """
+    self._warn(self._makeMessage(msg, line_number, line))
+
+
+class LineMessage(StatusMessage):
+  """
+  Messages about a line given when the message is created rather
+  than the current line of an extractor, as for lines expanded
+  concurrently.
+  """
+
+  def __init__(self, line_number, line, warn=None):
     """
-    warning_msg = "on line %d.\n'%s'\nError message: %s"  \
-        % (self._extractor.getCurrentSourceLineNumber(), 
-           self._extractor.getCurrentLine(), msg)
-    warnings.warn(warning_msg)
+    :param int line_number:
+    :param str line:
+    :param function warn: called with the text of each warning;
+        warnings.warn if None
+    """
+    super(LineMessage, self).__init__(None, warn=warn)
+    self._line_number = line_number
+    self._line = line
+
+  def _makeMessage(self, msg, line_number, line):
+    if line_number is None:
+      line_number = self._line_number
+    if line is None:
+      line = self._line
+    return super(LineMessage, self)._makeMessage(msg, line_number, line)
@@ -21,53 +21,306 @@ Notes
 """
 
 from executor import Executor
-from command import Command, COMMAND_START, COMMAND_END
+from command import Command
+from config import Config
+from constrained_space import Constraint
 from expander import Expander
-from constants import EXPRESSION_START, EXPRESSION_END,  \
-  VERSION, SPLIT_STG, COMMENT_STG,  \
-  CONTINUED_STG, LINE_TRAN, LINE_COMMAND, LINE_SUBS, LINE_NONE
+from expansion_plan import ExpansionPlan
+from constants import VERSION, SPLIT_STG, COMMENT_STG,  \
+  PARALLEL_BATCH_SIZE, LINE_TRAN, LINE_COMMAND, LINE_SUBS, LINE_NONE
+from instrumentation import Instrumentation, PHASE_EXTRACT,  \
+    PHASE_DEFINE, PHASE_EXPAND, COUNT_OUTPUT_LINES, COUNT_BYTES,  \
+    LINE_COUNT_PREFIX
 from line_extractor import LineExtractor
-from status_message import StatusMessage
+from output_sink import makeSink, StreamSink
+from status_message import StatusMessage, LineMessage
+import collections
 import fileinput
+import os
+import pathlib
 import sys
+import time
+
+
+# Names of line types used in counters
+LINE_TYPE_NAMES = {LINE_TRAN: "transparent", LINE_SUBS: "substitution",
+    LINE_COMMAND: "command", LINE_NONE: "blank"}
+# Outcome of processing a file; error is None if successful
+FileResult = collections.namedtuple('FileResult',
+    'inpath outpath seconds error')
+
+
+def _processFileTask(inpath, outpath, config, cache_dir):
+  """
+  Processes a file, recording the time taken and any error.
+  :param str inpath:
+  :param str outpath:
+  :param Config config:
+  :param str cache_dir: directory of the output cache; None for no cache
+  :return FileResult:
+  """
+  start = time.time()
+  error = None
+  try:
+    TemplateProcessor.processFile(inpath, outpath, config=config,
+        cache_dir=cache_dir)
+  except Exception as err:
+    error = "%s: %s" % (type(err).__name__, str(err))
+  return FileResult(inpath, outpath, time.time() - start, error)
 
 
 class TemplateProcessor(object):
   """
   This class processes an Antimony model written using template variable substitutions.
   See the project README for syntax details.
+  A TemplateProcessor reads its template once, so each template is
+  processed by its own TemplateProcessor. Processors do not share
+  mutable state, so different templates can be processed in
+  different threads (see doTemplates). Lines can be expanded
+  concurrently by one processor (see expandLines) since expansion
+  does not change the namespace of the Executor.
   """
-  def __init__(self, template_string):
+  def __init__(self, template, jobs=1, line_cache_dir=None, stats=False,
+      config=None, budget=None, expression_cache=None, pool=None,
+      define_cache_dir=None, warn=None):
     """
-    :param str template_string: string containing template variables
-        and template escape statements to execute
+    :param str/os.PathLike/iterable-of-str template: string containing
+        template variables and template escape statements to execute;
+        the path of a template file, which may be compressed; or
+        an iterable of its lines (e.g., a file object)
+    :param int jobs: number of processes used to expand lines
+    :param str line_cache_dir: directory of a persistent cache of
+        expanded lines; no cache if None
+    :param bool stats: collect timings and counts of processing
+    :param Config config: syntax of the template; default if None
+    :param Budget budget: limits on the expansion checked before
+        each line is expanded; no limits if None
+    :param LRUCache expression_cache: compiled expressions shared
+        with other processors; not shared if None
+    :param concurrent.futures.Executor pool: worker processes shared
+        with other processors, used if jobs > 1; a pool is created
+        for the processor if None
+    :param str define_cache_dir: directory of a persistent cache of
+        the results of DefineVariables blocks; no cache if None
+    :param function warn: called with the text of each warning;
+        warnings.warn if None
     """
-    self._extractor = LineExtractor(template_string)
-    self._message = StatusMessage(self._extractor)
-    self._executor = Executor()
-    self._expander = Expander(self._executor, self._message)
+    if config is None:
+      config = Config.getDefault()
+    self._config = config
+    self._budget = budget
+    self._budget_plan = ExpansionPlan()  # Estimates checked by the budget
+    self._scanner = config.getScanner()
+    self._instrumentation = None
+    if stats:
+      self._instrumentation = Instrumentation()
+    self._extractor = LineExtractor(template, config=config)
+    self._warn = warn
+    self._message = StatusMessage(self._extractor, warn=warn)
+    self._executor = Executor(expression_cache=expression_cache)
+    self._expander = Expander(self._executor, self._message, config=config,
+        instrumentation=self._instrumentation)
     self._command = None  # Command being processed
     self._define_variable_statements = []
+    self._define_constraints_statements = []
+    self._jobs = jobs
+    self._pool = pool
+    self._line_cache = None
+    if line_cache_dir is not None:
+      # Imported when used to keep start-up fast
+      from line_cache import LineCache
+      self._line_cache = LineCache(line_cache_dir, config=config)
+    self._definition_cache = None
+    if define_cache_dir is not None:
+      from definition_cache import DefinitionCache
+      self._definition_cache = DefinitionCache(define_cache_dir)
 
   @classmethod
-  def processFile(cls, inpath, outpath):
+  def processFile(cls, inpath, outpath, jobs=1, line_cache_dir=None,
+      config=None, cache_dir=None, define_cache_dir=None):
     """
     Processes template strings in a file.
     :param str inpath: path to the file containing the templated model
-    :param str outpath: path to the file where the flattened model is placed
+    :param str outpath: path to the file where the flattened model is
+        placed; compressed if it ends in .gz or .xz; standard output
+        if "-" or None
+    :param int jobs: number of processes used to expand lines
+    :param str line_cache_dir: directory of a persistent cache of
+        expanded lines
+    :param Config config: syntax of the template; default if None
+    :param str cache_dir: directory of a persistent cache of outputs;
+        the template is not processed if its output is cached
+    :param str define_cache_dir: directory of a persistent cache of
+        the results of DefineVariables blocks
+    :return bool: True if the output was found in the cache
     """
-    template = ''
-    with open(inpath, 'r') as infile:
-      for line in infile:
-        template += "\n" + line
-    processor = cls(template)
-    expansion = processor.do()
-    with open(outpath, 'w') as outfile:
-      outfile.write(expansion)
+    if cache_dir is None:
+      processor = cls(pathlib.Path(inpath), jobs=jobs,
+          line_cache_dir=line_cache_dir, config=config,
+          define_cache_dir=define_cache_dir)
+      with makeSink(outpath) as sink:
+        processor.writeOutput(sink)
+      return False
+    # Imported when used to keep start-up fast
+    from disk_cache import getModuleFiles
+    from output_cache import OutputCache, recordOpenedFiles
+    cache = OutputCache(cache_dir, config=config)
+    if cache.fetch(inpath, outpath):
+      return True
+    output_path = cache.makeTemporary(outpath)
+    try:
+      with recordOpenedFiles() as paths:
+        processor = cls(pathlib.Path(inpath), jobs=jobs,
+            line_cache_dir=line_cache_dir, config=config,
+            define_cache_dir=define_cache_dir)
+        with makeSink(output_path) as sink:
+          processor.writeOutput(sink)
+      paths.update(getModuleFiles(processor._executor.getNamespace()))
+      cache.store(inpath, outpath, output_path, paths,
+          excluded_directories=[d for d in
+                                [line_cache_dir, define_cache_dir]
+                                if d is not None])
+    finally:
+      if os.path.exists(output_path):
+        os.remove(output_path)
+    return False
+
+  @classmethod
+  def processFiles(cls, pairs, jobs=1, config=None, cache_dir=None):
+    """
+    Processes many template files in one process pool. A failure
+    in one file does not stop the processing of the others.
+    :param list-of-(str, str) pairs: input and output paths
+    :param int jobs: number of processes used to process files
+    :param Config config: syntax of the templates; default if None
+    :param str cache_dir: directory of a persistent cache of outputs;
+        no cache if None
+    :return list-of-FileResult: in the order of pairs
+    """
+    if config is None:
+      config = Config.getDefault()
+    if jobs <= 1:
+      return [_processFileTask(i, o, config, cache_dir) for i, o in pairs]
+    import concurrent.futures
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+      futures = [pool.submit(_processFileTask, i, o, config, cache_dir)
+                 for i, o in pairs]
+      return [f.result() for f in futures]
+
+  @classmethod
+  def doTemplates(cls, templates, threads=None, config=None):
+    """
+    Processes many templates concurrently in a thread pool, each by
+    its own TemplateProcessor.
+    :param list templates: templates as accepted by the constructor
+    :param int threads: number of threads; the default of
+        ThreadPoolExecutor if None
+    :param Config config: syntax of the templates; default if None
+    :return list-of-str: expanded templates in the order of templates
+    :raises ValueError: error in the first template that fails
+    """
+    if config is None:
+      config = Config.getDefault()
+    import concurrent.futures
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads)  \
+        as pool:
+      futures = [pool.submit(lambda t: cls(t, config=config).do(), t)
+                 for t in templates]
+      return [f.result() for f in futures]
+
+  @staticmethod
+  def readManifest(path):
+    """
+    Reads a manifest of files to process. Each line has an input
+    path and an output path separated by white space. Blank lines
+    and comment lines are ignored. Relative paths are relative to
+    the directory of the manifest.
+    :param str path: path to the manifest
+    :return list-of-(str, str):
+    :raises ValueError: if a line does not have two paths
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    pairs = []
+    with open(path, 'r') as infile:
+      for line_number, line in enumerate(infile, 1):
+        text = line.strip()
+        if len(text) == 0 or text.startswith(COMMENT_STG):
+          continue
+        paths = text.split()
+        if len(paths) != 2:
+          raise ValueError("Line %d of %s must have two paths"
+              % (line_number, path))
+        pairs.append(tuple([os.path.join(directory, p) for p in paths]))
+    return pairs
 
   @staticmethod
-  def _makeComment(line):
-    return "%s%s" % (COMMENT_STG, line)
+  def writeLines(lines, outfile):
+    """
+    Writes lines as they are produced, separated by newlines.
+    :param iterable-of-str lines:
+    :param file outfile: file object opened for writing
+    """
+    sink = StreamSink(outfile)
+    sink.writeLines(lines)
+    sink.close()
+
+  def writeOutput(self, sink):
+    """
+    Writes the expanded lines as they are produced.
+    :param OutputSink sink: flushed but not closed
+    """
+    sink.writeLines(self.generateLines())
+    sink.flush()
+
+  def expandLines(self, lines, threads=None):
+    """
+    Expands template lines concurrently in a thread pool using the
+    definitions and constraints of the template processed so far
+    (e.g., by do or plan).
+    :param list-of-str lines: lines with template expressions
+    :param int threads: number of threads; the default of
+        ThreadPoolExecutor if None
+    :return list-of-list-of-str: output lines for each line; several
+        substitutions are preceded by the line as a comment
+    :raises ValueError: error in the first line that fails; the line
+        number is the position of the line in lines
+    """
+    import concurrent.futures
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads)  \
+        as pool:
+      futures = [pool.submit(self._expandLine, n, l)
+                 for n, l in enumerate(lines, 1)]
+      return [f.result() for f in futures]
+
+  def _expandLine(self, line_number, line):
+    """
+    Expands a line with an Expander that reports messages for the line.
+    :param int line_number:
+    :param str line:
+    :return list-of-str:
+    """
+    message = LineMessage(line_number, line, warn=self._warn)
+    expander = Expander(self._executor, message, config=self._config,
+        instrumentation=self._instrumentation)
+    try:
+      substitutions = expander.do(line)
+    except Exception as err:
+      message.error("Runtime error in expression: %s" % str(err))
+    return self._makeExpansion(line, substitutions)
+
+  def _makeComment(self, line):
+    return self._scanner.makeComment(line)
+
+  def _doScript(self, program):
+    """
+    Executes a DefineVariables block, using the results cached for
+    the block if there is a definition cache.
+    :param str program:
+    """
+    if self._definition_cache is None:
+      self._executor.doScript(program)
+    else:
+      self._definition_cache.doScript(self._executor, program)
 
   def _processCommand(self):
     """
@@ -84,7 +337,7 @@ class TemplateProcessor(object):
       is_processed = True
       # Check for nested commands
       if self._command is not None:
-        new_command = Command(line)
+        new_command = Command(line, config=self._config)
         # Is this a paired command?
         if new_command.getCommandVerb()  \
             == self._command.getCommandVerb():
@@ -93,7 +346,7 @@ class TemplateProcessor(object):
           else:
             self._message.error("Cannot nest commands")
       # Valid placement for a command.
-      self._command = Command(line)
+      self._command = Command(line, config=self._config)
       # DefineVariables Command
       if self._command.isDefineVariables():
         if self._command.isBegin():
@@ -101,12 +354,33 @@ class TemplateProcessor(object):
         elif self._command.isEnd():
           try:
             program = '\n'.join(self._define_variables_statements)
-            self._executor.doScript(program)
+            if self._instrumentation is None:
+              self._doScript(program)
+            else:
+              start = time.perf_counter()
+              self._doScript(program)
+              self._instrumentation.addTime(PHASE_DEFINE,
+                  time.perf_counter() - start)
           except Exception as err:
             msg = "***Error %s executing in : \n%s"  \
                 % (str(err), program)
             self._message.error(msg)
           self._command = None
+      # DefineConstraints Command
+      elif self._command.isDefineConstraints():
+        if self._command.isBegin():
+          self._define_constraints_statements = []
+        elif self._command.isEnd():
+          constraints = [c for c in self._define_constraints_statements
+                         if len(c.strip()) > 0
+                         and not self._scanner.isComment(c)]
+          try:
+            for constraint in constraints:
+              _ = Constraint(constraint)
+          except ValueError as err:
+            self._message.error(str(err))
+          self._executor.setConstraints(constraints)
+          self._command = None
       # SetVersion command
       elif self._command.isSetVersion():
         version = self._command.getArguments()[0]
@@ -121,6 +395,8 @@ class TemplateProcessor(object):
       is_processed = True
       if self._command.isDefineVariables() and self._command.isBegin():
         self._define_variables_statements.append(line)
+      elif self._command.isDefineConstraints() and self._command.isBegin():
+        self._define_constraints_statements.append(line)
       else:
         self._message.error("Invalid paired command.")
     return is_processed
@@ -129,6 +405,15 @@ class TemplateProcessor(object):
     """
     Processes the template string and returns the expanded lines for input
     to road runner.
+    :return str expanded_string:
+    :raises ValueError: errors encountered in the template string
+    """
+    return SPLIT_STG.join(self.generateLines())
+
+  def generateLines(self):
+    """
+    Processes the template one line at a time, yielding the expanded
+    lines as each template line is processed.
     Phases
       1. Construct content lines (non-blank, not comments)
       2. Extract the template variable definitions
@@ -136,39 +421,246 @@ class TemplateProcessor(object):
       4. Process the lines with template variables
     State used:
       reads: _definitions
-    :return str expanded_string:
+    :return generator-of-str: expanded lines
     :raises ValueError: errors encountered in the template string
     """
-    cls = TemplateProcessor
-    expansion = []
+    parallel = None
+    if self._jobs > 1:
+      from parallel_expander import ParallelExpander
+      parallel = ParallelExpander(self._executor, jobs=self._jobs,
+          pool=self._pool, config=self._config)
+    try:
+      if self._instrumentation is None:
+        for expanded_line in self._generateLines(parallel):
+          yield expanded_line
+      else:
+        for expanded_line in self._generateLines(parallel):
+          self._instrumentation.count(COUNT_OUTPUT_LINES)
+          self._instrumentation.count(COUNT_BYTES,
+              len(expanded_line.encode('utf-8')) + len(SPLIT_STG))
+          yield expanded_line
+    finally:
+      if parallel is not None:
+        parallel.close()
+    if self._line_cache is not None:
+      self._line_cache.close()
+    if self._definition_cache is not None:
+      self._definition_cache.close()
+
+  def getStats(self):
+    """
+    Provides the statistics collected if the processor was constructed
+    with stats=True. Lines expanded in worker processes are counted
+    by type but their expansion is not timed.
+    :return dict: see Instrumentation.getStats; None if not collected
+    """
+    if self._instrumentation is None:
+      return None
+    stats = self._instrumentation.getStats()
+    if stats['counters'].get(COUNT_OUTPUT_LINES, 0) > 0:
+      # The last line has no separator
+      stats['counters'][COUNT_BYTES] -= len(SPLIT_STG)
+    return stats
+
+  def formatStats(self):
+    """
+    :return str: report of the statistics; None if not collected
+    """
+    if self._instrumentation is None:
+      return None
+    return self._instrumentation.format()
+
+  def plan(self):
+    """
+    Estimates the output of the template without expanding it.
+    DefineVariables and DefineConstraints blocks are executed.
+    :return ExpansionPlan:
+    :raises ValueError: if the budget is exceeded
+    """
+    plan = ExpansionPlan()
+    line, line_type = self._extractLine()
+    while line is not None:
+      is_command = self._processCommand()
+      self._planLine(plan, line, line_type, is_command)
+      line, line_type = self._extractLine()
+    if self._command is not None:
+      msg = "Still processing command %s at EOF" % str(self._command)
+      self._message.error(msg)
+    return plan
+
+  def _planLine(self, plan, line, line_type, is_command):
+    """
+    Adds the estimated output of the current line to a plan,
+    checking the budget.
+    :param ExpansionPlan plan:
+    :param str line:
+    :param int line_type:
+    :param bool is_command: line is a command or in a paired command
+    :raises ValueError: if the budget is exceeded
+    """
+    if is_command:
+      output_line = self._makeComment(line)
+    elif line_type == LINE_TRAN:
+      output_line = line
+    elif line_type == LINE_SUBS:
+      estimate = self._expander.estimate(line,
+          self._extractor.getCurrentSourceLineNumber())
+      plan.addEstimate(estimate)
+      if self._budget is not None:
+        msg = self._budget.check(estimate, plan.getTotalBytes())
+        if msg is not None:
+          self._message.error(msg)
+      return
+    else:
+      return
+    plan.addOutput(1, len(output_line.encode('utf-8')) + len(SPLIT_STG))
+
+  def _extractLine(self):
+    """
+    Extracts the next line, recording the time taken.
+    :return str, int: line, line classification
+    """
+    if self._instrumentation is None:
+      return self._extractor.do()
+    start = time.perf_counter()
     line, line_type = self._extractor.do()
-    statements = []
+    self._instrumentation.addTime(PHASE_EXTRACT, time.perf_counter() - start)
+    return line, line_type
+
+  def _getCachedExpansion(self, line):
+    """
+    Looks up the line in the line cache.
+    :param str line:
+    :return list-of-str, str: substitutions (None if not found) and
+        the key for the line (None if the line cannot be cached)
+    """
+    if self._line_cache is None:
+      return None, None
+    dependencies = self._expander.getDependencies(line)
+    key = self._line_cache.makeKey(line, dependencies)
+    if key is None:
+      return None, None
+    return self._line_cache.get(key), key
+
+  def _cacheExpansion(self, key, substitutions):
+    """
+    :param str key: key for the line; None if not cached
+    :param list-of-str substitutions:
+    """
+    if key is not None:
+      self._line_cache.put(key, substitutions)
+
+  def _makeExpansion(self, line, substitutions):
+    """
+    :param str line: template line
+    :param list-of-str substitutions: expansion of the line
+    :return list-of-str: lines output for the template line
+    """
+    if len(substitutions) > 1:
+      return [self._makeComment(line)] + substitutions
+    return substitutions
+
+  def _finishExpansions(self, pending, parallel, max_pending=0):
+    """
+    Outputs lines expanded in worker processes, and the lines that
+    follow them, until no more than max_pending remain.
+    :param deque pending: entries are line, source line number,
+        handle, the list of output lines that follow the line, and
+        the key for the line cache
+    :param ParallelExpander parallel:
+    :param int max_pending:
+    :return generator-of-str:
+    """
+    while len(pending) > max_pending:
+      line, line_number, handle, following_lines, key = pending.popleft()
+      substitutions, warnings, error = parallel.getResult(handle)
+      for msg in warnings:
+        self._message.warning(msg, line_number=line_number, line=line)
+      if error is not None:
+        msg = "Runtime error in expression"
+        self._message.error(msg, line_number=line_number, line=line)
+      self._cacheExpansion(key, substitutions)
+      for expanded_line in self._makeExpansion(line, substitutions):
+        yield expanded_line
+      for output_line in following_lines:
+        yield output_line
+
+  def _generateLines(self, parallel):
+    """
+    Processes the template, expanding lines in worker processes
+    if parallel is not None. Lines being expanded in workers are
+    queued along with the lines that follow them so that output is
+    in source order.
+    :param ParallelExpander parallel:
+    :return generator-of-str: expanded lines
+    """
+    pending = collections.deque()  # Lines being expanded in workers
+    max_pending = 2*self._jobs*PARALLEL_BATCH_SIZE
+    line, line_type = self._extractLine()
     while line is not None:
-      if self._processCommand():
-        expansion.append(cls._makeComment(line))
+      output_lines = []
+      is_command = self._processCommand()
+      if self._budget is not None:
+        self._planLine(self._budget_plan, line, line_type, is_command)
+      if self._instrumentation is not None:
+        # Lines within paired commands are counted as commands
+        self._instrumentation.count(LINE_COUNT_PREFIX
+            + LINE_TYPE_NAMES[LINE_COMMAND if is_command else line_type])
+      if is_command:
+        output_lines.append(self._makeComment(line))
+        if parallel is not None and line_type == LINE_COMMAND:
+          parallel.invalidate()
       # No command being processed
       else:
         # Transparent line (comment)
         if line_type == LINE_TRAN:
-          expansion.append(line)
+          output_lines.append(line)
         elif line_type == LINE_NONE:
           pass
         # Line to be substituted
         elif line_type == LINE_SUBS:
-          # Do the variable substitutions
-          try:
-            substitutions = self._expander.do(line)
-          except Exception as err:
-            msg = "Runtime error in expression"
-            self._message.error(msg)
-          if len(substitutions) > 1:
-            expansion.append(cls._makeComment(line))
-          expansion.extend(substitutions)
+          substitutions, key = self._getCachedExpansion(line)
+          handle = None
+          if substitutions is None and parallel is not None:
+            handle = parallel.submit(line)
+          if substitutions is not None:
+            output_lines = self._makeExpansion(line, substitutions)
+          elif handle is not None:
+            line_number = self._extractor.getCurrentSourceLineNumber()
+            pending.append((line, line_number, handle, [], key))
+          else:
+            # Preceding lines are output before errors in this line
+            for expanded_line in self._finishExpansions(pending, parallel):
+              yield expanded_line
+            # Do the variable substitutions
+            try:
+              if self._instrumentation is None:
+                substitutions = self._expander.do(line)
+              else:
+                start = time.perf_counter()
+                substitutions = self._expander.do(line)
+                seconds = time.perf_counter() - start
+                self._instrumentation.addTime(PHASE_EXPAND, seconds)
+                self._instrumentation.addLine(seconds,
+                    self._extractor.getCurrentSourceLineNumber(), line)
+            except Exception as err:
+              msg = "Runtime error in expression"
+              self._message.error(msg)
+            self._cacheExpansion(key, substitutions)
+            output_lines = self._makeExpansion(line, substitutions)
         else:
-          import pdb; pdb.set_trace()
           raise RuntimeError("Unexepcted state")
-      line, line_type = self._extractor.do()
+      if len(pending) > 0:
+        pending[-1][3].extend(output_lines)
+      else:
+        for output_line in output_lines:
+          yield output_line
+      for expanded_line in self._finishExpansions(pending, parallel,
+          max_pending=max_pending):
+        yield expanded_line
+      line, line_type = self._extractLine()
+    for expanded_line in self._finishExpansions(pending, parallel):
+      yield expanded_line
     if self._command is not None:
       msg = "Still processing command %s at EOF" % str(self._command)
       self._message.error(msg)
-    return "\n".join(expansion)
@@ -46,6 +46,15 @@ class TestApi(unittest.TestCase):
     definitions = self.api.getDefinitions()
     self.assertEqual(definitions.items(), DEFINITIONS.items())
 
+  def testConstraints(self):
+    if IGNORE_TEST:
+      return
+    self.api.addConstraints(["a > 1"])
+    self.api.addConstraints(["a < 3"])
+    self.assertEqual(self.api.getConstraints(), ["a > 1", "a < 3"])
+    self.api.clearConstraints()
+    self.assertEqual(len(self.api.getConstraints()), 0)
+
 
 if __name__ == '__main__':
   unittest.main()
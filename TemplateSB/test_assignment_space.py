@@ -0,0 +1,71 @@
+"""
+Tests for AssignmentSpace
+"""
+from assignment_space import AssignmentSpace
+import unittest
+
+
+IGNORE_TEST = False
+DEFINITIONS = {'a': ['a', 'b', 'c'], 'm': [1, 2, 3],
+    'c': ['c', '']}
+EXPECTED_LENGTH = 18
+
+
+#############################
+# Tests
+#############################
+# pylint: disable=W0212,C0111,R0904
+class TestAssignmentSpace(unittest.TestCase):
+
+  def setUp(self):
+    self.space = AssignmentSpace(DEFINITIONS)
+
+  def testConstructor(self):
+    if IGNORE_TEST:
+      return
+    self.assertEqual(len(self.space), EXPECTED_LENGTH)
+    self.assertEqual(self.space.getNames(), ['a', 'm', 'c'])
+    self.assertEqual(len(AssignmentSpace({})), 0)
+    self.assertEqual(len(AssignmentSpace({'a': [1], 'b': []})), 0)
+
+  def testOrder(self):
+    if IGNORE_TEST:
+      return
+    assignments = list(self.space)
+    self.assertEqual(len(assignments), EXPECTED_LENGTH)
+    self.assertEqual(assignments[0], {'a': 'a', 'm': 1, 'c': 'c'})
+    self.assertEqual(assignments[1], {'a': 'b', 'm': 1, 'c': 'c'})
+    self.assertEqual(assignments[3], {'a': 'a', 'm': 2, 'c': 'c'})
+    self.assertEqual(assignments[-1], {'a': 'c', 'm': 3, 'c': ''})
+    unique = set([tuple(sorted(d.items())) for d in assignments])
+    self.assertEqual(len(unique), EXPECTED_LENGTH)
+
+  def testIterPositions(self):
+    if IGNORE_TEST:
+      return
+    positions = list(self.space.iterPositions())
+    self.assertEqual(positions[0], (0, 0, 0))
+    self.assertEqual(positions[1], (1, 0, 0))
+    self.assertEqual(positions[-1], (2, 2, 1))
+    assignments = [self.space.makeAssignment(p) for p in positions]
+    self.assertEqual(assignments, list(self.space))
+    assignment = {}
+    for position, expected in zip(positions, assignments):
+      self.space.updateAssignment(assignment, position)
+      self.assertEqual(assignment, expected)
+
+  def testGetItem(self):
+    if IGNORE_TEST:
+      return
+    assignments = list(self.space)
+    for idx in range(EXPECTED_LENGTH):
+      self.assertEqual(self.space[idx], assignments[idx])
+    self.assertEqual(self.space[-2], assignments[-2])
+    self.assertEqual(self.space[4:9], assignments[4:9])
+    self.assertEqual(self.space[::5], assignments[::5])
+    with self.assertRaises(IndexError):
+      _ = self.space[EXPECTED_LENGTH]
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,50 @@
+"""
+Tests for benchmark
+"""
+import benchmark
+from template_processor import TemplateProcessor
+import unittest
+
+
+IGNORE_TEST = False
+
+
+#############################
+# Tests
+#############################
+# pylint: disable=W0212,C0111,R0904
+class TestBenchmark(unittest.TestCase):
+
+  def testMakeSyntheticTemplate(self):
+    if IGNORE_TEST:
+      return
+    template = benchmark.makeSyntheticTemplate(4, 3, 5, 10)
+    lines = TemplateProcessor(template).do().split('\n')
+    # Each template line has 3 variables with 3 values
+    self.assertEqual(len(lines), 3 + 10*(1 + 27))
+
+  def testBenchmark(self):
+    if IGNORE_TEST:
+      return
+    template = benchmark.makeSyntheticTemplate(2, 3, 2, 5)
+    result = benchmark.benchmark("case", template, 2)
+    self.assertEqual(result["output_lines"], 3 + 5*(1 + 9))
+    self.assertGreater(result["lines_per_second"], 0)
+    self.assertGreater(result["phases"][benchmark.PHASE_EXPAND], 0)
+    self.assertGreater(result["peak_bytes"], 0)
+
+  def testCompareResults(self):
+    if IGNORE_TEST:
+      return
+    baseline = {"cases": {"a": {"lines_per_second": 100.0},
+                          "b": {"lines_per_second": 100.0}}}
+    results = {"cases": {"a": {"lines_per_second": 70.0},
+                         "b": {"lines_per_second": 90.0},
+                         "c": {"lines_per_second": 1.0}}}
+    regressions = benchmark.compareResults(results, baseline,
+        threshold=0.2)
+    self.assertEqual(regressions, [("a", 0.7)])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,34 @@
+"""
+Tests for the client of the expansion server
+"""
+from client import writeFrame, readFrame, FRAME_INPUT, FRAME_END
+import io
+import unittest
+
+
+IGNORE_TEST = False
+
+
+#############################
+# Tests
+#############################
+# pylint: disable=W0212,C0111,R0904
+class TestClient(unittest.TestCase):
+
+  def testFrames(self):
+    if IGNORE_TEST:
+      return
+    stream = io.BytesIO()
+    writeFrame(stream, FRAME_INPUT, "J{a}: é".encode('utf-8'))
+    writeFrame(stream, FRAME_END, b"")
+    stream.seek(0)
+    self.assertEqual(readFrame(stream),
+        (FRAME_INPUT, "J{a}: é".encode('utf-8')))
+    self.assertEqual(readFrame(stream), (FRAME_END, b""))
+    self.assertEqual(readFrame(stream), (None, None))
+    with self.assertRaises(IOError):
+      readFrame(io.BytesIO(stream.getvalue()[:7]))
+
+
+if __name__ == '__main__':
+  unittest.main()
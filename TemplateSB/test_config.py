@@ -0,0 +1,106 @@
+"""
+Tests for Config and Scanner
+"""
+from config import Config
+from constants import LINE_TRAN, LINE_COMMAND, LINE_SUBS, LINE_NONE
+import constants
+import os
+import pickle
+import unittest
+
+
+IGNORE_TEST = False
+PARENT_DIR = os.path.dirname(os.path.abspath(__file__))
+TEST_FILE = os.path.join(PARENT_DIR, "testdata_constants.yaml")
+
+
+#############################
+# Tests
+#############################
+# pylint: disable=W0212,C0111,R0904
+class TestConfig(unittest.TestCase):
+
+  def setUp(self):
+    self.config = Config.getDefault()
+
+  def testGetDefault(self):
+    if IGNORE_TEST:
+      return
+    self.assertEqual(self.config.command_start, constants.COMMAND_START)
+    self.assertEqual(self.config.expression_end, constants.EXPRESSION_END)
+    self.assertEqual(self.config.warning_assignments,
+        constants.WARNING_ASSIGNMENTS)
+
+  def testFromDict(self):
+    if IGNORE_TEST:
+      return
+    config = Config.fromDict({"expression_start": "<",
+        "expression_end": ">"})
+    self.assertEqual(config.expression_start, "<")
+    self.assertEqual(config.command_start, self.config.command_start)
+    with self.assertRaises(ValueError):
+      Config.fromDict({"junk": 1})
+
+  def testFromFile(self):
+    if IGNORE_TEST:
+      return
+    config = Config.fromFile(TEST_FILE, cache_path=None)
+    self.assertEqual(config.warning_assignments, -1)
+    # The module constants are unchanged
+    self.assertEqual(Config.getDefault(), self.config)
+
+  def testImmutable(self):
+    if IGNORE_TEST:
+      return
+    with self.assertRaises(AttributeError):
+      self.config.comment_stg = "%"
+    config = self.config.replace(comment_stg="%")
+    self.assertEqual(config.comment_stg, "%")
+    self.assertEqual(self.config.comment_stg, constants.COMMENT_STG)
+    self.assertEqual(pickle.loads(pickle.dumps(config)), config)
+
+  def testGetScanner(self):
+    if IGNORE_TEST:
+      return
+    scanner = self.config.getScanner()
+    self.assertTrue(Config.getDefault().getScanner() is scanner)
+    self.assertFalse(self.config.replace(comment_stg="%").getScanner()
+        is scanner)
+
+
+class TestScanner(unittest.TestCase):
+
+  def setUp(self):
+    self.config = Config.getDefault().replace(command_start="<<",
+        command_end=">>", comment_stg="//", continued_stg="...",
+        expression_start="$(", expression_end=")")
+    self.scanner = self.config.getScanner()
+
+  def testClassifyLine(self):
+    if IGNORE_TEST:
+      return
+    self.assertEqual(self.scanner.classifyLine(None), LINE_NONE)
+    self.assertEqual(self.scanner.classifyLine("  "), LINE_NONE)
+    self.assertEqual(self.scanner.classifyLine("// J$(a)"), LINE_TRAN)
+    self.assertEqual(self.scanner.classifyLine("J{a}: S -> P"), LINE_TRAN)
+    self.assertEqual(self.scanner.classifyLine("<< SetVersion 1.0 >>"),
+        LINE_COMMAND)
+    self.assertEqual(self.scanner.classifyLine("J$(a): S -> P"), LINE_SUBS)
+
+  def testGetExpressionPattern(self):
+    if IGNORE_TEST:
+      return
+    pattern = self.scanner.getExpressionPattern()
+    self.assertEqual(pattern.findall("J$(a)_$(b + 1)"), ["a", "b + 1"])
+
+  def testContinuedAndComment(self):
+    if IGNORE_TEST:
+      return
+    self.assertTrue(self.scanner.isContinued("J$(a) ..."))
+    self.assertFalse(self.scanner.isContinued("J$(a) .."))
+    self.assertTrue(self.scanner.isComment("  // text"))
+    self.assertEqual(self.scanner.makeComment("x"), "//x")
+
+
+if __name__ == '__main__':
+  unittest.main()
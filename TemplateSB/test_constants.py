@@ -2,7 +2,10 @@
 Tests for constants
 """
 import constants
+import marshal
 import os
+import shutil
+import tempfile
 import unittest
 
 
@@ -17,6 +20,9 @@ TEST_FILE = os.path.join(PARENT_DIR, "testdata_constants.yaml")
 # pylint: disable=W0212,C0111,R0904
 class TestConstants(unittest.TestCase):
 
+  def tearDown(self):
+    constants.setConstantsFromConfig()
+
   def testBasicr(self):
     if IGNORE_TEST:
       return
@@ -28,6 +34,38 @@ class TestConstants(unittest.TestCase):
     constants.setConstantsFromConfig(path=TEST_FILE)
     self.assertEqual(constants.WARNING_ASSIGNMENTS, -1)
 
+  def testReadConfigCache(self):
+    if IGNORE_TEST:
+      return
+    directory = tempfile.mkdtemp()
+    try:
+      path = os.path.join(directory, "config.yaml")
+      cache_path = os.path.join(directory, "cache", "config.marshal")
+      shutil.copyfile(TEST_FILE, path)
+      expected = constants.readConfig(path, None)
+      self.assertEqual(constants.readConfig(path, cache_path), expected)
+      self.assertTrue(os.path.isfile(cache_path))
+      # Cached values are used while the file is unchanged
+      with open(cache_path, "rb") as fd:
+        signature, _ = marshal.load(fd)
+      with open(cache_path, "wb") as fd:
+        marshal.dump((signature, {"cached": True}), fd)
+      self.assertEqual(constants.readConfig(path, cache_path),
+          {"cached": True})
+      stat = os.stat(path)
+      # A changed file is parsed again
+      with open(path, "a") as fd:
+        fd.write("\nwarn_assignments: 5\n")
+      os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+      config_dict = constants.readConfig(path, cache_path)
+      self.assertEqual(config_dict["warn_assignments"], 5)
+      # A corrupt cache is ignored
+      with open(cache_path, "wb") as fd:
+        fd.write(b"bad")
+      self.assertEqual(constants.readConfig(path, cache_path), config_dict)
+    finally:
+      shutil.rmtree(directory)
+
 
 
 if __name__ == '__main__':
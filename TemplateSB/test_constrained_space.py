@@ -0,0 +1,89 @@
+"""
+Tests for ConstrainedAssignmentSpace
+"""
+from constrained_space import Constraint, ConstrainedAssignmentSpace
+from assignment_space import AssignmentSpace
+from executor import Executor
+import unittest
+
+
+IGNORE_TEST = False
+DEFINITIONS = {'a': ['a', 'b', 'c'], 'm': [1, 2, 3, 4],
+    'c': ['c', '']}
+CONSTRAINT1 = "m < 4"
+CONSTRAINT2 = "not (a == 'b' and c == '')"
+
+
+class CountingConstraint(Constraint):
+  """
+  Counts the evaluations of a constraint.
+  """
+
+  def __init__(self, predicate):
+    super(CountingConstraint, self).__init__(predicate)
+    self.count = 0
+
+  def isSatisfied(self, executor, assignment):
+    self.count += 1
+    return super(CountingConstraint, self).isSatisfied(executor,
+        assignment)
+
+
+#############################
+# Tests
+#############################
+# pylint: disable=W0212,C0111,R0904
+class TestConstrainedAssignmentSpace(unittest.TestCase):
+
+  def setUp(self):
+    self.executor = Executor()
+    self.executor.setDefinitions(DEFINITIONS)
+
+  def testConstraint(self):
+    if IGNORE_TEST:
+      return
+    constraint = Constraint("m < len(a)")
+    self.assertEqual(constraint.getNames(), set(['m', 'a', 'len']))
+    self.assertEqual(constraint.getVariables(DEFINITIONS), set(['m', 'a']))
+    self.assertTrue(constraint.isSatisfied(self.executor,
+        {'m': 0, 'a': 'x'}))
+    constraint = Constraint(lambda m, c: m > 1 or c == 'c')
+    self.assertEqual(constraint.getNames(), set(['m', 'c']))
+    self.assertFalse(constraint.isSatisfied(self.executor,
+        {'m': 1, 'c': '', 'a': 'a'}))
+    with self.assertRaises(ValueError):
+      Constraint("m <")
+
+  def testOrder(self):
+    if IGNORE_TEST:
+      return
+    constraints = [Constraint(CONSTRAINT1), Constraint(CONSTRAINT2)]
+    space = ConstrainedAssignmentSpace(DEFINITIONS, constraints,
+        self.executor)
+    expected = [d for d in AssignmentSpace(DEFINITIONS)
+                if d['m'] < 4 and not (d['a'] == 'b' and d['c'] == '')]
+    self.assertEqual(len(space), len(expected))
+    self.assertEqual(list(space), expected)
+    self.assertEqual(space[1], expected[1])
+
+  def testPruning(self):
+    if IGNORE_TEST:
+      return
+    # The constraint on m is checked before the other variables are bound
+    constraint = CountingConstraint("m == 1")
+    space = ConstrainedAssignmentSpace(DEFINITIONS, [constraint],
+        self.executor)
+    self.assertEqual(len(space), 6)
+    self.assertEqual(constraint.count, len(DEFINITIONS['m']))
+
+  def testEmpty(self):
+    if IGNORE_TEST:
+      return
+    space = ConstrainedAssignmentSpace(DEFINITIONS,
+        [Constraint("m > 10")], self.executor)
+    self.assertEqual(len(space), 0)
+    self.assertEqual(list(space), [])
+
+
+if __name__ == '__main__':
+  unittest.main()
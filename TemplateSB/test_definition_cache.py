@@ -0,0 +1,149 @@
+"""
+Tests for DefinitionCache
+"""
+from definition_cache import DefinitionCache
+from executor import Executor
+from template_processor import TemplateProcessor
+import os
+import shutil
+import tempfile
+import unittest
+
+
+IGNORE_TEST = False
+BLOCK1 = '''import collections
+import math
+P = collections.namedtuple('P', 'nm k')
+params = [P(nm, int(k)) for nm, k in
+    [l.split() for l in open(%r).read().split('\\n') if l]]
+api.addDefinitions({'p': params})'''
+BLOCK2 = '''scale = math.sqrt(4)
+api.addDefinitions({'s': [1, 2]})'''
+LINE = "J{p.nm}{s}: {p.k*scale*s}"
+
+
+#############################
+# Tests
+#############################
+# pylint: disable=W0212,C0111,R0904
+class TestDefinitionCache(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.cache_dir = os.path.join(self.directory, "cache")
+    self.data_path = os.path.join(self.directory, "params.txt")
+    self._writeData("a 1\nb 2\n")
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def _writeData(self, text):
+    with open(self.data_path, 'w') as outfile:
+      outfile.write(text)
+
+  def _makeTemplate(self, blocks):
+    lines = []
+    for block in blocks:
+      lines.append("{{ DefineVariables Begin }}")
+      lines.extend(block.split('\n'))
+      lines.append("{{ DefineVariables End }}")
+    lines.append(LINE)
+    return '\n'.join(lines)
+
+  def _run(self, template):
+    """
+    :return str, dict: output and statistics of the cache
+    """
+    processor = TemplateProcessor(template, define_cache_dir=self.cache_dir)
+    output = processor.do()
+    return output, processor._definition_cache.getStatistics()
+
+  def testDoScript(self):
+    if IGNORE_TEST:
+      return
+    template = self._makeTemplate([BLOCK1 % self.data_path, BLOCK2])
+    expected = TemplateProcessor(template).do()
+    self.assertTrue("Jb2: 8.0" in expected)
+    output, statistics = self._run(template)
+    self.assertEqual(output, expected)
+    self.assertEqual(statistics, {'hits': 0, 'misses': 2})
+    output, statistics = self._run(template)
+    self.assertEqual(output, expected)
+    self.assertEqual(statistics, {'hits': 2, 'misses': 0})
+    # A file read by the first block changes, so both blocks are run
+    self._writeData("a 1\nb 3\n")
+    output, statistics = self._run(template)
+    self.assertTrue("Jb2: 12.0" in output)
+    self.assertEqual(statistics, {'hits': 0, 'misses': 2})
+    # A change to the first block changes the key of the second
+    template = template.replace("int(k)", "2*int(k)")
+    output, statistics = self._run(template)
+    self.assertTrue("Jb2: 24.0" in output)
+    self.assertEqual(statistics, {'hits': 0, 'misses': 2})
+
+  def testCurrentDirectory(self):
+    if IGNORE_TEST:
+      return
+    # A relative path names a different file in each directory
+    template = self._makeTemplate(
+        ["api.addDefinitions({'v': open('p.txt').read().split()})"])
+    template = template.replace(LINE, "X{v}")
+    current_directory = os.getcwd()
+    try:
+      for name, values in [("A", "1 2"), ("B", "7 8 9")]:
+        directory = os.path.join(self.directory, name)
+        os.mkdir(directory)
+        os.chdir(directory)
+        with open("p.txt", 'w') as outfile:
+          outfile.write(values)
+        output, statistics = self._run(template)
+        self.assertTrue("X%s" % values[-1] in output)
+        self.assertEqual(statistics, {'hits': 0, 'misses': 1})
+    finally:
+      os.chdir(current_directory)
+
+  def testUnpicklable(self):
+    if IGNORE_TEST:
+      return
+    block = (BLOCK1 % self.data_path) + "\nf = lambda x: x"
+    template = self._makeTemplate([block, BLOCK2])
+    expected = TemplateProcessor(template).do()
+    for _ in range(2):
+      output, statistics = self._run(template)
+      self.assertEqual(output, expected)
+      # The second block is run since it follows an uncached block
+      self.assertEqual(statistics, {'hits': 0, 'misses': 1})
+
+  def testRemovals(self):
+    if IGNORE_TEST:
+      return
+    program1 = "a = 1; b = 2; api.addDefinitions({'x': [1], 'y': [2]})"
+    program2 = "del a; api.removeDefinitions(['x']); api.addConstraints(['y > 0'])"
+    for _ in range(2):
+      executor = Executor()
+      cache = DefinitionCache(self.cache_dir)
+      cache.doScript(executor, program1)
+      cache.doScript(executor, program2)
+      self.assertFalse('a' in executor.getNamespace())
+      self.assertEqual(executor.getNamespace()['b'], 2)
+      self.assertEqual(executor.getDefinitions(), {'y': [2]})
+      self.assertEqual(executor.getConstraints(), ['y > 0'])
+    self.assertEqual(cache.getStatistics(), {'hits': 2, 'misses': 0})
+
+  def testMutation(self):
+    if IGNORE_TEST:
+      return
+    # The second block changes a definition in place
+    blocks = ["vals = [1, 2]\napi.addDefinitions({'a': vals})",
+        "vals.append(3)"]
+    template = self._makeTemplate(blocks).replace(LINE, "X{a}")
+    expected = TemplateProcessor(template).do()
+    self.assertTrue("X3" in expected)
+    for _ in range(2):
+      output, _ = self._run(template)
+      self.assertEqual(output, expected)
+    self.assertEqual(self._run(template)[1], {'hits': 2, 'misses': 0})
+
+
+if __name__ == '__main__':
+  unittest.main()
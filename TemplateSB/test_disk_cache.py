@@ -0,0 +1,107 @@
+"""
+Tests for DiskCache
+"""
+from disk_cache import DiskCache, ValuePickler, makeDigest
+import collections
+import io
+import math
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import unittest
+
+
+IGNORE_TEST = False
+KEY1 = "a1b2c3"
+KEY2 = "d4e5f6"
+DATA = b"0123456789"
+
+
+#############################
+# Tests
+#############################
+# pylint: disable=W0212,C0111,R0904
+class TestDiskCache(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.cache = DiskCache(os.path.join(self.directory, "cache"), 15)
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def testGetPut(self):
+    if IGNORE_TEST:
+      return
+    self.assertIsNone(self.cache.get(KEY1))
+    self.cache.put(KEY1, DATA)
+    self.assertTrue(self.cache.contains(KEY1))
+    self.assertEqual(self.cache.get(KEY1), DATA)
+    self.assertEqual(self.cache.hits, 1)
+    self.assertEqual(self.cache.misses, 1)
+    self.assertEqual(self.cache.getSize(), len(DATA))
+
+  def testPutFile(self):
+    if IGNORE_TEST:
+      return
+    path = os.path.join(self.directory, "source")
+    with open(path, 'wb') as outfile:
+      outfile.write(DATA)
+    self.cache.putFile(KEY1, path)
+    self.assertEqual(self.cache.get(KEY1), DATA)
+
+  def testMoveFile(self):
+    if IGNORE_TEST:
+      return
+    path = self.cache.makeTemporary(suffix=".gz")
+    self.assertTrue(path.endswith(".gz"))
+    with open(path, 'wb') as outfile:
+      outfile.write(DATA)
+    self.assertEqual(self.cache.getSize(), 0)
+    self.cache.moveFile(KEY1, path)
+    self.assertFalse(os.path.exists(path))
+    self.assertEqual(self.cache.get(KEY1), DATA)
+
+  def testEvict(self):
+    if IGNORE_TEST:
+      return
+    self.cache.put(KEY1, DATA)
+    self.cache.put(KEY2, DATA)
+    past = time.time() - 100
+    os.utime(self.cache.getPath(KEY2), (past, past))
+    self.assertEqual(self.cache.evict(), 1)
+    self.assertTrue(self.cache.contains(KEY1))
+    self.assertFalse(self.cache.contains(KEY2))
+    self.assertEqual(self.cache.evict(), 0)
+
+  def testValuePickler(self):
+    if IGNORE_TEST:
+      return
+    namespace = {}
+    exec("import collections\nQ = collections.namedtuple('Q', 'a b', "
+        + "defaults=[3])", namespace)
+    cls = namespace['Q']
+    value = {'m': math, 'Q': cls, 'q': [cls(1), cls(2, 4)],
+        'tuple': collections.OrderedDict}
+    stream = io.BytesIO()
+    ValuePickler(stream).dump(value)
+    with self.assertRaises(Exception):
+      pickle.dumps(value)
+    loaded = pickle.loads(stream.getvalue())
+    self.assertTrue(loaded['m'] is math)
+    self.assertTrue(loaded['tuple'] is collections.OrderedDict)
+    self.assertTrue(isinstance(loaded['q'][0], loaded['Q']))
+    self.assertEqual(loaded['q'][0].b, 3)
+    self.assertEqual(loaded['q'][1], (2, 4))
+
+  def testMakeDigest(self):
+    if IGNORE_TEST:
+      return
+    self.assertEqual(makeDigest(["ab", "c"]), makeDigest(["ab", "c"]))
+    self.assertNotEqual(makeDigest(["ab", "c"]), makeDigest(["a", "bc"]))
+
+
+if __name__ == '__main__':
+  unittest.main()
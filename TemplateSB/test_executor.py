@@ -47,6 +47,66 @@ class TestExecutor(unittest.TestCase):
     result = self.executor.doExpression(expression)
     self.assertEqual(result, namespace['a'] + namespace['b'])
 
+  def testDoExpressionNames(self):
+    if IGNORE_TEST:
+      return
+    self.executor.addNamespace({'a': 1, 'b': 2})
+    names = {'a': 10}
+    self.assertEqual(self.executor.doExpression("a + b", names=names), 12)
+    self.assertEqual(self.executor.doExpression("[a for _ in range(2)]",
+        names=names), [10, 10])
+    self.assertEqual(self.executor.doExpression("(lambda: a + b)()",
+        names=names), 12)
+    self.assertEqual(self.executor._namespace['a'], 1)
+
+  def testDoExpressionFunction(self):
+    if IGNORE_TEST:
+      return
+    # Functions defined in the namespace read variables as globals
+    self.executor.doScript("def f(): return a*10 + b")
+    self.executor.addNamespace({'b': 1})
+    names = {'a': 2, 'b': 3}
+    self.assertEqual(self.executor.doExpression("f()", names=names), 23)
+    self.assertFalse('a' in self.executor._namespace)
+    self.assertEqual(self.executor._namespace['b'], 1)
+    with self.assertRaises(ZeroDivisionError):
+      self.executor.doExpression("f()/0", names=names)
+    self.assertFalse('a' in self.executor._namespace)
+    self.executor.doScript("class C(object):\n  def get(self): return a\n"
+        + "c = C()")
+    self.assertEqual(self.executor.doExpression("c.get()", names=names), 2)
+    self.assertFalse('a' in self.executor._namespace)
+    # The namespace is not changed while the expression is evaluated
+    self.executor.doScript("g = lambda: 'a' in globals().keys()")
+    self.assertFalse(self.executor.doExpression("g()", names=names))
+
+  def testCompileExpression(self):
+    if IGNORE_TEST:
+      return
+    executor = Executor(cache_size=2)
+    executor.addNamespace({'a': 1})
+    for _ in range(3):
+      self.assertEqual(executor.doExpression("a + 1"), 2)
+    statistics = executor.getCacheStatistics()
+    self.assertEqual(statistics['misses'], 1)
+    self.assertEqual(statistics['hits'], 2)
+    executor.compileExpression("a + 2")
+    executor.compileExpression("a + 3")
+    self.assertEqual(executor.getCacheStatistics()['size'], 2)
+    self.assertEqual(executor.doExpression("a + 1"), 2)
+    self.assertEqual(executor.getCacheStatistics()['misses'], 4)
+
+  def testSharedCache(self):
+    if IGNORE_TEST:
+      return
+    executor1 = Executor()
+    executor2 = Executor(expression_cache=executor1._expression_cache)
+    executor1.addNamespace({'a': 1})
+    executor2.addNamespace({'a': 2})
+    self.assertEqual(executor1.doExpression("a + 1"), 2)
+    self.assertEqual(executor2.doExpression("a + 1"), 3)
+    self.assertEqual(executor2.getCacheStatistics()['hits'], 1)
+
   def testDoExpressionException(self):
     namespace = {'a': 1, 'b': 0}
     expression = "a / b"
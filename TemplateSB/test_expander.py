@@ -2,7 +2,7 @@
 Tests for Expander
 """
 from expander import Expander
-from expander import EXPRESSION_START, EXPRESSION_END
+from constants import EXPRESSION_START, EXPRESSION_END
 from executor import Executor
 from line_extractor import LineExtractor
 from status_message import StatusMessage
@@ -44,6 +44,59 @@ class TestSubtituter(unittest.TestCase):
     expected = np.prod([len(v) for v in definitions.values()])
     self.assertEqual(len(substitution_list), expected)
 
+  def testGetExpressionNames(self):
+    if IGNORE_TEST:
+      return
+    self.assertEqual(Expander.getExpressionNames("a + b"),
+        set(['a', 'b']))
+    self.assertEqual(Expander.getExpressionNames("ct.nm"), set(['ct']))
+    self.assertEqual(Expander.getExpressionNames(" 2*n - 1 "), set(['n']))
+    self.assertIsNone(Expander.getExpressionNames("a +"))
+    self.assertIsNone(Expander.getExpressionNames("eval('a')"))
+
+  def testGetReferencedDefinitions(self):
+    if IGNORE_TEST:
+      return
+    definitions = Expander.getReferencedDefinitions(["m+1", "c"],
+        DEFINITIONS)
+    self.assertEqual(list(definitions.keys()), ['m', 'c'])
+    definitions = Expander.getReferencedDefinitions(["x"], DEFINITIONS)
+    self.assertEqual(len(definitions), 0)
+    definitions = Expander.getReferencedDefinitions(["locals()['a']"],
+        DEFINITIONS)
+    self.assertEqual(definitions, DEFINITIONS)
+    # A function defined in the namespace can read any variable
+    namespace = {}
+    exec("def f(): return a", namespace)
+    definitions = Expander.getReferencedDefinitions(["f()"],
+        DEFINITIONS, namespace=namespace)
+    self.assertEqual(definitions, DEFINITIONS)
+    definitions = Expander.getReferencedDefinitions(["len(c)"],
+        DEFINITIONS, namespace=namespace)
+    self.assertEqual(list(definitions.keys()), ['c'])
+    definitions = Expander.getReferencedDefinitions(["c.upper()"],
+        DEFINITIONS, namespace=namespace)
+    self.assertEqual(definitions, DEFINITIONS)
+
+  def testDoReferencedOnly(self):
+    if IGNORE_TEST:
+      return
+    # Expansion over the referenced variables is the same as over
+    # all of the variables
+    template = "J{c}{a}: S{a} -> S{c}{a}"
+    executor = Executor()
+    executor.setDefinitions(DEFINITIONS)
+    expander = Expander(executor, self.message)
+    result = expander.do(template)
+    expected = []
+    for assignment in Expander.makeSubstitutionList(DEFINITIONS):
+      line = "J%s%s: S%s -> S%s%s" % (assignment['c'], assignment['a'],
+          assignment['a'], assignment['c'], assignment['a'])
+      if not line in expected:
+        expected.append(line)
+    self.assertEqual(result, expected)
+    self.assertEqual(expander.do("x{1+1}"), ["x2"])
+
   def testGetTemplateExpressions(self):
     if IGNORE_TEST:
       return
@@ -90,6 +143,67 @@ class TestSubtituter(unittest.TestCase):
     expected = len(DEFINITIONS['a'])
     self.assertEqual(len(result), expected)
     
+  def testDoNamespace(self):
+    if IGNORE_TEST:
+      return
+    executor = Executor()
+    executor.doScript("a = 'global'; k = 2")
+    executor.setDefinitions({'a': ['x', 'y']})
+    namespace = dict(executor.getNamespace())
+    expander = Expander(executor, self.message)
+    result = expander.do("T{a}: {[a*k for _ in range(k)]}")
+    self.assertEqual(result, ["Tx: ['xx', 'xx']", "Ty: ['yy', 'yy']"])
+    self.assertEqual(executor.getNamespace(), namespace)
+
+  def testDoDuplicates(self):
+    if IGNORE_TEST:
+      return
+    executor = Executor()
+    executor.setDefinitions({'n': [3, 1, 2, 3, 1, 4]})
+    expander = Expander(executor, self.message)
+    result = expander.do("T{n}: {n % 3}")
+    self.assertEqual(result, ["T3: 0", "T1: 1", "T2: 2", "T4: 1"])
+
+  def testDoMemoized(self):
+    if IGNORE_TEST:
+      return
+    executor = Executor()
+    executor.setDefinitions(DEFINITIONS)
+    expander = Expander(executor, self.message)
+    result = expander.do("{a}T{m*2}{c} -> {c.upper()}{len('xy')}")
+    self.assertEqual(len(result), 18)
+    self.assertTrue("aT11c -> C2" in result)
+    statistics = executor.getCacheStatistics()
+    evaluations = statistics['hits'] + statistics['misses']
+    # The method call is memoized on all of the variables
+    self.assertEqual(evaluations, 3 + 3 + 2 + 18 + 1)
+
+  def testDoFunction(self):
+    if IGNORE_TEST:
+      return
+    # A function defined in the namespace reads the variables as globals
+    executor = Executor()
+    executor.doScript("def f(): return a*10")
+    executor.setDefinitions({'a': [1, 2]})
+    expander = Expander(executor, self.message)
+    self.assertEqual(expander.do("X{a}_{f()}"), ["X1_10", "X2_20"])
+    self.assertEqual(expander.do("X{f()}"), ["X10", "X20"])
+    executor.doScript("class C(object):\n  def get(self): return a\nc = C()")
+    self.assertEqual(expander.do("X{a}_{c.get()}"), ["X1_1", "X2_2"])
+    self.assertFalse('a' in executor.getNamespace())
+    self.assertFalse('m' in executor._namespace)
+
+  def testDoMethod(self):
+    if IGNORE_TEST:
+      return
+    # A method reads a variable that the line does not name
+    executor = Executor()
+    executor.doScript("class C(object):\n  def get(self): return a\no = C()")
+    executor.setDefinitions({'a': [1, 2], 'b': ['x', 'y']})
+    expander = Expander(executor, self.message)
+    self.assertEqual(expander.do("M{b}_{o.get()}"),
+        ["Mx_1", "Mx_2", "My_1", "My_2"])
+
   def testDoSubstitutionNoDefinition(self):
     if IGNORE_TEST:
       return
@@ -117,8 +231,28 @@ class TestSubtituter(unittest.TestCase):
           found = True
           break
       self.assertTrue(found)
-      
-    
+
+  def testEstimate(self):
+    if IGNORE_TEST:
+      return
+    executor = Executor()
+    executor.setDefinitions({'n': [1, 2, 3], 'a': ['x', 'y']})
+    expander = Expander(executor, self.message)
+    for line in ["T{n}{a} -> T{n+1}", "T{a}", "T1 -> T2", "T{len('ab')}"]:
+      estimate = expander.estimate(line, line_number=3)
+      expansion = expander.do(line)
+      output = expansion
+      if len(expansion) > 1:
+        output = ["#" + line] + expansion
+      self.assertEqual(estimate.line_number, 3)
+      self.assertEqual(estimate.lines, len(output))
+      self.assertEqual(estimate.num_bytes,
+          len('\n'.join(output)) + 1)
+    estimate = expander.estimate("T{n}{a} -> T{n+1}")
+    self.assertEqual(estimate.variables, ['n', 'a'])
+    self.assertEqual(estimate.assignments, 6)
+
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,55 @@
+"""
+Tests for ExpansionPlan and Budget
+"""
+from expansion_plan import ExpansionPlan, Budget, LineEstimate
+import unittest
+
+
+IGNORE_TEST = False
+ESTIMATE = LineEstimate(line_number=4, line="J{a}", variables=['a'],
+    assignments=3, lines=4, num_bytes=20)
+
+
+#############################
+# Tests
+#############################
+# pylint: disable=W0212,C0111,R0904
+class TestExpansionPlan(unittest.TestCase):
+
+  def setUp(self):
+    self.plan = ExpansionPlan()
+
+  def testAdd(self):
+    if IGNORE_TEST:
+      return
+    self.plan.addOutput(1, 5)
+    self.plan.addEstimate(ESTIMATE)
+    self.assertEqual(self.plan.getEstimates(), [ESTIMATE])
+    self.assertEqual(self.plan.getTotalLines(), 5)
+    self.assertEqual(self.plan.getTotalBytes(), 25)
+
+  def testFormat(self):
+    if IGNORE_TEST:
+      return
+    self.plan.addEstimate(ESTIMATE)
+    report = self.plan.format()
+    self.assertTrue("Total: 4 lines, 20 bytes" in report)
+    self.assertEqual(report.split('\n')[1].split(),
+        ['4', '3', '4', '20', 'a'])
+
+
+class TestBudget(unittest.TestCase):
+
+  def testCheck(self):
+    if IGNORE_TEST:
+      return
+    self.assertIsNone(Budget().check(ESTIMATE, 100))
+    budget = Budget(max_lines_per_line=4, max_total_bytes=100)
+    self.assertIsNone(budget.check(ESTIMATE, 100))
+    self.assertTrue("lines" in Budget(max_lines_per_line=3).check(
+        ESTIMATE, 100))
+    self.assertTrue("bytes" in budget.check(ESTIMATE, 101))
+
+
+if __name__ == '__main__':
+  unittest.main()
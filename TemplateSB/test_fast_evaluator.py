@@ -0,0 +1,67 @@
+"""
+Tests for the fast evaluation of expressions
+"""
+from fast_evaluator import makeEvaluator
+import collections
+import unittest
+
+
+IGNORE_TEST = False
+Tuple = collections.namedtuple('Tuple', 'name value')
+NAMESPACE = {'CT': Tuple('x', 2), 'values': [3, 4, 5], 'mf': None,
+    'm1': 1, 'm2': 2.5, 'd': {'k': 'v'}, 's': "abc"}
+SUPPORTED = ["m1", "'lit'", "CT.name", " CT.value ", "values[1]",
+    "values[m1]", "values[1:]", "values[::2]", "values[m1:3]", "d['k']",
+    "values[CT.value]", "(m1, m2)", "s[CT.value]", "True", "None"]
+UNSUPPORTED = ["len(s)", "s.upper()", "[v for v in values]", "lambda: 1",
+    "CT.__class__", "{'a': 1}", "[m1]", "f'{m1}'", "x := 1", "1 +",
+    "m1 + 1", "-m1", "m1 < m2", "m1 and m2", "mf if mf else m1",
+    "values[m1 + 1]"]
+ERRORS = ["undefined", "CT.missing", "values[10]", "d['x']", "mf.name"]
+
+
+#############################
+# Tests
+#############################
+# pylint: disable=W0212,C0111,R0904
+class TestFastEvaluator(unittest.TestCase):
+
+  def testSupported(self):
+    if IGNORE_TEST:
+      return
+    for expression in SUPPORTED:
+      evaluator = makeEvaluator(expression)
+      self.assertIsNotNone(evaluator, expression)
+      self.assertEqual(evaluator(dict(NAMESPACE), None),
+          eval(expression, dict(NAMESPACE)), expression)
+
+  def testUnsupported(self):
+    if IGNORE_TEST:
+      return
+    for expression in UNSUPPORTED:
+      self.assertIsNone(makeEvaluator(expression), expression)
+
+  def testErrors(self):
+    if IGNORE_TEST:
+      return
+    for expression in ERRORS:
+      try:
+        eval(expression, dict(NAMESPACE))
+      except Exception as err:
+        expected = err
+      with self.assertRaises(type(expected)) as context:
+        makeEvaluator(expression)(dict(NAMESPACE), None)
+      self.assertEqual(str(context.exception), str(expected))
+
+  def testNames(self):
+    if IGNORE_TEST:
+      return
+    evaluator = makeEvaluator("(m1, m2)")
+    self.assertEqual(evaluator(NAMESPACE, {'m1': 10}), (10, 2.5))
+    evaluator = makeEvaluator("abs")
+    self.assertTrue(evaluator(NAMESPACE, None) is abs)
+    self.assertEqual(evaluator({'__builtins__': {'abs': 1}}, None), 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,67 @@
+"""
+Tests for Instrumentation
+"""
+from instrumentation import Instrumentation, PHASES, PHASE_EXPAND,  \
+    COUNT_ASSIGNMENTS
+import unittest
+
+
+IGNORE_TEST = False
+NUM_SLOWEST = 2
+
+
+#############################
+# Tests
+#############################
+# pylint: disable=W0212,C0111,R0904
+class TestInstrumentation(unittest.TestCase):
+
+  def setUp(self):
+    self.instrumentation = Instrumentation(num_slowest=NUM_SLOWEST)
+
+  def testConstructor(self):
+    if IGNORE_TEST:
+      return
+    stats = self.instrumentation.getStats()
+    self.assertEqual(set(stats['phases'].keys()), set(PHASES))
+    self.assertEqual(stats['counters'], {})
+    self.assertEqual(stats['slowest_lines'], [])
+
+  def testAddTime(self):
+    if IGNORE_TEST:
+      return
+    self.instrumentation.addTime(PHASE_EXPAND, 1.0)
+    self.instrumentation.addTime(PHASE_EXPAND, 0.5)
+    stats = self.instrumentation.getStats()
+    self.assertEqual(stats['phases'][PHASE_EXPAND], 1.5)
+
+  def testCount(self):
+    if IGNORE_TEST:
+      return
+    self.instrumentation.count(COUNT_ASSIGNMENTS)
+    self.instrumentation.count(COUNT_ASSIGNMENTS, 3)
+    stats = self.instrumentation.getStats()
+    self.assertEqual(stats['counters'][COUNT_ASSIGNMENTS], 4)
+
+  def testAddLine(self):
+    if IGNORE_TEST:
+      return
+    for idx, seconds in enumerate([0.2, 0.5, 0.1, 0.4]):
+      self.instrumentation.addLine(seconds, idx + 1, "line%d" % idx)
+    slowest = self.instrumentation.getStats()['slowest_lines']
+    self.assertEqual(slowest, [(0.5, 2, "line1"), (0.4, 4, "line3")])
+
+  def testFormat(self):
+    if IGNORE_TEST:
+      return
+    self.instrumentation.count(COUNT_ASSIGNMENTS, 7)
+    self.instrumentation.addLine(0.3, 12, "J{a}: S{a} -> P")
+    report = self.instrumentation.format()
+    for phase in PHASES:
+      self.assertTrue(phase in report)
+    self.assertTrue(COUNT_ASSIGNMENTS in report)
+    self.assertTrue("line 12: J{a}: S{a} -> P" in report)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,98 @@
+"""
+Tests for LineCache
+"""
+from line_cache import LineCache
+import importlib
+import numpy as np
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+IGNORE_TEST = False
+LINE = "J{a}: S{a} -> S{m+1}"
+DEPENDENCIES = {'a': ('variable', ['x', 'y']), 'm': ('variable', [1, 2])}
+SUBSTITUTIONS = ["Jx: Sx -> S2", "Jy: Sy -> S3\nwith newline"]
+
+
+#############################
+# Tests
+#############################
+# pylint: disable=W0212,C0111,R0904
+class TestLineCache(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.cache = LineCache(self.directory)
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def testMakeKey(self):
+    if IGNORE_TEST:
+      return
+    key = self.cache.makeKey(LINE, DEPENDENCIES)
+    self.assertEqual(key, self.cache.makeKey(LINE, dict(DEPENDENCIES)))
+    self.assertNotEqual(key, self.cache.makeKey(LINE + " ", DEPENDENCIES))
+    dependencies = dict(DEPENDENCIES)
+    dependencies['m'] = ('variable', [1, 3])
+    self.assertNotEqual(key, self.cache.makeKey(LINE, dependencies))
+    dependencies['m'] = ('name', [1, 2])
+    self.assertNotEqual(key, self.cache.makeKey(LINE, dependencies))
+    self.assertIsNone(self.cache.makeKey(LINE, None))
+    dependencies['m'] = ('name', lambda x: x)
+    self.assertIsNone(self.cache.makeKey(LINE, dependencies))
+    # The order of the variables is the order of the expansion
+    dependencies = dict(reversed(list(DEPENDENCIES.items())))
+    self.assertNotEqual(key, self.cache.makeKey(LINE, dependencies))
+
+  def testMakeKeyLargeValue(self):
+    if IGNORE_TEST:
+      return
+    # The repr of a large array omits most of its elements
+    table = np.arange(2000)
+    table[1000] = 1
+    key = self.cache.makeKey(LINE, {'tab': ('name', table)})
+    table = table.copy()
+    table[1000] = 7
+    self.assertNotEqual(key,
+        self.cache.makeKey(LINE, {'tab': ('name', table)}))
+
+  def testMakeKeyModule(self):
+    if IGNORE_TEST:
+      return
+    path = os.path.join(self.directory, "line_cache_module.py")
+    sys.path.insert(0, self.directory)
+    try:
+      keys = []
+      for scale in [2, 3]:
+        with open(path, 'w') as outfile:
+          outfile.write("SCALE = %d\ndef f(x):\n  return SCALE*x\n"
+              % scale)
+        importlib.invalidate_caches()
+        module = importlib.import_module("line_cache_module")
+        module = importlib.reload(module)
+        for value in [module, module.f]:
+          # The module is only read once by a LineCache
+          cache = LineCache(self.directory)
+          keys.append(cache.makeKey(LINE, {'x': ('name', value)}))
+      self.assertEqual(len(set(keys)), 4)
+    finally:
+      sys.path.remove(self.directory)
+      sys.modules.pop("line_cache_module", None)
+
+  def testGetPut(self):
+    if IGNORE_TEST:
+      return
+    key = self.cache.makeKey(LINE, DEPENDENCIES)
+    self.assertIsNone(self.cache.get(key))
+    self.cache.put(key, SUBSTITUTIONS)
+    self.assertEqual(self.cache.get(key), SUBSTITUTIONS)
+    self.assertEqual(self.cache.getStatistics(), {'hits': 1, 'misses': 1})
+    self.cache.close()
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,11 +1,18 @@
 """
 Tests for LineExtractor
 """
-from line_extractor import LineExtractor
+from line_extractor import LineExtractor, iterString, iterFileLines
 from constants import LINE_TRAN,  \
     LINE_SUBS, LINE_COMMAND, CONTINUED_STG, LINE_NONE
-from command import COMMAND_START, COMMAND_END
+from constants import COMMAND_START, COMMAND_END
 
+import gzip
+import lzma
+import os
+import pathlib
+import shutil
+import tempfile
+import tracemalloc
 import unittest
 
 
@@ -34,7 +41,7 @@ class TestLineExtractor(unittest.TestCase):
     if IGNORE_TEST:
       return
     self.assertEqual(TEMPLATE_TRAN.count("\n")+1,
-      len(self.extractor._lines))
+      len(list(self.extractor._lines)))
 
   def _testGetNextLine(self):
     if IGNORE_TEST:
@@ -79,6 +86,88 @@ class TestLineExtractor(unittest.TestCase):
     self.assertTrue(line_1 in extractor._current_line)
     self.assertTrue(line_2 in extractor._current_line)
 
+  def testIterableInput(self):
+    if IGNORE_TEST:
+      return
+    lines = [l + '\n' for l in TEMPLATE_SUBS.split('\n')]
+    extractor = LineExtractor(iter(lines))
+    for line in TEMPLATE_SUBS.split('\n'):
+      self.assertEqual(extractor.do(strip=False), (line, LINE_SUBS))
+    self.assertEqual(extractor.getCurrentSourceLineNumber(), len(lines))
+    self.assertIsNone(extractor.do()[0])
+
+  def testIterString(self):
+    if IGNORE_TEST:
+      return
+    for text in ["", "a", "a\n", "a\nb", "\n\na\n"]:
+      self.assertEqual(list(iterString(text)), text.split("\n"))
+
+  def testPathInput(self):
+    if IGNORE_TEST:
+      return
+    template = "%s %s\r\n\n%s" % (TEMPLATE_SUBS, CONTINUED_STG,
+        TEMPLATE_TRAN)
+    directory = tempfile.mkdtemp()
+    try:
+      paths = [os.path.join(directory, n) for n in ["t", "t.gz", "t.xz"]]
+      with open(paths[0], 'wb') as outfile:
+        outfile.write(template.encode('utf-8'))
+      with gzip.open(paths[1], 'wb') as outfile:
+        outfile.write(template.encode('utf-8'))
+      with lzma.open(paths[2], 'wb') as outfile:
+        outfile.write(template.encode('utf-8'))
+      expected = LineExtractor(template.replace("\r", ""))
+      expecteds = []
+      while expected.do()[0] is not None:
+        expecteds.append((expected.getCurrentLine(),
+            expected.getCurrentLineType(),
+            expected.getCurrentSourceLineNumber()))
+      self.assertEqual(expecteds[1],
+          ("So is {t}his. This is a line.", LINE_SUBS, 4))
+      for path in paths:
+        extractor = LineExtractor(pathlib.Path(path))
+        actuals = []
+        while extractor.do()[0] is not None:
+          actuals.append((extractor.getCurrentLine(),
+              extractor.getCurrentLineType(),
+              extractor.getCurrentSourceLineNumber()))
+        self.assertEqual(actuals, expecteds)
+      with open(paths[0], 'rb') as infile:
+        extractor = LineExtractor(infile)
+        self.assertEqual(extractor.do(), expecteds[0][:2])
+      empty_path = os.path.join(directory, "empty")
+      open(empty_path, 'w').close()
+      self.assertEqual(list(iterFileLines(empty_path)), [])
+    finally:
+      shutil.rmtree(directory)
+
+  def testPathInputMemory(self):
+    if IGNORE_TEST:
+      return
+    line = "J{a}_%d: S{a} -> P; k*S{a} %s\n"
+
+    def measure(num_lines):
+      path = os.path.join(directory, "t%d" % num_lines)
+      with open(path, 'w') as outfile:
+        for idx in range(num_lines):
+          outfile.write(line % (idx, CONTINUED_STG if idx % 3 else ""))
+      tracemalloc.start()
+      try:
+        extractor = LineExtractor(pathlib.Path(path))
+        while extractor.do()[0] is not None:
+          pass
+        return tracemalloc.get_traced_memory()[1]
+      finally:
+        tracemalloc.stop()
+
+    directory = tempfile.mkdtemp()
+    try:
+      small = measure(1000)
+      large = measure(20000)
+    finally:
+      shutil.rmtree(directory)
+    self.assertLess(large, small + 20000)
+
   def _testClassifyLine(self, template, expected_classification):
     extractor= LineExtractor(template)
     extractor._getNextLine()
@@ -0,0 +1,86 @@
+"""
+Tests for LRUCache
+"""
+from lru_cache import LRUCache
+import threading
+import unittest
+
+
+IGNORE_TEST = False
+SIZE = 3
+
+
+#############################
+# Tests
+#############################
+# pylint: disable=W0212,C0111,R0904
+class TestLRUCache(unittest.TestCase):
+
+  def setUp(self):
+    self.cache = LRUCache(SIZE)
+
+  def testConstructor(self):
+    if IGNORE_TEST:
+      return
+    self.assertEqual(len(self.cache), 0)
+    with self.assertRaises(ValueError):
+      LRUCache(0)
+
+  def testGetPut(self):
+    if IGNORE_TEST:
+      return
+    self.assertIsNone(self.cache.get('a'))
+    self.cache.put('a', 1)
+    self.assertEqual(self.cache.get('a'), 1)
+    statistics = self.cache.getStatistics()
+    self.assertEqual(statistics['hits'], 1)
+    self.assertEqual(statistics['misses'], 1)
+    self.assertEqual(statistics['size'], 1)
+
+  def testEviction(self):
+    if IGNORE_TEST:
+      return
+    for idx in range(SIZE):
+      self.cache.put(idx, idx)
+    # Make 0 the most recently used
+    self.cache.get(0)
+    self.cache.put(SIZE, SIZE)
+    self.assertEqual(len(self.cache), SIZE)
+    self.assertTrue(0 in self.cache)
+    self.assertFalse(1 in self.cache)
+
+  def testClear(self):
+    if IGNORE_TEST:
+      return
+    self.cache.put('a', 1)
+    self.cache.get('a')
+    self.cache.clear()
+    self.assertEqual(len(self.cache), 0)
+    self.assertEqual(self.cache.hits, 0)
+
+  def testThreads(self):
+    if IGNORE_TEST:
+      return
+    num_threads = 8
+    num_calls = 2000
+
+    def run(offset):
+      for idx in range(num_calls):
+        key = (offset + idx) % (2*SIZE)
+        if self.cache.get(key) is None:
+          self.cache.put(key, key)
+
+    threads = [threading.Thread(target=run, args=(n,))
+               for n in range(num_threads)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    statistics = self.cache.getStatistics()
+    self.assertEqual(statistics['hits'] + statistics['misses'],
+        num_threads*num_calls)
+    self.assertEqual(statistics['size'], SIZE)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,186 @@
+"""
+Tests for OutputCache
+"""
+from disk_cache import getModuleFiles, readManifest, makeContentKey
+from output_cache import OutputCache, recordOpenedFiles
+from template_processor import TemplateProcessor
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+IGNORE_TEST = False
+MODULE_NAME = "output_cache_module"
+TEMPLATE = '''{{ DefineVariables Begin }}
+import %s
+values = [int(v) for v in open(%r).read().split()]
+api.addDefinitions({'n': values})
+{{ DefineVariables End }}
+J{n}: {n*%s.SCALE}'''
+
+
+#############################
+# Tests
+#############################
+# pylint: disable=W0212,C0111,R0904
+class TestOutputCache(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.cache_dir = os.path.join(self.directory, "cache")
+    self.data_path = self._write("values.txt", "1 2")
+    self.module_path = self._write(MODULE_NAME + ".py", "SCALE = 2\n")
+    self.inpath = self._write("model.tmpl",
+        TEMPLATE % (MODULE_NAME, self.data_path, MODULE_NAME))
+    self.outpath = os.path.join(self.directory, "model.txt")
+    sys.path.insert(0, self.directory)
+
+  def tearDown(self):
+    sys.path.remove(self.directory)
+    sys.modules.pop(MODULE_NAME, None)
+    shutil.rmtree(self.directory)
+
+  def _write(self, name, text):
+    path = os.path.join(self.directory, name)
+    with open(path, 'w') as outfile:
+      outfile.write(text)
+    return path
+
+  def _read(self):
+    with open(self.outpath, 'r') as infile:
+      return infile.read()
+
+  def testRecordOpenedFiles(self):
+    if IGNORE_TEST:
+      return
+    path = os.path.join(self.directory, "written.txt")
+    with recordOpenedFiles() as paths:
+      with open(self.data_path, 'r') as infile:
+        infile.read()
+      with open(path, 'w') as outfile:
+        outfile.write("x")
+    self.assertTrue(self.data_path in paths)
+    self.assertFalse(path in paths)
+    import json
+    self.assertEqual(getModuleFiles({'json': json, 'f': json.dumps}),
+        set([json.__file__]))
+
+  def testProcessFile(self):
+    if IGNORE_TEST:
+      return
+    self.assertFalse(TemplateProcessor.processFile(self.inpath,
+        self.outpath, cache_dir=self.cache_dir))
+    expected = self._read()
+    self.assertTrue("J2: 4" in expected)
+    os.remove(self.outpath)
+    self.assertTrue(TemplateProcessor.processFile(self.inpath,
+        self.outpath, cache_dir=self.cache_dir))
+    self.assertEqual(self._read(), expected)
+    self.assertTrue(TemplateProcessor.processFile(self.inpath,
+        self.outpath, cache_dir=self.cache_dir))
+    self.assertEqual(os.listdir(self.directory).count("model.txt"), 1)
+    # The output is overwritten in place, as by a shell redirection
+    with open(self.outpath, 'w') as outfile:
+      outfile.write("other")
+    self.assertTrue(TemplateProcessor.processFile(self.inpath,
+        self.outpath, cache_dir=self.cache_dir))
+    self.assertEqual(self._read(), expected)
+    # A file read by the DefineVariables block changes
+    self._write("values.txt", "1 2 3")
+    self.assertFalse(TemplateProcessor.processFile(self.inpath,
+        self.outpath, cache_dir=self.cache_dir))
+    self.assertTrue("J3: 6" in self._read())
+    # The previous output is found when the file is restored
+    self._write("values.txt", "1 2")
+    self.assertTrue(TemplateProcessor.processFile(self.inpath,
+        self.outpath, cache_dir=self.cache_dir))
+    self.assertEqual(self._read(), expected)
+
+  def testDependencies(self):
+    if IGNORE_TEST:
+      return
+    TemplateProcessor.processFile(self.inpath, self.outpath,
+        cache_dir=self.cache_dir)
+    cache = OutputCache(self.cache_dir)
+    manifest = readManifest(cache._cache,
+        cache.makeTemplateKey(self.inpath, self.outpath))
+    self.assertEqual(sorted([m[0] for m in manifest]),
+        sorted([self.data_path, self.module_path]))
+    self.assertTrue(cache.fetch(self.inpath, self.outpath))
+    # An imported module changes
+    self._write(MODULE_NAME + ".py", "SCALE = 30\n")
+    self.assertFalse(cache.fetch(self.inpath, self.outpath))
+    self.assertEqual(cache.getStatistics(), {'hits': 1, 'misses': 1})
+
+  def testCurrentDirectory(self):
+    if IGNORE_TEST:
+      return
+    # A relative path names a different file in each directory
+    inpath = self._write("relative.tmpl", "\n".join([
+        "{{ DefineVariables Begin }}",
+        "api.addDefinitions({'n': open('p.txt').read().split()})",
+        "{{ DefineVariables End }}", "X{n}"]))
+    current_directory = os.getcwd()
+    try:
+      for name, values in [("A", "1 2"), ("B", "7 8 9")]:
+        directory = os.path.join(self.directory, name)
+        os.mkdir(directory)
+        os.chdir(directory)
+        self._write(os.path.join(name, "p.txt"), values)
+        self.assertFalse(TemplateProcessor.processFile(inpath,
+            self.outpath, cache_dir=self.cache_dir))
+        self.assertTrue("X%s" % values[-1] in self._read())
+    finally:
+      os.chdir(current_directory)
+
+  def testLinkedEntry(self):
+    if IGNORE_TEST:
+      return
+    TemplateProcessor.processFile(self.inpath, self.outpath,
+        cache_dir=self.cache_dir)
+    cache = OutputCache(self.cache_dir)
+    self.assertTrue(cache.fetch(self.inpath, self.outpath))
+    self.assertFalse(os.path.samefile(self._getEntryPath(cache),
+        self.outpath))
+    # An entry linked elsewhere may have been changed through the link
+    os.remove(self.outpath)
+    os.link(self._getEntryPath(cache), self.outpath)
+    self.assertFalse(cache.fetch(self.inpath, self.outpath))
+
+  def _getEntryPath(self, cache):
+    key = cache.makeTemplateKey(self.inpath, self.outpath)
+    manifest = readManifest(cache._cache, key)
+    return cache._cache.getPath(makeContentKey(key, manifest))
+
+  def testCompressed(self):
+    if IGNORE_TEST:
+      return
+    gz_path = self.outpath + ".gz"
+    self.assertFalse(TemplateProcessor.processFile(self.inpath, gz_path,
+        cache_dir=self.cache_dir))
+    self.assertFalse(TemplateProcessor.processFile(self.inpath,
+        self.outpath, cache_dir=self.cache_dir))
+    os.remove(gz_path)
+    self.assertTrue(TemplateProcessor.processFile(self.inpath, gz_path,
+        cache_dir=self.cache_dir))
+    with gzip.open(gz_path, 'rt') as infile:
+      self.assertEqual(infile.read(), self._read())
+
+  def testEvict(self):
+    if IGNORE_TEST:
+      return
+    cache = OutputCache(self.cache_dir, max_bytes=1)
+    output_path = cache.makeTemporary(self.outpath)
+    with open(output_path, 'w') as outfile:
+      outfile.write("output")
+    cache.store(self.inpath, self.outpath, output_path, [])
+    self.assertEqual(self._read(), "output")
+    self.assertEqual(cache._cache.getSize(), 0)
+    self.assertFalse(cache.fetch(self.inpath, self.outpath))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,111 @@
+"""
+Tests for output sinks
+"""
+from output_sink import OutputSink, StreamSink, StdoutSink, MemorySink,  \
+    FileSink, GzipSink, XzSink, makeSink
+import gzip
+import io
+import lzma
+import os
+import shutil
+import tempfile
+import unittest
+
+
+IGNORE_TEST = False
+LINES = ["line %d" % n for n in range(10)]
+CHUNK_SIZE = 16
+
+
+class CountingSink(MemorySink):
+  """
+  Counts the chunks written.
+  """
+
+  def __init__(self, chunk_size):
+    super(CountingSink, self).__init__(chunk_size=chunk_size)
+    self.num_chunks = 0
+
+  def _writeChunk(self, text):
+    self.num_chunks += 1
+    super(CountingSink, self)._writeChunk(text)
+
+
+#############################
+# Tests
+#############################
+# pylint: disable=W0212,C0111,R0904
+class TestOutputSink(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def testMemorySink(self):
+    if IGNORE_TEST:
+      return
+    sink = MemorySink()
+    self.assertEqual(sink.getValue(), "")
+    sink.writeLines(iter(LINES[:5]))
+    for line in LINES[5:]:
+      sink.write(line)
+    self.assertEqual(sink.getValue(), "\n".join(LINES))
+
+  def testChunks(self):
+    if IGNORE_TEST:
+      return
+    sink = CountingSink(CHUNK_SIZE)
+    sink.writeLines(LINES)
+    # Each chunk has three lines
+    self.assertEqual(sink.num_chunks, 3)
+    sink.close()
+    self.assertEqual(sink.num_chunks, 4)
+    self.assertEqual(sink.getValue(), "\n".join(LINES))
+    sink = CountingSink(CHUNK_SIZE)
+    for line in LINES:
+      sink.write(line)
+    self.assertEqual(sink.num_chunks, 3)
+
+  def testStreamSink(self):
+    if IGNORE_TEST:
+      return
+    stream = io.StringIO()
+    with StreamSink(stream) as sink:
+      sink.writeLines(LINES)
+      self.assertEqual(stream.getvalue(), "")
+    self.assertFalse(stream.closed)
+    self.assertEqual(stream.getvalue(), "\n".join(LINES))
+
+  def testFileSinks(self):
+    if IGNORE_TEST:
+      return
+    expected = "\n".join(LINES + ["é"])
+    for name, cls, opener in [("out.txt", FileSink, open),
+        ("out.txt.gz", GzipSink, gzip.open), ("out.txt.xz", XzSink, lzma.open)]:
+      path = os.path.join(self.directory, name)
+      sink = makeSink(path, chunk_size=CHUNK_SIZE)
+      self.assertEqual(type(sink), cls)
+      sink.writeLines(LINES + ["é"])
+      sink.close()
+      sink.close()
+      with opener(path, 'rb') as infile:
+        self.assertEqual(infile.read().decode('utf-8'), expected)
+
+  def testMakeSink(self):
+    if IGNORE_TEST:
+      return
+    self.assertEqual(type(makeSink(None)), StdoutSink)
+    self.assertEqual(type(makeSink("-")), StdoutSink)
+
+  def testOutputSink(self):
+    if IGNORE_TEST:
+      return
+    # A sink must say how chunks are written
+    with self.assertRaises(TypeError):
+      OutputSink()
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,86 @@
+"""
+Tests for ParallelExpander
+"""
+from parallel_expander import ParallelExpander, ModuleReference,  \
+    _expandLines
+from config import Config
+from executor import Executor
+import concurrent.futures
+import pickle
+import unittest
+
+
+IGNORE_TEST = False
+DEFINITIONS = {'a': ['a', 'b', 'c'], 'm': [1, 2, 3]}
+LINES = ["J{a}: S{a} -> S{m+1}", "K{m}: {math.sqrt(m*m)}",
+    "L{a}: {undefined}"]
+
+
+#############################
+# Tests
+#############################
+# pylint: disable=W0212,C0111,R0904
+class TestParallelExpander(unittest.TestCase):
+
+  def setUp(self):
+    self.executor = Executor()
+    self.executor.doScript("import math")
+    self.executor.setDefinitions(DEFINITIONS)
+
+  def testMakeSnapshot(self):
+    if IGNORE_TEST:
+      return
+    parallel = ParallelExpander(self.executor)
+    names, definitions, _, config = pickle.loads(parallel._makeSnapshot())
+    self.assertEqual(definitions, DEFINITIONS)
+    self.assertEqual(config, Config.getDefault())
+    self.assertTrue(isinstance(names['math'], ModuleReference))
+    self.assertFalse('api' in names)
+    self.executor.doScript("f = lambda x: x")
+    self.assertIsNone(parallel._makeSnapshot())
+
+  def testExpandLines(self):
+    if IGNORE_TEST:
+      return
+    snapshot = ParallelExpander(self.executor)._makeSnapshot()
+    results = _expandLines(snapshot, LINES)
+    self.assertEqual(len(results[0][0]), 9)
+    self.assertEqual(results[1][0], ["K1: 1.0", "K2: 2.0", "K3: 3.0"])
+    self.assertIsNone(results[1][2])
+    self.assertIsNotNone(results[2][2])
+
+  def testSubmit(self):
+    if IGNORE_TEST:
+      return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
+      parallel = ParallelExpander(self.executor, pool=pool, batch_size=2)
+      handles = [parallel.submit(l) for l in LINES]
+      self.assertIsNotNone(handles[0][0].future)
+      self.assertIsNone(handles[2][0].future)
+      results = [parallel.getResult(h) for h in handles]
+      self.assertEqual(results[1][0], ["K1: 1.0", "K2: 2.0", "K3: 3.0"])
+      parallel.close()
+      self.executor.doScript("f = lambda x: x")
+      parallel.invalidate()
+      self.assertIsNone(parallel.submit(LINES[0]))
+
+  def testConfigs(self):
+    if IGNORE_TEST:
+      return
+    config = Config.getDefault().replace(expression_start="<",
+        expression_end=">")
+    lines = ["J<a>: {a}", "J{a}: <a>"]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
+      default = ParallelExpander(self.executor, pool=pool)
+      custom = ParallelExpander(self.executor, pool=pool, config=config)
+      handles = [(default.submit(l), custom.submit(l)) for l in lines]
+      results = [(default.getResult(d)[0], custom.getResult(c)[0])
+                 for d, c in handles]
+    self.assertEqual(results[0], (["J<a>: a", "J<a>: b", "J<a>: c"],
+        ["Ja: {a}", "Jb: {a}", "Jc: {a}"]))
+    self.assertEqual(results[1], (["Ja: <a>", "Jb: <a>", "Jc: <a>"],
+        ["J{a}: a", "J{a}: b", "J{a}: c"]))
+
+
+if __name__ == '__main__':
+  unittest.main()
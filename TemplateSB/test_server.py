@@ -0,0 +1,161 @@
+"""
+Tests for ExpansionServer
+"""
+from client import expand, request, writeFrame, FRAME_INPUT,  \
+    FRAME_END, COMMAND_STATS
+from server import ExpansionServer, LatencyRecorder, InputLines
+from template_processor import TemplateProcessor
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import warnings
+
+
+IGNORE_TEST = False
+TEMPLATE = '''{{ DefineVariables Begin }}
+api.addDefinitions({'a': ['a', 'b', 'c'], 'm': [1, 2, 3]})
+{{ DefineVariables End }}
+J{a}{m}: S{a} -> S{m+1}; k*S{a}
+# comment
+K{m}: {m*m}'''
+
+
+#############################
+# Tests
+#############################
+# pylint: disable=W0212,C0111,R0904
+class TestServer(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.socket_path = os.path.join(self.directory, "server.sock")
+    self.server = ExpansionServer(self.socket_path)
+    self.thread = threading.Thread(target=self.server.serve_forever)
+    self.thread.start()
+
+  def tearDown(self):
+    self.server.shutdown()
+    self.thread.join()
+    self.server.server_close()
+    shutil.rmtree(self.directory)
+
+  def _expand(self, template):
+    """
+    :param str template:
+    :return int, str, str: status, output, errors
+    """
+    outfile = io.BytesIO()
+    errfile = io.BytesIO()
+    status = expand(self.socket_path,
+        io.BytesIO(template.encode('utf-8')), outfile, errfile)
+    return (status, outfile.getvalue().decode('utf-8'),
+        errfile.getvalue().decode('utf-8'))
+
+  def testExpand(self):
+    if IGNORE_TEST:
+      return
+    status, output, errors = self._expand(TEMPLATE)
+    self.assertEqual(status, 0)
+    self.assertEqual(errors, "")
+    self.assertEqual(output, TemplateProcessor(TEMPLATE).do())
+    status, output, errors = self._expand(TEMPLATE + "\nL{b}")
+    self.assertEqual(status, 1)
+    self.assertTrue("on line 7" in errors)
+    # Lines before the error are output
+    self.assertTrue("Jc3: Sc -> S4; k*Sc" in output)
+
+  def testWarnings(self):
+    if IGNORE_TEST:
+      return
+    template = "\n".join(["{{ DefineVariables Begin }}",
+        "api.addDefinitions({'x': list(range(200)), 'y': list(range(60))})",
+        "{{ DefineVariables End }}", "X{x}_{y}"])
+    with warnings.catch_warnings(record=True) as server_warnings:
+      warnings.simplefilter("always")
+      status, output, errors = self._expand(template)
+    self.assertEqual(status, 0)
+    self.assertTrue("X199_59" in output)
+    self.assertTrue(errors.startswith("UserWarning: on line 4."))
+    self.assertTrue("Very large number of assignments: 12000!" in errors)
+    self.assertEqual(len(server_warnings), 0)
+
+  def testLargeTemplate(self):
+    if IGNORE_TEST:
+      return
+    # Output is sent while the template is being received
+    template = "\n".join([TEMPLATE] + ["X%d{a}: {a}" % n
+        for n in range(20000)])
+    status, output, _ = self._expand(template)
+    self.assertEqual(status, 0)
+    self.assertEqual(output, TemplateProcessor(template).do())
+    status, _, errors = self._expand(template.replace("X19", "X{b}", 1))
+    self.assertEqual(status, 1)
+    self.assertTrue("Runtime error" in errors)
+
+  def testConcurrentRequests(self):
+    if IGNORE_TEST:
+      return
+    templates = [TEMPLATE, TEMPLATE.replace("m+1", "m-1"),
+        TEMPLATE.replace("'c'", "'d', 'e'")]*8
+    expected = [(0, TemplateProcessor(t).do(), "") for t in templates]
+    results = [None]*len(templates)
+
+    def run(index):
+      results[index] = self._expand(templates[index])
+
+    threads = [threading.Thread(target=run, args=(n,))
+               for n in range(len(templates))]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(results, expected)
+    outfile = io.BytesIO()
+    status = request(self.socket_path, {'command': COMMAND_STATS}, None,
+        outfile, io.BytesIO())
+    self.assertEqual(status, 0)
+    self.assertTrue("Requests: %d" % len(templates)
+        in outfile.getvalue().decode('utf-8'))
+
+
+class TestLatencyRecorder(unittest.TestCase):
+
+  def testGetPercentiles(self):
+    if IGNORE_TEST:
+      return
+    recorder = LatencyRecorder(window=100)
+    self.assertIsNone(recorder.getPercentiles()['p50'])
+    for n in range(1, 201):
+      recorder.record(n/1000.0)
+    percentiles = recorder.getPercentiles()
+    self.assertEqual(percentiles['count'], 200)
+    self.assertEqual(percentiles['p50'], 0.15)
+    self.assertEqual(percentiles['p99'], 0.199)
+    self.assertEqual(percentiles['max'], 0.2)
+    self.assertTrue("p90" in recorder.format())
+
+
+class TestInputLines(unittest.TestCase):
+
+  def testIter(self):
+    if IGNORE_TEST:
+      return
+    data = "J{a}\r\né{b}\nlast".encode('utf-8')
+    stream = io.BytesIO()
+    # Frames split a line, a line separator and a character
+    for start, end in [(0, 5), (5, 8), (8, 9), (9, len(data))]:
+      writeFrame(stream, FRAME_INPUT, data[start:end])
+    writeFrame(stream, FRAME_END, b"")
+    writeFrame(stream, FRAME_INPUT, b"after")
+    stream.seek(0)
+    lines = InputLines(stream)
+    self.assertEqual(list(lines), ["J{a}\n", "é{b}\n", "last"])
+    lines.drain()
+    self.assertEqual(stream.read(), stream.getvalue()[-10:])
+
+
+if __name__ == '__main__':
+  unittest.main()
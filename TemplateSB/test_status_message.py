@@ -1,7 +1,7 @@
 """
 Tests for StatusMessage
 """
-from status_message import StatusMessage
+from status_message import StatusMessage, LineMessage
 from line_extractor import LineExtractor
 import unittest
 import warnings
@@ -24,6 +24,10 @@ class TestStatusMessage(unittest.TestCase):
       return
     with self.assertRaises(ValueError):
       self.message.error("")
+    with self.assertRaises(ValueError) as context:
+      self.message.error("msg", line_number=7, line="x{a}")
+    self.assertTrue("on line 7" in str(context.exception))
+    self.assertTrue("x{a}" in str(context.exception))
 
   def testWarning(self):
     if IGNORE_TEST:
@@ -34,6 +38,26 @@ class TestStatusMessage(unittest.TestCase):
         # Verify some things
         assert len(w) == 1
     
+  def testLineMessage(self):
+    if IGNORE_TEST:
+      return
+    message = LineMessage(3, "y{b}")
+    with self.assertRaises(ValueError) as context:
+      message.error("msg")
+    self.assertTrue("on line 3" in str(context.exception))
+    self.assertTrue("y{b}" in str(context.exception))
+
+  def testWarn(self):
+    if IGNORE_TEST:
+      return
+    messages = []
+    message = LineMessage(3, "y{b}", warn=messages.append)
+    with warnings.catch_warnings(record=True) as w:
+      message.warning("msg")
+    self.assertEqual(len(w), 0)
+    self.assertEqual(len(messages), 1)
+    self.assertTrue("on line 3" in messages[0])
+
 
 if __name__ == '__main__':
   unittest.main()
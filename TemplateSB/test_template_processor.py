@@ -3,12 +3,22 @@ Tests for TemplateProcessor
 """
 from template_processor import TemplateProcessor
 from constants import COMMAND_START, COMMAND_END, LINE_COMMAND,  \
-    LINE_NONE
+    LINE_NONE, COMMENT_STG
 
+from config import Config
+from expansion_plan import Budget
+from instrumentation import PHASE_EXPAND, COUNT_ASSIGNMENTS,  \
+    COUNT_OUTPUT_LINES, COUNT_BYTES, LINE_COUNT_PREFIX
+from output_sink import MemorySink
 import copy
+import gzip
+import io
 import unittest
 import numpy as np
 import os
+import shutil
+import sys
+import tempfile
 
 
 IGNORE_TEST = False
@@ -141,6 +151,234 @@ J{s}{t}: S1{s}{t} -> S2{s}{t}; k1*S1{s}{t}'''  %  \
     src_path = os.path.join(src_path, "sample.tmpl")
     TemplateProcessor.processFile(src_path, "/tmp/out.mdl")
 
+  def testGenerateLines(self):
+    if IGNORE_TEST:
+      return
+    expected = TemplateProcessor(TEMPLATE_STG4).do()
+    lines = TEMPLATE_STG4.split('\n')
+    processor = TemplateProcessor(iter([l + '\n' for l in lines]))
+    generator = processor.generateLines()
+    first_line = next(generator)
+    self.assertTrue("DefineVariables" in first_line)
+    actual = '\n'.join([first_line] + list(generator))
+    self.assertEqual(actual, expected)
+
+  def testWriteLines(self):
+    if IGNORE_TEST:
+      return
+    outfile = io.StringIO()
+    TemplateProcessor.writeLines(iter(['a', 'b', 'c']), outfile)
+    self.assertEqual(outfile.getvalue(), "a\nb\nc")
+
+  def testGetStats(self):
+    if IGNORE_TEST:
+      return
+    self.assertIsNone(self.processor.getStats())
+    self.assertIsNone(self.processor.formatStats())
+    processor = TemplateProcessor(TEMPLATE_STG4, stats=True)
+    result = processor.do()
+    stats = processor.getStats()
+    counters = stats['counters']
+    self.assertEqual(counters[COUNT_OUTPUT_LINES], len(result.split('\n')))
+    self.assertEqual(counters[COUNT_BYTES], len(result.encode('utf-8')))
+    self.assertEqual(counters[LINE_COUNT_PREFIX + "substitution"], 1)
+    self.assertEqual(counters[LINE_COUNT_PREFIX + "command"], 4)
+    self.assertEqual(counters[COUNT_ASSIGNMENTS], len(DEFINITIONS['m']))
+    self.assertGreater(stats['phases'][PHASE_EXPAND], 0)
+    self.assertEqual(len(stats['slowest_lines']), 1)
+    self.assertEqual(stats['slowest_lines'][0][2], SUBSTITUTION4)
+    self.assertTrue(SUBSTITUTION4 in processor.formatStats())
+
+  def testConfig(self):
+    if IGNORE_TEST:
+      return
+    config = Config.getDefault().replace(command_start="<<",
+        command_end=">>", comment_stg="//", expression_start="$(",
+        expression_end=")")
+    template = TEMPLATE_STG2.replace(COMMAND_START, "<<").replace(
+        COMMAND_END, ">>").replace("{a}", "$(a)")
+    expected = TemplateProcessor(TEMPLATE_STG2).do().replace(
+        COMMAND_START, "<<").replace(COMMAND_END, ">>").replace(
+        "{a}", "$(a)").replace(COMMENT_STG, "//")
+    self.assertEqual(TemplateProcessor(template, config=config).do(),
+        expected)
+    # Braces are literal text in this syntax
+    self.assertEqual(TemplateProcessor("J{a}", config=config).do(), "J{a}")
+
+  def testProcessFileCompressed(self):
+    if IGNORE_TEST:
+      return
+    directory = tempfile.mkdtemp()
+    try:
+      inpath = os.path.join(directory, "model.tmpl")
+      outpath = os.path.join(directory, "model.ant.gz")
+      with open(inpath, 'w') as outfile:
+        outfile.write(TEMPLATE_STG2)
+      TemplateProcessor.processFile(inpath, outpath)
+      with gzip.open(outpath, 'rt') as infile:
+        self.assertEqual(infile.read(), TemplateProcessor(TEMPLATE_STG2).do())
+    finally:
+      shutil.rmtree(directory)
+
+  def testWriteOutput(self):
+    if IGNORE_TEST:
+      return
+    sink = MemorySink(chunk_size=8)
+    TemplateProcessor(TEMPLATE_STG4).writeOutput(sink)
+    self.assertEqual(sink.getValue(), TemplateProcessor(TEMPLATE_STG4).do())
+
+  def testPlan(self):
+    if IGNORE_TEST:
+      return
+    template = "\n".join([TEMPLATE_STG2, "# comment", SUBSTITUTION4])
+    result = TemplateProcessor(template).do()
+    plan = TemplateProcessor(template).plan()
+    self.assertEqual(plan.getTotalLines(), len(result.split('\n')))
+    self.assertEqual(plan.getTotalBytes(), len(result) + 1)
+    estimates = plan.getEstimates()
+    self.assertEqual([e.line_number for e in estimates], [5, 7])
+    self.assertEqual([e.assignments for e in estimates], [3, 3])
+    self.assertEqual(estimates[0].variables, ['a'])
+
+  def testBudget(self):
+    if IGNORE_TEST:
+      return
+    template = "\n".join([TEMPLATE_STG2, SUBSTITUTION4])
+    num_bytes = len(TemplateProcessor(template).do()) + 1
+    for budget in [Budget(max_lines_per_line=4),
+        Budget(max_total_bytes=num_bytes)]:
+      self.assertEqual(TemplateProcessor(template, budget=budget).do(),
+          TemplateProcessor(template).do())
+    for budget in [Budget(max_lines_per_line=3),
+        Budget(max_total_bytes=num_bytes - 1)]:
+      processor = TemplateProcessor(template, budget=budget)
+      with self.assertRaises(ValueError):
+        processor.plan()
+      processor = TemplateProcessor(template, budget=budget)
+      expanded = []
+      do = processor._expander.do
+      processor._expander.do = lambda l: expanded.append(l) or do(l)
+      with self.assertRaises(ValueError) as context:
+        processor.do()
+      self.assertTrue("exceeds the limit" in str(context.exception))
+      # The line exceeding the budget is not expanded
+      self.assertFalse(SUBSTITUTION4 in expanded)
+
+  def testDoParallel(self):
+    if IGNORE_TEST:
+      return
+    template = "\n".join([TEMPLATE_STG2, "# comment",
+        SUBSTITUTION3, SUBSTITUTION1, COMMAND.replace("'m'", "'n'"),
+        SUBSTITUTION4, "{{ DefineVariables Begin }}",
+        "f = lambda x: x", "{{ DefineVariables End }}",
+        "J{f(a)}", SUBSTITUTION2])
+    expected = TemplateProcessor(template).do()
+    actual = TemplateProcessor(template, jobs=2).do()
+    self.assertEqual(actual, expected)
+    with self.assertRaises(ValueError) as context:
+      TemplateProcessor(TEMPLATE_STG2 + "\nJ{b}", jobs=2).do()
+    self.assertTrue("on line 6" in str(context.exception))
+
+  def testProcessFiles(self):
+    if IGNORE_TEST:
+      return
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    src_path = os.path.join(os.path.dirname(dir_path), "Example",
+        "Demo", "sample.tmpl")
+    bad_path = "/tmp/bad.tmpl"
+    with open(bad_path, 'w') as outfile:
+      outfile.write(TEMPLATE_BAD)
+    pairs = [(src_path, "/tmp/out1.mdl"), (bad_path, "/tmp/out2.mdl"),
+        (src_path, "/tmp/out3.mdl")]
+    for jobs in [1, 2]:
+      results = TemplateProcessor.processFiles(pairs, jobs=jobs)
+      self.assertEqual([r.inpath for r in results], [p[0] for p in pairs])
+      self.assertIsNone(results[0].error)
+      self.assertTrue("ValueError" in results[1].error)
+      self.assertIsNone(results[2].error)
+      with open("/tmp/out3.mdl", 'r') as infile:
+        self.assertTrue("Jax" in infile.read())
+
+  def testReadManifest(self):
+    if IGNORE_TEST:
+      return
+    manifest_path = "/tmp/manifest.txt"
+    with open(manifest_path, 'w') as outfile:
+      outfile.write("# Comment\n\na.tmpl a.mdl\n/x/b.tmpl  /y/b.mdl\n")
+    pairs = TemplateProcessor.readManifest(manifest_path)
+    self.assertEqual(pairs, [("/tmp/a.tmpl", "/tmp/a.mdl"),
+        ("/x/b.tmpl", "/y/b.mdl")])
+    with open(manifest_path, 'w') as outfile:
+      outfile.write("a.tmpl\n")
+    with self.assertRaises(ValueError):
+      TemplateProcessor.readManifest(manifest_path)
+
+  def testLineCache(self):
+    if IGNORE_TEST:
+      return
+    directory = tempfile.mkdtemp()
+    template = "\n".join([TEMPLATE_STG2, SUBSTITUTION3, SUBSTITUTION4])
+    expected = TemplateProcessor(template).do()
+    processor = TemplateProcessor(template, line_cache_dir=directory)
+    self.assertEqual(processor.do(), expected)
+    self.assertEqual(processor._line_cache.getStatistics()['misses'], 3)
+    for jobs in [1, 2]:
+      processor = TemplateProcessor(template, jobs=jobs,
+          line_cache_dir=directory)
+      self.assertEqual(processor.do(), expected)
+      self.assertEqual(processor._line_cache.getStatistics()['hits'], 3)
+    # Only the line that references the changed variable is expanded
+    template = template.replace("'c', '']", "'c', 'd']")
+    processor = TemplateProcessor(template, line_cache_dir=directory)
+    self.assertTrue("Jd1" in processor.do())
+    statistics = processor._line_cache.getStatistics()
+    self.assertEqual(statistics, {'hits': 2, 'misses': 1})
+    shutil.rmtree(directory)
+
+  def testLineCacheOrder(self):
+    if IGNORE_TEST:
+      return
+    directory = tempfile.mkdtemp()
+    try:
+      for definitions in ["{'a': [1, 2], 'b': [3, 4]}",
+          "{'b': [3, 4], 'a': [1, 2]}"]:
+        template = "\n".join(["{{ DefineVariables Begin }}",
+            "api.addDefinitions(%s)" % definitions,
+            "{{ DefineVariables End }}", "X{a}{b}"])
+        processor = TemplateProcessor(template, line_cache_dir=directory)
+        self.assertEqual(processor.do(), TemplateProcessor(template).do())
+    finally:
+      shutil.rmtree(directory)
+
+  def testDefineConstraints(self):
+    if IGNORE_TEST:
+      return
+    template = "\n".join([COMMAND,
+        "%s DefineConstraints Begin %s" % (COMMAND_START, COMMAND_END),
+        "# Methylation level 3 cannot be further methylated",
+        "m < 3",
+        "",
+        "not (a == 'b' and c == '')",
+        "%s DefineConstraints End %s" % (COMMAND_START, COMMAND_END),
+        "J{a}{c}: T{m} -> T{m+1}",
+        "K{m}: T{m} -> T{m+3}",
+        "L{a}",
+        "M{m}: {m > 10}"])
+    lines = TemplateProcessor(template).do().split('\n')
+    self.assertTrue("Jac: T1 -> T2" in lines)
+    self.assertFalse("Jac: T3 -> T4" in lines)
+    self.assertFalse("Jb: T1 -> T2" in lines)
+    self.assertEqual(len([l for l in lines if l.startswith("J")]), 10)
+    self.assertEqual(len([l for l in lines if l.startswith("L")]), 3)
+    self.assertEqual(TemplateProcessor(template, jobs=2).do(),
+        '\n'.join(lines))
+    bad_template = "\n".join([COMMAND,
+        "%s DefineConstraints Begin %s" % (COMMAND_START, COMMAND_END),
+        "m <",
+        "%s DefineConstraints End %s" % (COMMAND_START, COMMAND_END)])
+    with self.assertRaises(ValueError):
+      TemplateProcessor(bad_template).do()
+
   def _testProcessCommand(self, template, is_processed, is_command, processor=None):
     """
     Evaluates the processing of a template line
@@ -169,7 +407,69 @@ aa{a} + bb{d}'''  \
     self._testProcessCommand(line, True, False, processor=processor)
     self._testProcessCommand(line, True, True, processor=processor)
     self._testProcessCommand(line, False, False, processor=processor)
-    
+
+  def testDoTemplates(self):
+    if IGNORE_TEST:
+      return
+    # Stress test: the concurrent output must match serial runs
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    example_path = os.path.join(os.path.dirname(dir_path), "Example")
+    templates = [TEMPLATE_STG2, TEMPLATE_STG3, TEMPLATE_STG4,
+        "\n".join([TEMPLATE_STG2, SUBSTITUTION4, SUBSTITUTION3])]
+    for name in [os.path.join("Demo", "sample.tmpl"),
+        os.path.join("Bray", "bray_model.tmpl")]:
+      with open(os.path.join(example_path, name), 'r') as infile:
+        templates.append(infile.read())
+    templates = templates*8
+    expected = [TemplateProcessor(t).do() for t in templates]
+    actual = TemplateProcessor.doTemplates(templates, threads=8)
+    self.assertEqual(actual, expected)
+    with self.assertRaises(ValueError):
+      TemplateProcessor.doTemplates([TEMPLATE_STG2, TEMPLATE_BAD])
+
+  def testExpandLines(self):
+    if IGNORE_TEST:
+      return
+    # Stress test: lines expanded concurrently by one processor
+    # must match serial expansion
+    processor = TemplateProcessor(TEMPLATE_STG2)
+    processor.do()
+    lines = [SUBSTITUTION1, SUBSTITUTION2, SUBSTITUTION3, SUBSTITUTION4,
+        "X{a}{m}{c}: {[a*m for _ in range(m)]}", "Y{m}: {m*m + 1}"]*50
+    expected = [processor._makeExpansion(l, processor._expander.do(l))
+                for l in lines]
+    actual = processor.expandLines(lines, threads=8)
+    self.assertEqual(actual, expected)
+    self.assertEqual(len(actual[4]), 1 + 3*3*2)
+    with self.assertRaises(ValueError) as context:
+      processor.expandLines(lines[:2] + ["J{b}"])
+    self.assertTrue("on line 3" in str(context.exception))
+
+  def testExpandLinesFunction(self):
+    if IGNORE_TEST:
+      return
+    # Functions read the values of each thread as globals
+    template = "\n".join(["{{ DefineVariables Begin }}",
+        "api.addDefinitions({'x': list(range(20)), 'y': list(range(5))})",
+        "f = lambda: x*100 + y",
+        "{{ DefineVariables End }}"])
+    processor = TemplateProcessor(template)
+    processor.do()
+    namespace = dict(processor._executor.getNamespace())
+    lines = ["A{x}_{f()}", "B{y}{x}_{f()}"]*50
+    expected = [processor._makeExpansion(l, processor._expander.do(l))
+                for l in lines]
+    self.assertTrue("A7_704" in expected[0])
+    # Switch threads often so that they interleave within expressions
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+      actual = processor.expandLines(lines, threads=8)
+    finally:
+      sys.setswitchinterval(interval)
+    self.assertEqual(actual, expected)
+    self.assertEqual(dict(processor._executor.getNamespace()), namespace)
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,53 @@
+"""
+Tests for Vectorizer
+"""
+from vectorizer import Vectorizer
+from assignment_space import AssignmentSpace
+import unittest
+
+
+IGNORE_TEST = False
+DEFINITIONS = {'m': [2, 3, 4], 'n': [-3, 0, 5], 'x': [0.5, -1.25],
+    's': ['a', 'b']}
+VECTORIZED = ["m+1", "2*n - 1", "m/2", "m//2", "n % 3", "-x*m",
+    "m > 2", "x + n", "n", "1.5*m"]
+NOT_VECTORIZED = ["s", "m**2", "1 < m < 4", "(m > 2) + 1",
+    "str(m)", "m // n", "m % n", "x/n", "2**70*m"]
+
+
+#############################
+# Tests
+#############################
+# pylint: disable=W0212,C0111,R0904
+class TestVectorizer(unittest.TestCase):
+
+  def setUp(self):
+    self.space = AssignmentSpace(DEFINITIONS)
+
+  def _evaluate(self, expression):
+    return [str(eval(expression, {}, a)) for a in self.space]
+
+  def testEvaluate(self):
+    if IGNORE_TEST:
+      return
+    result = Vectorizer.evaluate(VECTORIZED, self.space)
+    for expression in VECTORIZED:
+      self.assertEqual(result[expression], self._evaluate(expression))
+
+  def testNotVectorized(self):
+    if IGNORE_TEST:
+      return
+    result = Vectorizer.evaluate(NOT_VECTORIZED, self.space)
+    self.assertEqual(len(result), 0)
+
+  def testMixedTypes(self):
+    if IGNORE_TEST:
+      return
+    space = AssignmentSpace({'a': [1, 2.5], 'b': [True, False]})
+    result = Vectorizer.evaluate(["a+1", "b+1"], space)
+    self.assertEqual(len(result), 0)
+    self.assertEqual(Vectorizer.evaluate(["a"], AssignmentSpace({})), {})
+
+
+if __name__ == '__main__':
+  unittest.main()
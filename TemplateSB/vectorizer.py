@@ -0,0 +1,174 @@
+'''Evaluates arithmetic template expressions over all assignments at once.'''
+
+from constrained_space import ConstrainedAssignmentSpace
+import ast
+
+
+# Largest magnitude of an integer intermediate result. This keeps
+# int64 arithmetic exact and its conversion to float64 exact.
+MAX_MAGNITUDE = 2**53
+BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div,
+    ast.FloorDiv, ast.Mod)
+UNARY_OPERATORS = (ast.UAdd, ast.USub)
+COMPARE_OPERATORS = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE,
+    ast.Gt, ast.GtE)
+TYPE_INT = 'int'
+TYPE_FLOAT = 'float'
+TYPE_BOOL = 'bool'
+
+
+class Vectorizer(object):
+  """
+  Evaluates template expressions built only from numeric template
+  variables, numeric constants and arithmetic or comparison operators.
+  An expression is evaluated once over NumPy arrays that cover the
+  whole assignment space, and the results are formatted in bulk.
+  NumPy is imported on first use since importing it is slow.
+  Expressions are only vectorized if the results are guaranteed to
+  be the same as evaluating them one assignment at a time in python.
+  """
+
+  @classmethod
+  def _getArrayType(cls, values):
+    """
+    Determines the type of the values of a variable.
+    :param tuple values:
+    :return str: TYPE_INT, TYPE_FLOAT or None if not homogeneously numeric
+    """
+    types = set([type(v) for v in values])
+    if types == set([int]):
+      return TYPE_INT
+    if types == set([float]):
+      return TYPE_FLOAT
+    return None
+
+  @classmethod
+  def _analyze(cls, node, variables):
+    """
+    Finds the type and a bound on the magnitude of an expression.
+    :param ast.AST node:
+    :param dict variables: key is name, value is (type, bound)
+    :return (str, number): type and bound; None if not vectorizable
+    """
+    if isinstance(node, ast.Expression):
+      return cls._analyze(node.body, variables)
+    if isinstance(node, ast.Name):
+      return variables.get(node.id)
+    if isinstance(node, ast.Constant):
+      if type(node.value) is int:
+        return (TYPE_INT, abs(node.value))
+      if type(node.value) is float:
+        return (TYPE_FLOAT, 0)
+      return None
+    if isinstance(node, ast.UnaryOp):
+      if not isinstance(node.op, UNARY_OPERATORS):
+        return None
+      operand = cls._analyze(node.operand, variables)
+      if operand is None or operand[0] == TYPE_BOOL:
+        return None
+      return operand
+    if isinstance(node, ast.BinOp):
+      if not isinstance(node.op, BINARY_OPERATORS):
+        return None
+      left = cls._analyze(node.left, variables)
+      right = cls._analyze(node.right, variables)
+      if left is None or right is None:
+        return None
+      if TYPE_BOOL in (left[0], right[0]):
+        return None
+      if isinstance(node.op, ast.Div) or TYPE_FLOAT in (left[0], right[0]):
+        return (TYPE_FLOAT, 0)
+      if isinstance(node.op, (ast.Add, ast.Sub)):
+        bound = left[1] + right[1]
+      elif isinstance(node.op, ast.Mult):
+        bound = left[1]*right[1]
+      elif isinstance(node.op, ast.FloorDiv):
+        bound = left[1]
+      else:
+        bound = right[1]
+      if bound >= MAX_MAGNITUDE:
+        return None
+      return (TYPE_INT, bound)
+    if isinstance(node, ast.Compare):
+      # Chained comparisons do not vectorize
+      if len(node.ops) != 1  \
+          or not isinstance(node.ops[0], COMPARE_OPERATORS):
+        return None
+      left = cls._analyze(node.left, variables)
+      right = cls._analyze(node.comparators[0], variables)
+      if left is None or right is None:
+        return None
+      return (TYPE_BOOL, 1)
+    return None
+
+  @classmethod
+  def _makeArrays(cls, space, names):
+    """
+    Creates the arrays of the values of variables over the assignments.
+    :param AssignmentSpace space:
+    :param set-of-str names: variables for which arrays are created
+    :return dict: key is name, value is array with one entry per assignment
+    """
+    import numpy as np
+    arrays = {}
+    if isinstance(space, ConstrainedAssignmentSpace):
+      positions = np.array(space.getPositions())
+      for idx, (name, values) in enumerate(zip(space.getNames(),
+          space.getValues())):
+        if name in names:
+          arrays[name] = np.array(values)[positions[:, idx]]
+      return arrays
+    length = len(space)
+    stride = 1
+    for name, values in zip(space.getNames(), space.getValues()):
+      if name in names:
+        array = np.repeat(np.array(values), stride)
+        arrays[name] = np.tile(array, length//(stride*len(values)))
+      stride *= len(values)
+    return arrays
+
+  @classmethod
+  def evaluate(cls, expressions, space):
+    """
+    Evaluates the expressions that can be vectorized.
+    :param list-of-str expressions:
+    :param AssignmentSpace space:
+    :return dict: key is expression, value is list-of-str with the
+        string of the expression value for each assignment in the space
+    """
+    result = {}
+    if len(space) == 0:
+      return result
+    variables = {}
+    for name, values in zip(space.getNames(), space.getValues()):
+      array_type = cls._getArrayType(values)
+      if array_type == TYPE_INT:
+        bound = max([abs(v) for v in values])
+        if bound < MAX_MAGNITUDE:
+          variables[name] = (TYPE_INT, bound)
+      elif array_type == TYPE_FLOAT:
+        variables[name] = (TYPE_FLOAT, 0)
+    if len(variables) == 0:
+      return result
+    arrays = None
+    for expression in expressions:
+      try:
+        tree = ast.parse(expression, mode='eval')
+      except SyntaxError:
+        continue
+      names = set([n.id for n in ast.walk(tree)
+                   if isinstance(n, ast.Name)])
+      if len(names) == 0 or cls._analyze(tree, variables) is None:
+        continue
+      if arrays is None:
+        arrays = cls._makeArrays(space, set(variables.keys()))
+      code = compile(tree, '<expression>', 'eval')
+      import numpy as np
+      try:
+        with np.errstate(all='raise'):
+          values = eval(code, {'__builtins__': {}}, arrays)
+      except (ArithmeticError, FloatingPointError):
+        # Evaluate one assignment at a time to report the error
+        continue
+      result[expression] = [str(v) for v in values.tolist()]
+    return result
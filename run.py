@@ -1,23 +1,129 @@
 """
    Running the template pre-processor standalone.
-   Input: Templated Antimony model (stdin)
+   Input: Templated Antimony model (stdin or files)
    Output: Expanded Antimony model (stdout)
 """
+import argparse
 import fileinput
 import os
+import pathlib
 import sys
 
 directory = os.path.dirname(os.path.abspath(__file__))
 path = os.path.join(directory, "TemplateSB")
 sys.path.append(path)
 
+from config import Config
+from expansion_plan import Budget
+from output_sink import makeSink
 from template_processor import TemplateProcessor
 
-template_stg = ''
-for line in fileinput.input():
-  template_stg += "\n" + line
 
-processor = TemplateProcessor(template_stg)
-expanded_stg = processor.do()
+def runBatch(manifest_path, jobs, config=None, cache_dir=None):
+  """
+  Expands the files in a manifest, reporting timings on stderr.
+  :param str manifest_path:
+  :param int jobs: number of processes used to expand files
+  :param Config config: syntax of the templates; default if None
+  :param str cache_dir: directory of the output cache; None for no cache
+  :return int: exit status; 1 if any file failed
+  """
+  pairs = TemplateProcessor.readManifest(manifest_path)
+  results = TemplateProcessor.processFiles(pairs, jobs=jobs, config=config,
+      cache_dir=cache_dir)
+  num_failed = 0
+  for result in results:
+    if result.error is None:
+      sys.stderr.write("%8.3fs  %s\n" % (result.seconds, result.inpath))
+    else:
+      num_failed += 1
+      sys.stderr.write("%8.3fs  %s FAILED: %s\n"
+          % (result.seconds, result.inpath, result.error.split('\n')[0]))
+  total = sum([r.seconds for r in results])
+  sys.stderr.write("%d files, %d failed, %.3fs\n"
+      % (len(results), num_failed, total))
+  return 1 if num_failed > 0 else 0
 
-sys.stdout.write(expanded_stg)
+
+def main(arguments=None):
+  parser = argparse.ArgumentParser(
+      description="Expands a templated model to standard output.")
+  parser.add_argument("files", nargs="*",
+      help="Template files; standard input if none")
+  parser.add_argument("-o", "--output", metavar="FILE",
+      help="Output file, compressed if it ends in .gz or .xz; "
+      + "standard output if omitted")
+  parser.add_argument("--jobs", type=int, default=1,
+      help="Number of processes used to expand template lines")
+  parser.add_argument("--line-cache-dir", metavar="DIR",
+      help="Directory of a persistent cache of expanded template lines")
+  parser.add_argument("--define-cache-dir", metavar="DIR",
+      help="Directory of a persistent cache of the results of "
+      + "DefineVariables blocks")
+  parser.add_argument("--cache-dir", metavar="DIR",
+      help="Directory of a persistent cache of the outputs of template "
+      + "files; needs a single template file or --batch")
+  parser.add_argument("--batch", metavar="MANIFEST",
+      help="File with an input and output path on each line to expand")
+  parser.add_argument("--config", metavar="FILE",
+      help="Configuration of the template syntax; config.yaml if omitted")
+  parser.add_argument("--plan", action="store_true",
+      help="Report the estimated size of the expansion without expanding")
+  parser.add_argument("--max-lines-per-line", type=int, metavar="N",
+      help="Stop if a template line would expand to more than N lines")
+  parser.add_argument("--max-total-bytes", type=int, metavar="N",
+      help="Stop if the output would exceed N bytes")
+  parser.add_argument("--stats", action="store_true",
+      help="Report phase timings, counters and the slowest lines on stderr")
+  parser.add_argument("--serve", metavar="SOCKET",
+      help="Run a server that expands templates sent to the Unix socket")
+  parser.add_argument("--connect", metavar="SOCKET",
+      help="Expand standard input with the server on the Unix socket")
+  args = parser.parse_args(arguments)
+  if args.connect is not None:
+    from client import expand
+    return expand(args.connect, sys.stdin.buffer, sys.stdout.buffer,
+        sys.stderr.buffer, config_path=args.config)
+  config = None
+  if args.config is not None:
+    config = Config.fromFile(args.config)
+  if args.serve is not None:
+    from server import serve
+    serve(args.serve, config=config, jobs=args.jobs)
+    return 0
+  budget = None
+  if args.max_lines_per_line is not None  \
+      or args.max_total_bytes is not None:
+    budget = Budget(max_lines_per_line=args.max_lines_per_line,
+        max_total_bytes=args.max_total_bytes)
+  if args.batch is not None:
+    return runBatch(args.batch, args.jobs, config=config,
+        cache_dir=args.cache_dir)
+  if args.cache_dir is not None:
+    if len(args.files) != 1 or args.files[0] == "-" or args.plan  \
+        or args.stats or budget is not None:
+      parser.error("--cache-dir needs a single template file and "
+          + "cannot be used with --plan, --stats or limits")
+    TemplateProcessor.processFile(args.files[0], args.output,
+        jobs=args.jobs, line_cache_dir=args.line_cache_dir, config=config,
+        cache_dir=args.cache_dir, define_cache_dir=args.define_cache_dir)
+    return 0
+  if len(args.files) == 1 and args.files[0] != "-":
+    # A single file is memory mapped or decompressed as it is read
+    template = pathlib.Path(args.files[0])
+  else:
+    template = fileinput.input(files=args.files)
+  processor = TemplateProcessor(template, jobs=args.jobs,
+      line_cache_dir=args.line_cache_dir, stats=args.stats, config=config,
+      budget=budget, define_cache_dir=args.define_cache_dir)
+  if args.plan:
+    sys.stdout.write(processor.plan().format() + "\n")
+    return 0
+  with makeSink(args.output) as sink:
+    processor.writeOutput(sink)
+  if args.stats:
+    sys.stderr.write("\n" + processor.formatStats() + "\n")
+
+
+if __name__ == '__main__':
+  sys.exit(main())